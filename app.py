@@ -1,5 +1,7 @@
 import streamlit as st
-from backend.services.input import InputService
+from streamlit.errors import StreamlitAPIException
+from backend.services.serving import ServingState
+from backend.services.history.session_store import SessionStore
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 def get_streamlit_session_id():
@@ -16,120 +18,110 @@ st.set_page_config(page_title="NexFlix", page_icon="💬")
 st.title("💬 NexFlix - FAQ da Netflix")
 st.markdown("Faça perguntas sobre a Netflix e obtenha respostas rápidas!")
 
-# Inicializa serviço com cache (só roda uma vez)
-@st.cache_resource(show_spinner=True)
-def get_service():
-    return InputService()
+# Serviço preparado em background uma única vez por processo: a página abre na hora
+# e só a primeira pergunta espera, se o aquecimento ainda não tiver terminado
+@st.cache_resource(show_spinner=False)
+def get_serving():
+    return ServingState().start()
 
-# Carregando o serviço
-if "service" not in st.session_state:
-    with st.spinner("Carregando base de conhecimento..."):
-        st.session_state.service = get_service()
-        st.session_state.messages = []
+# Histórico das conversas no servidor, compartilhado pelas sessões do processo: últimas
+# mensagens de cada sessão, referências só como ids e sessões paradas removidas
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    return SessionStore()
 
-service = st.session_state.service
+serving = get_serving()
+sessions = get_session_store()
+session_id = get_streamlit_session_id()
+if serving.error is not None:
+    st.error(f"Não foi possível carregar a base de conhecimento: {serving.error}")
+    st.stop()
+if not serving.ready():
+    st.caption("⏳ Carregando base de conhecimento em segundo plano...")
 
 # Função para formatar scores de forma compacta
 def format_scores(references):
     if not references:
         return ""
-    
-    scores = []
-    for i, ref in enumerate(references, 1):
-        if isinstance(ref, tuple) and len(ref) >= 2:
-            scores.append(f"{ref[1]:.2f}")
-    
-    if scores:
-        return " | ".join([f"Ref {i}: {score}" for i, score in enumerate(scores, 1)])
-    return ""
-
-# Renderiza histórico de mensagens
-for msg in st.session_state.messages:
+    return " | ".join([f"Ref {i}: {score:.2f}" for i, (_, score) in enumerate(references, 1)])
+
+def render_references(references):
+    # Referências guardadas como (chunk_id, score): o texto vem do índice só na hora de desenhar
+    texts = serving.service.reference_texts([chunk_id for chunk_id, _ in references]) if serving.ready() else {}
+    st.caption(f"📊 {format_scores(references)}")
+    with st.expander("📚 Ver referências"):
+        for i, (chunk_id, score) in enumerate(references, 1):
+            st.markdown(f"**Referência {i}** (Score: {score:.2f})")
+            st.markdown(texts.get(chunk_id, "_Trecho indisponível no índice atual_"))
+
+def render_message(msg):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
-        
-        # Se for uma mensagem do assistente e tiver referências
-        if msg["role"] == "assistant" and "references" in msg and msg["references"]:
-            # Mostra os scores de forma compacta
-            scores_text = format_scores(msg["references"])
-            if scores_text:
-                st.caption(f"📊 {scores_text}")
-            
-            # Expander principal para todas as referências
-            with st.expander("📚 Ver referências"):
-                # Cada referência em seu próprio expander
-                for i, ref in enumerate(msg["references"], 1):
-                    if isinstance(ref, tuple) and len(ref) >= 2:
-                        ref_content = ref[0]
-                        score = ref[1]
-                        expander_title = f"Referência {i} (Score: {score:.2f})"
-                        
-                        with st.expander(expander_title):
-                            st.markdown(ref_content)
-                    else:
-                        # Fallback para referências no formato inesperado
-                        expander_title = f"Referência {i}"
-                        
-                        with st.expander(expander_title):
-                            st.markdown(str(ref))
-
-# Input do usuário (só libera depois do carregamento)
+        if msg["role"] == "assistant" and msg.get("references"):
+            render_references(msg["references"])
+
+# Histórico desenhado só nas execuções completas da página; as mensagens novas ficam com o fragment
+if sessions.dropped(session_id):
+    st.caption(f"Mostrando as últimas {sessions.max_messages} mensagens da conversa")
+history = sessions.messages(session_id)
+for msg in history:
+    render_message(msg)
+st.session_state.rendered_seq = history[-1]["seq"] if history else -1
+
 if 'user_waiting' not in st.session_state:
     st.session_state.user_waiting = False
 
-if question := st.chat_input(placeholder="Digite aqui sua pergunta", disabled=st.session_state.user_waiting) or st.session_state.user_waiting:
-    # Exibe mensagem do usuário
-    if not st.session_state.user_waiting:
-        with st.chat_message("user"):
+def rerun_chat():
+    # scope="fragment" só vale quando o fragment roda sozinho; numa execução completa, reexecuta tudo
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# Cada pergunta reexecuta só este fragment: ele desenha as mensagens posteriores ao histórico
+# acima, e as anteriores não são reconstruídas a cada turno
+@st.fragment
+def chat():
+    for msg in sessions.messages(session_id, after_seq=st.session_state.rendered_seq):
+        render_message(msg)
+
+    if error := st.session_state.pop("chat_error", None):
+        st.error(error)
+
+    report = sessions.session_report(session_id)
+    if report:
+        st.caption(f"🧠 Memória desta sessão: {report['messages']} mensagens, {report['bytes'] / 1024:.1f} KB")
+
+    # Input do usuário (desabilitado enquanto a resposta é gerada)
+    if question := st.chat_input(placeholder="Digite aqui sua pergunta", disabled=st.session_state.user_waiting) or st.session_state.user_waiting:
+        # Registra a pergunta e redesenha o fragment com o input desabilitado
+        if not st.session_state.user_waiting:
             st.session_state.user_waiting = True
-            st.markdown(question)
-            st.supptext = question
-            user_message = {
-                "role": "user", 
-                "content": question,
-            }
-            st.session_state.messages.append(user_message)
-            st.rerun()
-
-    # Gera resposta com bloqueio (spinner visível)
-    with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            response = service.process_question(st.supptext, st.session_state.messages, get_streamlit_session_id(), 5, 0.5)
-        
-        answer = response["answer"]
-        references = response.get("references", [])  # Captura as referências
-        
-        st.markdown(answer)
-        
-        # Mostra os scores de forma compacta
-        if references:
-            scores_text = format_scores(references)
-            if scores_text:
-                st.caption(f"📊 {scores_text}")
-            
-            # Expander principal para todas as referências
-            with st.expander("📚 Ver referências"):
-                # Cada referência em seu próprio expander
-                for i, ref in enumerate(references, 1):
-                    if isinstance(ref, tuple) and len(ref) >= 2:
-                        ref_content = ref[0]
-                        score = ref[1]
-                        expander_title = f"Referência {i} (Score: {score:.2f})"
-                        
-                        with st.expander(expander_title):
-                            st.markdown(ref_content)
-                    else:
-                        # Fallback para referências no formato inesperado
-                        expander_title = f"Referência {i}"
-                        
-                        with st.expander(expander_title):
-                            st.markdown(str(ref))
-        
-        # Salva a mensagem completa com referências no session_state
-        st.session_state.messages.append({
-            "role": "assistant", 
-            "content": answer,
-            "references": references
-        })
-        st.session_state.user_waiting = False
-        st.rerun()
\ No newline at end of file
+            st.session_state.pending_question = question
+            sessions.append(session_id, "user", question)
+            rerun_chat()
+
+        # Gera resposta em streaming (os tokens aparecem conforme chegam do modelo). Qualquer
+        # falha libera o input e aparece como erro no próximo desenho do fragment
+        try:
+            with st.chat_message("assistant"):
+                with st.spinner("Buscando referências..."):
+                    service = serving.wait()
+                    response = service.process_question_stream(st.session_state.pending_question,
+                                                                sessions.memory(session_id), session_id, 5, 0.5)
+
+                answer = st.write_stream(response["stream"])
+                if not isinstance(answer, str):
+                    answer = "".join(str(part) for part in answer)
+                serving.answered()
+
+            # Guarda a resposta com as referências como (chunk_id, score)
+            references = [(chunk_id, score) for chunk_id, (_, score) in zip(response["chunk_ids"], response["references"])]
+            sessions.append(session_id, "assistant", answer, references)
+        except Exception as e:
+            st.session_state.chat_error = f"Não foi possível gerar a resposta: {e}"
+        finally:
+            st.session_state.user_waiting = False
+        rerun_chat()
+
+chat()
@@ -0,0 +1,455 @@
+"""
+Benchmark offline do NexFlix: startup, throughput de indexação, latência de busca,
+ponta a ponta (com LLM falso determinístico), extração de HTML do crawler e tempo até a
+primeira resposta de um processo de serviço novo. Nada acessa a rede além do modelo de
+embeddings já presente no cache local do sentence-transformers.
+
+Uso (na raiz do repositório):
+    python -m backend.misc.benchmark --output bench.json
+    python -m backend.misc.benchmark --output new.json --baseline bench.json --threshold 0.15
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import html
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from backend.services.start_rag import StartRAG, FAQ_PATH, MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP
+from backend.services.RAG.corpus import iter_articles, chunk_article
+from backend.services.RAG.document_indexer import DocumentIndexer
+from backend.services.RAG.encoder_registry import get_encoder
+from backend.services.RAG.parallel_encoder import ParallelEncoder
+from backend.services.RAG.retriever import Retriever
+from backend.services.RAG.vector_store import open_vector_store
+from backend.services.LLM.core import LLMCore
+from backend.services.LLM.fake import FakeStreamingChatModel
+from backend.services.input import InputService
+from backend.misc.web_scraping import process_page_simple
+
+SUITES = ("startup", "indexing", "search", "concurrency", "e2e", "extraction", "parallel_encoding", "serving")
+
+QUESTIONS = [
+    "Como cancelar a Netflix?",
+    "Como mudar minha senha?",
+    "Esqueci meu email de login",
+    "Como baixar títulos para assistir offline?",
+    "Qual a data da minha cobrança?",
+    "Como adicionar um assinante extra?",
+    "Minha conta foi suspensa por problema de pagamento",
+    "Como definir a classificação etária de um perfil?",
+    "O aplicativo não é compatível com meu aparelho",
+    "Como usar a Minha lista?",
+    "Quais são os planos e preços?",
+    "Como sair da Netflix em todos os aparelhos?",
+    "Erro ao reproduzir vídeo na TV",
+    "Como trocar a forma de pagamento?",
+    "Posso compartilhar minha conta?",
+    "Como ativar legendas?",
+]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def latency_stats(samples):
+    return {
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "qps": len(samples) / sum(samples) if sum(samples) else 0.0,
+    }
+
+
+def bench_startup(args, workdir):
+    results = {}
+    start = time.perf_counter()
+    get_encoder(MODEL_NAME)
+    results["model_load_s"] = time.perf_counter() - start
+
+    db_path = os.path.join(workdir, "startup_db")
+    start = time.perf_counter()
+    rag = StartRAG(faq_path=args.corpus, backend=args.backend, db_path=db_path, embedding_cache=False)
+    results["cold_start_s"] = time.perf_counter() - start
+    rag.close_db()
+
+    start = time.perf_counter()
+    rag = StartRAG(faq_path=args.corpus, backend=args.backend, db_path=db_path, embedding_cache=False)
+    results["warm_start_s"] = time.perf_counter() - start
+    rag.close_db()
+    return results
+
+
+def bench_indexing(args, workdir):
+    chunks = [chunk for article in iter_articles(args.corpus)
+              for chunk in chunk_article(article, CHUNK_SIZE, CHUNK_OVERLAP)]
+    get_encoder(MODEL_NAME)
+    results = {"chunks": len(chunks)}
+    for batch_size in args.batch_sizes:
+        db = open_vector_store(args.backend, vector_size=384, path=os.path.join(workdir, f"index_{batch_size}"))
+        db.create_collection()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = DocumentIndexer(db, batch_size=batch_size).add_documents(chunks)
+        db.close()
+        results[f"batch_{batch_size}_chunks_per_s"] = stats["chunks_per_s"]
+    return results
+
+
+def bench_parallel_encoding(args):
+    """Throughput de embedding do corpus inteiro com 1..N processos (cada um com seu modelo)."""
+    chunks = [chunk for article in iter_articles(args.corpus)
+              for chunk in chunk_article(article, CHUNK_SIZE, CHUNK_OVERLAP)]
+    results = {"chunks": len(chunks), "cpus": os.cpu_count()}
+    for workers in args.workers:
+        if workers <= 1:
+            encoder, close = get_encoder(MODEL_NAME), None
+        else:
+            encoder = ParallelEncoder(MODEL_NAME, workers, batch_size=args.encode_batch_size)
+            close = encoder.close
+        encoder.encode(chunks[:workers * args.encode_batch_size])  # carrega os modelos
+        start = time.perf_counter()
+        encoder.encode(chunks, batch_size=args.encode_batch_size, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        if close:
+            close()
+        results[f"workers_{workers}_chunks_per_s"] = len(chunks) / elapsed
+    baseline = results.get("workers_1_chunks_per_s")
+    if baseline:
+        for workers in args.workers:
+            results[f"workers_{workers}_speedup_x"] = results[f"workers_{workers}_chunks_per_s"] / baseline
+    return results
+
+
+# Processo novo respondendo uma pergunta com o LLM falso. "page_s" é quando a página poderia
+# ser desenhada; os tempos são contados desde o início do script no processo filho.
+LEGACY_SERVING_SCRIPT = """
+import json, time
+start = time.monotonic()
+import langchain.schema, langchain_google_genai  # imports antigos do app (LLM/core.py)
+from backend.services.input import InputService
+from backend.services.start_rag import StartRAG
+rag = StartRAG(faq_path={corpus!r}, backend={backend!r}, db_path={db_path!r}, cache_path={cache_path!r})
+service = InputService(rag=rag, answer_cache=False, history_dir={history!r})
+page = time.monotonic() - start
+service.process_question({question!r}, [], "benchmark", 5, 0.3)
+print(json.dumps({{"page_s": page, "first_answer_s": time.monotonic() - start}}))
+"""
+
+SERVING_SCRIPT = """
+import json, time
+start = time.monotonic()
+from backend.services.serving import ServingState
+page = time.monotonic() - start
+serving = ServingState({{"backend": {backend!r}, "db_path": {db_path!r}}},
+                       {{"answer_cache": False, "history_dir": {history!r}}}).start()
+service = serving.wait()
+ready = time.monotonic() - start
+service.process_question({question!r}, [], "benchmark", 5, 0.3)
+print(json.dumps({{"page_s": page, "ready_s": ready, "first_answer_s": time.monotonic() - start}}))
+"""
+
+
+def run_serving_script(script, **params):
+    env = {**os.environ, "NEXFLIX_LLM": "fake"}
+    code = script.format(question=QUESTIONS[0], **params)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def bench_serving(args, workdir):
+    """
+    Tempo até a primeira resposta num processo novo: o app antigo (imports do LLM + StartRAG
+    no primeiro acesso, com índice inexistente ou já persistido) contra o caminho de serviço
+    (índice construído offline, aquecimento em background).
+    """
+    results = {}
+    db_path = os.path.join(workdir, "serving_db")
+    history = os.path.join(workdir, "serving_history") + os.sep
+    cache_path = os.path.join(workdir, "serving_cache")
+    # A primeira execução constrói o índice do zero; a segunda reabre o que ficou persistido
+    for name in ("legacy_cold", "legacy_warm"):
+        timings = run_serving_script(LEGACY_SERVING_SCRIPT, corpus=args.corpus, backend=args.backend,
+                                     db_path=db_path, cache_path=cache_path, history=history)
+        results.update({f"{name}_{metric}": value for metric, value in timings.items()})
+
+    timings = run_serving_script(SERVING_SCRIPT, backend=args.backend, db_path=db_path, history=history)
+    results.update({f"serving_{metric}": value for metric, value in timings.items()})
+    results["page_speedup_x"] = results["legacy_warm_page_s"] / results["serving_page_s"]
+    results["first_answer_speedup_x"] = results["legacy_cold_first_answer_s"] / results["serving_first_answer_s"]
+    return results
+
+
+def bench_search(args, rag):
+    retriever = Retriever(rag.get_db(), model_name=rag.model_name, query_cache_size=0)
+    for question in QUESTIONS:  # aquecimento
+        retriever.search(question, top_k=5, score=args.score)
+    results = {}
+    for top_k in args.top_ks:
+        samples = []
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                retriever.search(question, top_k=top_k, score=args.score)
+                samples.append(time.perf_counter() - start)
+        for name, value in latency_stats(samples).items():
+            results[f"top{top_k}_{name}"] = value
+    return results
+
+
+def bench_concurrency(args, rag):
+    """
+    Encode + busca de várias sessões simultâneas (threads), com e sem micro-batching:
+    throughput (QPS) e latência por consulta para cada nível de concorrência.
+    """
+    results = {}
+    for name, batching in (("unbatched", False), ("batched", {"max_batch_size": args.max_batch_size,
+                                                             "max_wait_ms": args.max_wait_ms})):
+        retriever = Retriever(rag.get_db(), model_name=rag.model_name, query_cache_size=0, batching=batching)
+        retriever.search(QUESTIONS[0], top_k=5, score=args.score)  # aquecimento
+
+        def ask(question):
+            start = time.perf_counter()
+            retriever.search(question, top_k=5, score=args.score)
+            return time.perf_counter() - start
+
+        for concurrency in args.concurrency:
+            questions = QUESTIONS * max(1, args.repeat * concurrency // 4)
+            with ThreadPoolExecutor(concurrency) as pool:
+                start = time.perf_counter()
+                samples = list(pool.map(ask, questions))
+                elapsed = time.perf_counter() - start
+            results[f"{name}_c{concurrency}_qps"] = len(questions) / elapsed
+            results[f"{name}_c{concurrency}_p50_ms"] = percentile(samples, 0.50) * 1000
+            results[f"{name}_c{concurrency}_p99_ms"] = percentile(samples, 0.99) * 1000
+    for concurrency in args.concurrency:
+        results[f"c{concurrency}_speedup_x"] = (results[f"batched_c{concurrency}_qps"]
+                                                / results[f"unbatched_c{concurrency}_qps"])
+    return results
+
+
+def bench_e2e(args, rag, workdir):
+    llm = LLMCore(model=FakeStreamingChatModel())
+    service = InputService(rag=rag, llm=llm, answer_cache=False, query_cache_size=0,
+                           history_dir=os.path.join(workdir, "history") + os.sep)
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                memory = [{"role": "user", "content": question}]
+                start = time.perf_counter()
+                service.process_question(question, memory, "benchmark", 5, args.score)
+                samples.append(time.perf_counter() - start)
+    service.history.close()
+    return {name: value for name, value in latency_stats(samples).items()}
+
+
+def legacy_clean_text(text):
+    """Normalização antiga do crawler (várias passadas de regex), mantida só para comparação."""
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text).lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'[^\w\s\.\,]', '', text)
+    text = re.sub(r'\s+([\.])', r'\1', text)
+    for pattern, repl in (('[áàâãä]', 'a'), ('[éèêë]', 'e'), ('[íìîï]', 'i'), ('[óòôõö]', 'o'), ('[úùûü]', 'u'), ('[ç]', 'c')):
+        text = re.sub(pattern, repl, text)
+    return text.strip()
+
+
+def legacy_text_with_links(element, base_url):
+    parts = []
+    for child in element.contents:
+        if child.name == 'a' and child.get('href'):
+            text = child.get_text(" ", strip=True)
+            if text:
+                parts.append(f"[{text}]({urljoin(base_url, child['href'])})")
+        elif child.name:
+            parts.append(legacy_text_with_links(child, base_url))
+        elif str(child).strip():
+            parts.append(str(child).strip())
+    return "".join(parts)
+
+
+def legacy_process_page(page_html, url):
+    """Extração antiga: BeautifulSoup + find_all + caminhada recursiva por bloco."""
+    soup = BeautifulSoup(page_html, "html.parser")
+    title_tag = soup.find("h1")
+    body, fingerprints = [], set()
+    for tag in soup.find_all(['h2', 'h3', 'p', 'li']):
+        content = legacy_text_with_links(tag, url)
+        fingerprint = hashlib.md5(legacy_clean_text(content).encode('utf-8')).hexdigest()
+        if content and fingerprint not in fingerprints and len(content.strip()) > 10:
+            body.append(content)
+            fingerprints.add(fingerprint)
+    links = {urljoin(url, a['href']) for a in soup.find_all("a", href=True)}
+    return {"title": title_tag.get_text().strip() if title_tag else url, "content": "\n".join(body), "node_links": links}
+
+
+def fixture_pages(args):
+    """Páginas salvas pelo crawler (--save-html) ou, sem elas, páginas sintéticas geradas do corpus."""
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append(("https://help.netflix.com/pt/" + os.path.basename(path), f.read()))
+        return pages
+
+    def inline(line):
+        line = html.escape(line, quote=False)
+        return re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2">\1</a>', line)
+
+    nav = "".join(f'<li><a href="/pt/node/{i}">Tópico de ajuda {i}</a></li>' for i in range(40))
+    pages = []
+    for article in iter_articles(args.corpus):
+        lines = [line for line in article["content"].split("\n") if line.strip()]
+        items = "".join(f"<li><p>{inline(line)}</p></li>" for line in lines[1::3])
+        paragraphs = "".join(f"<p>{inline(line)}</p>" for line in lines[0::3] + lines[2::3])
+        pages.append((article["url"], (
+            f"<html><head><title>{html.escape(article['title'])}</title><script>var x = 1;</script></head><body>"
+            f"<header class='header'><ul class='nav'>{nav}</ul></header><main><article>"
+            f"<h1>{html.escape(article['title'])}</h1>{paragraphs}<ul>{items}</ul>"
+            f"</article></main><footer class='footer'><p>Central de ajuda da NetFlix. Todos os direitos reservados.</p></footer>"
+            f"</body></html>"
+        )))
+    return pages
+
+
+def bench_extraction(args):
+    pages = fixture_pages(args)
+    results = {"pages": len(pages), "html_mb": sum(len(page) for _, page in pages) / 1e6}
+    for name, extract in (("legacy", legacy_process_page), ("single_pass", process_page_simple)):
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for url, page in pages:
+                extract(page, url)
+            samples.append(time.perf_counter() - start)
+        results[f"{name}_pages_per_s"] = len(pages) / min(samples)
+    results["speedup_x"] = results["single_pass_pages_per_s"] / results["legacy_pages_per_s"]
+    return results
+
+
+def lower_is_better(metric):
+    return metric.endswith(("_s", "_ms"))
+
+
+def higher_is_better(metric):
+    return metric.endswith(("per_s", "qps"))
+
+
+def compare(current, baseline, threshold):
+    """Lista de regressões acima de 'threshold' (fração) em relação ao baseline."""
+    regressions = []
+    for suite, metrics_ in current["results"].items():
+        for metric, value in metrics_.items():
+            old = baseline.get("results", {}).get(suite, {}).get(metric)
+            if not old or not isinstance(value, (int, float)):
+                continue
+            if higher_is_better(metric):
+                change = (old - value) / old
+            elif lower_is_better(metric):
+                change = (value - old) / old
+            else:
+                continue
+            if change > threshold:
+                regressions.append(f"{suite}.{metric}: {old:.4g} -> {value:.4g} ({change:+.1%} pior)")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do NexFlix")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--corpus", default=FAQ_PATH)
+    parser.add_argument("--backend", default=os.getenv("NEXFLIX_VECTOR_BACKEND", "qdrant"))
+    parser.add_argument("--batch-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[32, 128, 512])
+    parser.add_argument("--top-ks", type=lambda v: [int(x) for x in v.split(",")], default=[1, 5, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--score", type=float, default=0.3)
+    parser.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")],
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="Processos para o suite parallel_encoding")
+    parser.add_argument("--encode-batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 8, 32],
+                        help="Sessões simultâneas para o suite concurrency")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Micro-batching do suite concurrency")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--pages", help="Pasta com HTML salvo pelo crawler (--save-html) para o suite extraction")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Piora relativa tolerada (0.10 = 10%%)")
+    args = parser.parse_args()
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="nexflix-bench-") as workdir:
+        if "startup" in suites:
+            report["results"]["startup"] = bench_startup(args, workdir)
+        if "indexing" in suites:
+            report["results"]["indexing"] = bench_indexing(args, workdir)
+        if "search" in suites or "concurrency" in suites or "e2e" in suites:
+            rag = StartRAG(faq_path=args.corpus, backend=args.backend, db_path=os.path.join(workdir, "serve_db"),
+                           cache_path=os.path.join(workdir, "embedding_cache"))
+            if "search" in suites:
+                report["results"]["search"] = bench_search(args, rag)
+            if "concurrency" in suites:
+                report["results"]["concurrency"] = bench_concurrency(args, rag)
+            if "e2e" in suites:
+                report["results"]["e2e"] = bench_e2e(args, rag, workdir)
+            rag.close_db()
+        if "extraction" in suites:
+            report["results"]["extraction"] = bench_extraction(args)
+        if "parallel_encoding" in suites:
+            report["results"]["parallel_encoding"] = bench_parallel_encoding(args)
+        if "serving" in suites:
+            report["results"]["serving"] = bench_serving(args, workdir)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Resultados salvos em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("❌ Regressões acima do limite:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ Nenhuma regressão acima de {args.threshold:.0%} em relação a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Teste de carga da API HTTP (backend/services/api.py). Com --serve, sobe a API neste processo
+(uvicorn numa thread) com o LLM falso e latência injetável, então roda offline; sem --serve,
+ataca uma API já no ar em --url.
+
+Uso (na raiz do repositório, com o índice já construído):
+    python -m backend.misc.load_test --serve --concurrency 32 --requests 500 --llm-delay 0.5
+    python -m backend.misc.load_test --url http://localhost:8000 --endpoint stream --output carga.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+from backend.misc.benchmark import QUESTIONS, percentile
+
+
+def serve(args):
+    """Sobe a API com o LLM falso numa thread e espera o /health ficar pronto."""
+    import uvicorn
+    from backend.services.api import NexFlixAPI
+    from backend.services.serving import ServingState
+    from backend.services.LLM.core import LLMCore
+    from backend.services.LLM.fake import FakeStreamingChatModel
+
+    llm = LLMCore(model=FakeStreamingChatModel(first_token_delay=args.llm_delay, token_delay=args.token_delay),
+                  resilience={"max_concurrency": args.llm_concurrency})
+    rag_options = {key: value for key, value in (("backend", args.backend), ("db_path", args.db_path)) if value}
+    app = NexFlixAPI(ServingState(rag_options, {"llm": llm, "answer_cache": False}), max_in_flight=args.max_in_flight)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, name="load-test-api", daemon=True).start()
+
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + args.ready_timeout
+    while time.monotonic() < deadline:
+        try:
+            health = httpx.get(f"{url}/health", timeout=5)
+            if health.status_code == 200:
+                return url
+            if health.json().get("stage") == "failed":
+                raise SystemExit(f"API não subiu: {health.json().get('error')}")
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("API não ficou pronta a tempo")
+
+
+async def one_request(client, args, i):
+    """Uma requisição; retorna (status, latência total, tempo até o primeiro token ou None)."""
+    start = time.perf_counter()
+    if args.endpoint == "batch":
+        questions = [QUESTIONS[(i + j) % len(QUESTIONS)] for j in range(args.batch_size)]
+        response = await client.post("/ask/batch", json={"questions": questions})
+        return response.status_code, time.perf_counter() - start, None
+
+    body = {"question": QUESTIONS[i % len(QUESTIONS)], "session_id": f"load-{i % args.concurrency}"}
+    if args.endpoint == "ask":
+        response = await client.post("/ask", json=body)
+        return response.status_code, time.perf_counter() - start, None
+
+    first_token = None
+    async with client.stream("POST", "/ask/stream", json=body) as response:
+        async for line in response.aiter_lines():
+            if first_token is None and line and json.loads(line).get("type") == "token":
+                first_token = time.perf_counter() - start
+    return response.status_code, time.perf_counter() - start, first_token
+
+
+async def run(url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    counter = iter(range(args.requests))
+    samples = []
+
+    async def worker(client):
+        for i in counter:
+            sent = time.perf_counter()
+            try:
+                samples.append(await one_request(client, args, i))
+            except httpx.HTTPError as e:
+                samples.append((type(e).__name__, time.perf_counter() - sent, None))
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [latency for status, latency, _ in samples if status == 200]
+    first_tokens = [first for status, _, first in samples if status == 200 and first is not None]
+    questions_per_request = args.batch_size if args.endpoint == "batch" else 1
+    report = {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(samples),
+        "status": dict(Counter(str(status) for status, _, _ in samples)),
+        "elapsed_s": elapsed,
+        "requests_per_s": len(ok) / elapsed,
+        "questions_per_s": len(ok) * questions_per_request / elapsed,
+    }
+    if ok:
+        report.update({"p50_ms": percentile(ok, 0.50) * 1000, "p95_ms": percentile(ok, 0.95) * 1000,
+                       "p99_ms": percentile(ok, 0.99) * 1000, "mean_ms": statistics.fmean(ok) * 1000})
+    if first_tokens:
+        report.update({"first_token_p50_ms": percentile(first_tokens, 0.50) * 1000,
+                       "first_token_p99_ms": percentile(first_tokens, 0.99) * 1000})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API do NexFlix")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--serve", action="store_true", help="Sobe a API neste processo com o LLM falso")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", help="Backend vetorial da API com --serve (padrão: NEXFLIX_VECTOR_BACKEND)")
+    parser.add_argument("--db-path", help="Pasta do índice da API com --serve (padrão do backend se omitido)")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="Latência do primeiro token do LLM falso (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Latência entre tokens do LLM falso (s)")
+    parser.add_argument("--llm-concurrency", type=int, default=8,
+                        help="Chamadas simultâneas ao LLM falso (max_concurrency do ResilientChatModel)")
+    parser.add_argument("--max-in-flight", type=int, help="Limite de perguntas em andamento da API com --serve")
+    parser.add_argument("--endpoint", choices=("ask", "stream", "batch"), default="ask")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=8, help="Perguntas por requisição em --endpoint batch")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Grava o relatório em JSON")
+    args = parser.parse_args()
+
+    url = serve(args) if args.serve else args.url
+    report = asyncio.run(run(url, args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,22 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urljoin, urlparse, urlunparse
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
+import argparse
+import json
+import os
+import sqlite3
+import threading
 import time
 import requests
 import re
 import hashlib
+from backend.services.RAG.corpus import article_record
 
 START_URL = "https://help.netflix.com/pt"
 DOMAIN = urlparse(START_URL).netloc
@@ -26,13 +35,18 @@ HEADERS = {
     'Upgrade-Insecure-Requests': '1',
 }
 
+# Falhas transitórias (conexão, 429 e 5xx) são repetidas com backoff exponencial, respeitando o
+# Retry-After do servidor; esgotadas as tentativas, a página conta como falha
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",),
+              respect_retry_after_header=True)
+
 def normalize_url(u):
     p = urlparse(u)
     p = p._replace(fragment="")
     return urlunparse(p)
 
-def is_same_domain(u):
-    return urlparse(u).netloc == DOMAIN
+def is_same_domain(u, domain=DOMAIN):
+    return urlparse(u).netloc == domain
 
 def setup_driver():
     chrome_options = Options()
@@ -48,45 +62,108 @@ def setup_driver():
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     return driver
 
-def fetch_simple(url):
-    """Tenta obter o conteúdo da página usando requests (sem JavaScript)"""
+_thread_local = threading.local()
+
+def get_session(pool_size=16):
+    """Session por thread (requests.Session não é thread-safe), com keep-alive, pool de conexões e retries"""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=RETRY)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _thread_local.session = session
+    return session
+
+class HostLimiter:
+    """Limita as requisições simultâneas por host e o intervalo mínimo entre o início de duas delas"""
+
+    def __init__(self, max_per_host=4, min_interval=0.0):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        with semaphore:
+            if self.min_interval:
+                with self._lock:
+                    now = time.monotonic()
+                    start = max(now, self._next_start.get(host, now))
+                    self._next_start[host] = start + self.min_interval
+                time.sleep(start - now)
+            yield
+
+GONE_STATUS = (404, 410)
+
+def fetch_page(url, etag=None, last_modified=None):
+    """
+    GET condicional com a Session da thread. Retorna (status, html, etag, last_modified);
+    com 304 o html é None e os validadores enviados são mantidos; 404/410 voltam com html None.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = get_session().get(url, headers=headers, timeout=10)
+        if r.status_code == 304:
+            return 304, None, etag, last_modified
+        if r.status_code in GONE_STATUS:
+            return r.status_code, None, None, None
         r.raise_for_status()
-        return r.text
+        return r.status_code, r.text, r.headers.get("ETag"), r.headers.get("Last-Modified")
     except Exception as e:
         print(f"  Erro na requisição simples: {e}")
-        return None
+        return None, None, None, None
+
+def fetch_simple(url):
+    """Tenta obter o conteúdo da página usando requests (sem JavaScript)"""
+    return fetch_page(url)[1]
+
+MARKDOWN_LINK = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+
+KEPT_CHAR = re.compile(r'[\w\s\.\,]')
+SPACE_BEFORE_DOT = re.compile(r'\s+([\.])')
+ACCENTS = {
+    **{c: "a" for c in "áàâãä"},
+    **{c: "e" for c in "éèêë"},
+    **{c: "i" for c in "íìîï"},
+    **{c: "o" for c in "óòôõö"},
+    **{c: "u" for c in "úùûü"},
+    "ç": "c",
+}
+
+class CleanTable(dict):
+    """
+    Tabela do str.translate que remove pontuação (tudo fora de [\\w\\s.,], a mesma classe da
+    regex antiga) e tira acentos numa só passada. Cada caractere é classificado pela própria
+    regex na primeira vez que aparece e fica em cache.
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        value = ACCENTS.get(char, code) if KEPT_CHAR.match(char) else None
+        self[code] = value
+        return value
+
+CLEAN_TABLE = CleanTable()
 
 def aggressive_clean_text(text):
     """Limpeza agressiva do texto para remover variações e normalizar"""
     if not text:
         return ""
-    
-    # Remove links no formato [texto](URL) para comparação
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    
-    # Converte para minúsculas
-    text = text.lower()
-    
-    # Remove espaços em branco extras
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    # Remove pontuação exceto pontos finais e vírgulas
-    text = re.sub(r'[^\w\s\.\,]', '', text)
-    
-    # Remove espaços antes de pontuação
-    text = re.sub(r'\s+([\.])', r'\1', text)
-    
-    # Remove acentos
-    text = re.sub(r'[áàâãä]', 'a', text)
-    text = re.sub(r'[éèêë]', 'e', text)
-    text = re.sub(r'[íìîï]', 'i', text)
-    text = re.sub(r'[óòôõö]', 'o', text)
-    text = re.sub(r'[úùûü]', 'u', text)
-    text = re.sub(r'[ç]', 'c', text)
-    
-    return text.strip()
+    # Remove links no formato [texto](URL), converte para minúsculas e junta espaços em branco
+    text = " ".join(MARKDOWN_LINK.sub(r'\1', text).lower().split())
+    # Remove pontuação (menos '.' e ',') e acentos, e os espaços antes de pontos finais
+    return SPACE_BEFORE_DOT.sub(r'\1', text.translate(CLEAN_TABLE)).strip()
 
 def get_text_fingerprint(text):
     """Gera um fingerprint (hash) do texto para comparação de duplicatas"""
@@ -95,86 +172,151 @@ def get_text_fingerprint(text):
         return None
     return hashlib.md5(cleaned.encode('utf-8')).hexdigest()
 
-def extract_text_with_links(element):
-    """Extrai o texto de um elemento preservando os links no formato [texto](URL)"""
-    if not element:
-        return ""
-    
-    result_parts = []
-    
-    # Se o elemento atual é um link
-    if element.name == 'a' and element.get('href'):
-        href = element.get('href')
-        full_url = urljoin(START_URL, href)
-        text = element.get_text(" ", strip=True)
-        if text:
-            result_parts.append(f"[{text}]({full_url})")
-        return "".join(result_parts)
-    
-    # Se o elemento tem filhos, processar cada filho
-    if hasattr(element, 'contents'):
-        for child in element.contents:
-            if child.name:
-                # Se for um elemento HTML, processar recursivamente
-                if child.name == 'a' and child.get('href'):
-                    href = child.get('href')
-                    full_url = urljoin(START_URL, href)
-                    text = child.get_text(" ", strip=True)
-                    if text:
-                        result_parts.append(f"[{text}]({full_url})")
-                else:
-                    # Para outros elementos, extrair o texto e processar links internos
-                    child_text = extract_text_with_links(child)
-                    if child_text:
-                        result_parts.append(child_text)
+BLOCK_TAGS = ('h2', 'h3', 'p', 'li')
+SELENIUM_BLOCK_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li')
+SKIP_PARENT_CLASSES = ('nav', 'navigation', 'menu', 'footer', 'header', 'sidebar')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+IGNORED_TAGS = {'script', 'style', 'noscript', 'template'}
+
+class BlockExtractor(HTMLParser):
+    """
+    Percorre o HTML uma única vez e coleta o título (primeiro h1), o texto de cada bloco
+    (headings, p, li) com os links no formato [texto](URL) e todos os hrefs da página.
+
+    Cada trecho de texto pertence só ao bloco mais interno que o contém, então o conteúdo de
+    listas e parágrafos aninhados não é repetido no bloco de fora. Blocos cujo pai tem uma das
+    classes em 'skip_parent_classes' (menus, rodapés) são descartados.
+    """
+
+    def __init__(self, base_url, block_tags=BLOCK_TAGS, skip_parent_classes=()):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.block_tags = set(block_tags)
+        self.skip_parent_classes = set(skip_parent_classes)
+        self.title = None
+        self.hrefs = []
+        self.blocks = []  # na ordem de abertura das tags; None até o bloco fechar
+        self._stack = []  # (tag, classes, abriu_bloco)
+        self._open_blocks = []  # [índice em self.blocks ou None se descartado, partes do texto]
+        self._link = None  # [href, partes do texto]
+        self._resolved = {}  # href -> URL absoluta (menus repetem os mesmos links)
+        self._h1 = None
+        self._ignored = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == 'br':
+                self.handle_data(" ")
+            return
+        attrs = dict(attrs)
+        opened_block = False
+        if tag in IGNORED_TAGS:
+            self._ignored += 1
+        elif tag in self.block_tags:
+            parent_classes = self._stack[-1][1] if self._stack else ()
+            if self.skip_parent_classes.intersection(parent_classes):
+                self._open_blocks.append([None, []])
             else:
-                # Se for um nó de texto, adicionar diretamente
-                text = str(child).strip()
-                if text:
-                    result_parts.append(text)
-    
-    return "".join(result_parts)
-
-def process_page_simple(html, url):
-    """Processa o HTML para extrair conteúdo e links"""
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # pegar título (se existir)
-    title_tag = soup.find("h1")
-    title = title_tag.get_text().strip() if title_tag else url
-    
-    # pegar texto (p, li, headings) com links preservados
+                self._open_blocks.append([len(self.blocks), []])
+                self.blocks.append(None)
+            opened_block = True
+        if tag == 'a' and attrs.get('href'):
+            self.hrefs.append(attrs['href'])
+            if self._link is None:
+                self._link = [attrs['href'], []]
+        if tag == 'h1' and self.title is None and self._h1 is None:
+            self._h1 = []
+        self._stack.append((tag, (attrs.get('class') or '').split(), opened_block))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self._ignored:
+            return
+        if self._h1 is not None:
+            self._h1.append(data)
+        if self._link is not None:
+            self._link[1].append(data)
+        elif self._open_blocks:
+            self._open_blocks[-1][1].append(data)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        # HTML mal aninhado: fecha tudo até a tag correspondente, se ela estiver aberta
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > i:
+            self._close(*self._stack.pop())
+
+    def resolve(self, href):
+        url = self._resolved.get(href)
+        if url is None:
+            url = self._resolved[href] = urljoin(self.base_url, href)
+        return url
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self._close(*self._stack.pop())
+
+    def _close(self, tag, classes, opened_block):
+        if tag in IGNORED_TAGS:
+            self._ignored -= 1
+        elif tag == 'a' and self._link is not None:
+            href, parts = self._link
+            self._link = None
+            text = " ".join(part.strip() for part in parts if part.strip())
+            if text and self._open_blocks:
+                self._open_blocks[-1][1].append(f"[{text}]({self.resolve(href)})")
+        elif tag == 'h1' and self._h1 is not None:
+            self.title = " ".join("".join(self._h1).split())
+            self._h1 = None
+        if opened_block:
+            index, parts = self._open_blocks.pop()
+            if index is not None:
+                self.blocks[index] = " ".join("".join(parts).split())
+
+def extract_page(html, url, domain=DOMAIN, block_tags=BLOCK_TAGS, skip_parent_classes=()):
+    """Extrai título, conteúdo (blocos únicos com links, um por linha) e links com /node/ numa única passada"""
+    parser = BlockExtractor(url, block_tags, skip_parent_classes)
+    parser.feed(html)
+    parser.close()
+
     page_body = []
     page_fingerprints = set()  # Para evitar duplicatas na mesma página
-    
-    for tag in soup.find_all(['h2','h3','p','li']):
-        # Extrair texto preservando links
-        content_with_links = extract_text_with_links(tag)
-        if content_with_links:
-            # Verificar se é uma duplicata usando fingerprint
-            fingerprint = get_text_fingerprint(content_with_links)
-            if fingerprint and fingerprint not in page_fingerprints:
-                # Ignorar textos muito curtos (provavelmente não são conteúdo relevante)
-                if len(content_with_links.strip()) > 10:
-                    page_body.append(content_with_links)
-                    page_fingerprints.add(fingerprint)
-    
+    for text in parser.blocks:
+        # Ignorar textos muito curtos (provavelmente não são conteúdo relevante)
+        if not text or len(text) <= 10:
+            continue
+        fingerprint = get_text_fingerprint(text)
+        if fingerprint and fingerprint not in page_fingerprints:
+            page_body.append(text)
+            page_fingerprints.add(fingerprint)
+
     # encontrar links com /node/ no href
     node_links = set()
-    for a in soup.find_all("a", href=True):
-        href = a['href']
-        full = urljoin(url, href)
-        full = normalize_url(full)
-        
-        if is_same_domain(full) and "node/" in full:
+    for href in set(parser.hrefs):
+        full = normalize_url(parser.resolve(href))
+        if is_same_domain(full, domain) and "node/" in full:
             node_links.add(full)
-    
+
     return {
-        "title": title,
+        "title": parser.title or url,
         "content": "\n".join(page_body),
         "node_links": node_links
     }
 
+def process_page_simple(html, url, domain=DOMAIN):
+    """Processa o HTML para extrair conteúdo e links"""
+    return extract_page(html, url, domain)
+
 def expand_all_elements(driver):
     """Expande todos os elementos clicáveis que possam conter conteúdo oculto"""
     try:
@@ -242,7 +384,7 @@ def expand_all_elements(driver):
     except Exception as e:
         print(f"  Erro ao expandir elementos: {e}")
 
-def process_page_with_selenium(driver, url):
+def process_page_with_selenium(driver, url, domain=DOMAIN):
     """Processa a página usando Selenium (com JavaScript)"""
     try:
         driver.get(url)
@@ -260,154 +402,329 @@ def process_page_with_selenium(driver, url):
         print("  Expandindo elementos...")
         expand_all_elements(driver)
         
-        # Obter o HTML final
-        html = driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # pegar título (se existir)
-        title_tag = soup.find("h1")
-        title = title_tag.get_text().strip() if title_tag else url
-        
-        # pegar texto (p, li, headings) com links preservados
-        page_body = []
-        page_fingerprints = set()  # Para evitar duplicatas na mesma página
-        
-        for tag in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'div.article-content', 'div.answer', 'div.content']):
-            # Ignorar elementos que estejam em menus de navegação ou rodapés
-            parent_classes = []
-            if tag.parent:
-                parent_classes = tag.parent.get('class', [])
-            
-            if parent_classes and any(cls in ['nav', 'navigation', 'menu', 'footer', 'header', 'sidebar'] for cls in parent_classes):
-                continue
-                
-            # Extrair texto preservando links
-            content_with_links = extract_text_with_links(tag)
-            if content_with_links:
-                # Verificar se é uma duplicata usando fingerprint
-                fingerprint = get_text_fingerprint(content_with_links)
-                if fingerprint and fingerprint not in page_fingerprints:
-                    # Ignorar textos muito curtos (provavelmente não são conteúdo relevante)
-                    if len(content_with_links.strip()) > 10:
-                        page_body.append(content_with_links)
-                        page_fingerprints.add(fingerprint)
-        
-        # encontrar links com /node/ no href
-        node_links = set()
-        for a in soup.find_all("a", href=True):
-            href = a['href']
-            full = urljoin(url, href)
-            full = normalize_url(full)
-            
-            if is_same_domain(full) and "node/" in full:
-                node_links.add(full)
-        
-        return {
-            "title": title,
-            "content": "\n".join(page_body),
-            "node_links": node_links
-        }
+        # Obter o HTML final, ignorando blocos dentro de menus de navegação e rodapés
+        return extract_page(driver.page_source, url, domain, SELENIUM_BLOCK_TAGS, SKIP_PARENT_CLASSES)
         
     except Exception as e:
         print(f"  Erro ao processar com Selenium: {e}")
         return None
 
-def main():
-    visited = set()
-    # Agora a fila armazena tuplas (url, profundidade)
-    to_visit = deque([(START_URL, 0)])
-    all_text = ""
+def result_hash(result):
+    """Hash do resultado extraído (título, conteúdo e links), usado para detectar artigos alterados"""
+    data = json.dumps([result["title"], result["content"], sorted(result["node_links"])], ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class CrawlState:
+    """
+    Estado persistente do crawl em SQLite. Guarda, por URL, os validadores HTTP (ETag/Last-Modified),
+    o hash do HTML e o resultado extraído, e a fronteira da BFS com o status de cada página, para
+    que um crawl interrompido continue de onde parou. Com path=":memory:" nada vai para o disco.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, html_hash TEXT,
+                result_hash TEXT, result TEXT, fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY, depth INTEGER, position INTEGER, status TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._position = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM frontier").fetchone()[0]
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def begin(self, start_url, max_depth, restart=False):
+        """Inicia um crawl ou retoma o anterior com os mesmos parâmetros. Retorna True se retomou."""
+        run = json.dumps([start_url, max_depth])
+        if not restart and self._meta("status") == "running" and self._meta("run") == run:
+            return True
+        with self.conn:
+            self.conn.execute("DELETE FROM frontier")
+            self._position = 0
+            self.add_links([start_url], 0)
+            self._set_meta("run", run)
+            self._set_meta("status", "running")
+        return False
+
+    def seen(self):
+        return {url for (url,) in self.conn.execute("SELECT url FROM frontier")}
+
+    def level(self, depth):
+        """Páginas de um nível, na ordem em que foram descobertas: [(url, status)]"""
+        return self.conn.execute(
+            "SELECT url, status FROM frontier WHERE depth = ? ORDER BY position", (depth,)
+        ).fetchall()
+
+    def pages(self, urls):
+        """Último resultado gravado de cada URL (as que nunca foram processadas com sucesso ficam de fora)"""
+        pages = {}
+        for url in urls:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, html_hash, result_hash, result FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row:
+                result = json.loads(row[4])
+                result["node_links"] = set(result["node_links"])
+                pages[url] = {"etag": row[0], "last_modified": row[1], "html_hash": row[2],
+                              "result_hash": row[3], "result": result}
+        return pages
+
+    def add_links(self, urls, depth):
+        for url in urls:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, depth, position, status) VALUES (?, ?, ?, NULL)",
+                (url, depth, self._position),
+            )
+            self._position += 1
+
+    def record(self, url, status, page=None, links=(), depth=0):
+        """Grava o resultado da página e os links que ela colocou na fronteira, numa só transação (checkpoint)"""
+        with self.conn:
+            if status == "removed":
+                self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            if page is not None:
+                result = dict(page["result"], node_links=sorted(page["result"]["node_links"]))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, etag, last_modified, html_hash, result_hash, result, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, page.get("etag"), page.get("last_modified"), page.get("html_hash"), page["result_hash"],
+                     json.dumps(result, ensure_ascii=False), time.time()),
+                )
+            self.add_links(links, depth + 1)
+            self.conn.execute("UPDATE frontier SET status = ? WHERE url = ?", (status, url))
+
+    def finish(self):
+        """Fecha o crawl: remove páginas que não foram mais alcançadas e retorna o relatório de mudanças."""
+        with self.conn:
+            removed = [url for (url,) in self.conn.execute(
+                "SELECT url FROM pages WHERE url NOT IN (SELECT url FROM frontier) ORDER BY url")]
+            self.conn.execute("DELETE FROM pages WHERE url NOT IN (SELECT url FROM frontier)")
+            self._set_meta("status", "complete")
+        changes = {"added": [], "changed": [], "unchanged": [], "failed": [], "removed": []}
+        for url, status in self.conn.execute("SELECT url, status FROM frontier WHERE status IS NOT NULL ORDER BY position"):
+            changes[status].append(url)
+        changes["removed"].extend(removed)
+        return changes
+
+    def close(self):
+        self.conn.close()
+
+def save_page(html, url, directory):
+    """Grava o HTML baixado (fixtures para o benchmark de extração)"""
+    name = re.sub(r"[^\w.-]+", "_", urlparse(url).netloc + urlparse(url).path).strip("_")
+    with open(os.path.join(directory, f"{name}.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+def fetch_and_process(url, domain, limiter, stored=None, save_html=None):
+    """
+    Baixa e processa uma página sem JavaScript (roda nas threads do pool). Com um resultado
+    anterior, faz GET condicional; se o servidor responder 304 ou o HTML for idêntico, o
+    resultado gravado é reaproveitado sem parsear de novo.
+    """
+    with limiter.slot(url):
+        status, html, etag, last_modified = fetch_page(
+            url, stored and stored["etag"], stored and stored["last_modified"])
+    if status == 304 and stored:
+        return dict(stored, not_modified=True)
+    if status in GONE_STATUS:
+        return {"result": None, "gone": True}
+    if html is None:
+        return None
+    if save_html:
+        save_page(html, url, save_html)
+    html_hash = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    if stored and stored["html_hash"] == html_hash:
+        return dict(stored, etag=etag, last_modified=last_modified, not_modified=True)
+    return {"result": process_page_simple(html, url, domain), "etag": etag, "last_modified": last_modified,
+            "html_hash": html_hash, "not_modified": False}
+
+def crawl(start_url=START_URL, max_depth=MAX_DEPTH, workers=8, max_per_host=4, min_interval=0.0, use_selenium=True,
+          state=None, restart=False, save_html=None):
+    """
+    BFS limitada por profundidade, um nível por vez: as páginas do nível são baixadas em paralelo
+    e entregues na ordem (ordenada) em que foram descobertas, então a saída não depende de qual
+    requisição termina antes. O fallback com Selenium roda na thread principal.
+
+    Com um CrawlState persistente, cada página processada é um checkpoint: ao retomar, as já
+    visitadas são reproduzidas do estado (sem rede) e o crawl continua na primeira pendente.
+
+    Gera tuplas (url, profundidade, resultado), com resultado None quando a página falhou.
+    """
+    state = state or CrawlState()
+    if save_html:
+        os.makedirs(save_html, exist_ok=True)
+    domain = urlparse(start_url).netloc
+    limiter = HostLimiter(max_per_host, min_interval)
+    if state.begin(start_url, max_depth, restart):
+        print("Retomando crawl interrompido a partir do checkpoint...")
+    seen = state.seen()
+    driver = None
+
+    def fetch(item):
+        url, stored = item
+        # A página inicial precisa de JavaScript: vai direto para o Selenium
+        if use_selenium and url == start_url:
+            return None
+        return fetch_and_process(url, domain, limiter, stored, save_html)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawler") as pool:
+            for depth in range(max_depth + 1):
+                level = state.level(depth)
+                if not level:
+                    break
+                stored = state.pages([url for url, _ in level])
+                pending = [url for url, status in level if status is None]
+                fetched = pool.map(fetch, [(url, stored.get(url)) for url in pending])
+
+                for url, status in level:
+                    if status is not None:
+                        # Já processada antes da interrupção
+                        yield url, depth, stored[url]["result"] if url in stored else None
+                        continue
+
+                    page = next(fetched)
+                    print(f"\nVisitando: {url} (Profundidade: {depth})")
+                    if page is not None and page.get("gone"):
+                        print("  Página não existe mais (404/410)")
+                    elif page is not None and page["not_modified"]:
+                        print("  Página não modificada, reaproveitando o resultado anterior")
+                    elif use_selenium and (url == start_url or page is None or not page["result"]["node_links"]):
+                        if url == start_url:
+                            print("  Usando Selenium para página inicial (requer JavaScript)")
+                        elif page is None:
+                            print("  Falha na abordagem simples. Usando Selenium...")
+                        else:
+                            print("  Nenhum link com node encontrado. Tentando com Selenium...")
+                        driver = driver or setup_driver()
+                        selenium_result = process_page_with_selenium(driver, url, domain)
+                        # Os validadores da requisição simples continuam valendo: num 304 o
+                        # resultado do Selenium é reaproveitado
+                        page = dict(page or {}, result=selenium_result) if selenium_result else None
+
+                    result = page["result"] if page else None
+                    previous = stored.get(url)
+                    new_links = []
+                    if page is None and previous is not None:
+                        # Falha transitória numa página que tínhamos: entrega o resultado anterior, senão
+                        # o artigo sumiria do corpus e a próxima sincronização apagaria seus pontos
+                        print("  Falha ao baixar, mantendo o resultado anterior")
+                        status, result = "failed", previous["result"]
+                    elif result is None:
+                        # 404/410 de uma página que tínhamos é remoção; de uma que nunca tivemos, link quebrado
+                        status = "removed" if page is not None and previous is not None else "failed"
+                        page = None
+                    else:
+                        page["result_hash"] = result_hash(result)
+                        if previous is None:
+                            status = "added"
+                        else:
+                            status = "unchanged" if previous["result_hash"] == page["result_hash"] else "changed"
+                    if result is not None and depth < max_depth:
+                        new_links = [link for link in sorted(result["node_links"]) if link not in seen]
+                        seen.update(new_links)
+                        print(f"  {len(new_links)} novos links com 'node' (Profundidade: {depth + 1})")
+                    state.record(url, status, page, new_links, depth)
+
+                    yield url, depth, result
+    finally:
+        if driver is not None:
+            driver.quit()
+
+def main(start_url=START_URL, max_depth=MAX_DEPTH, workers=8, max_per_host=4, min_interval=0.0, use_selenium=True,
+         output="faq_complete.txt", urls_output="node_urls.txt", state_path="crawl_state.sqlite",
+         changes_output="crawl_changes.json", restart=False, save_html=None, jsonl_output="faq_complete.jsonl"):
+    state = CrawlState(state_path or ":memory:")
+    visited = 0
     node_urls = set()
     global_fingerprints = set()  # Para evitar duplicatas globais
-    
-    driver = setup_driver()
-    
-    try:
-        while to_visit:
-            url, depth = to_visit.popleft()
-            if url in visited:
-                continue
-            
-            print(f"\nVisitando: {url} (Profundidade: {depth})")
-            visited.add(url)
-            
-            result = None
-            
-            # Se for a página inicial, usar Selenium diretamente
-            if url == START_URL:
-                print("  Usando Selenium para página inicial (requer JavaScript)")
-                result = process_page_with_selenium(driver, url)
-            else:
-                # Para outras páginas, tentar primeiro a abordagem simples
-                print("  Tentando abordagem simples (sem JavaScript)...")
-                html = fetch_simple(url)
-                
-                if html:
-                    result = process_page_simple(html, url)
-                    
-                    # Se não encontrou links com node, tentar com Selenium
-                    if not result["node_links"]:
-                        print("  Nenhum link com node encontrado. Tentando com Selenium...")
-                        result = process_page_with_selenium(driver, url)
-                else:
-                    print("  Falha na abordagem simples. Usando Selenium...")
-                    result = process_page_with_selenium(driver, url)
-            
+    start = time.perf_counter()
+
+    # Cada artigo vai direto para o disco (arquivo temporário trocado no final)
+    pages = crawl(start_url, max_depth, workers, max_per_host, min_interval, use_selenium,
+                  state=state, restart=restart, save_html=save_html)
+    with open(output + ".tmp", "w", encoding="utf-8") as out, open(jsonl_output + ".tmp", "w", encoding="utf-8") as jsonl:
+        for url, depth, result in pages:
+            visited += 1
             if not result:
                 print(f"  Não foi possível processar a página {url}")
                 continue
-            
+
             # Processar o conteúdo para evitar duplicatas
-            content_lines = result['content'].split('\n')
             unique_lines = []
-            
-            for line in content_lines:
+            for line in result['content'].split('\n'):
                 # Verificar se é uma duplicata usando fingerprint
                 fingerprint = get_text_fingerprint(line)
                 if fingerprint and fingerprint not in global_fingerprints:
                     unique_lines.append(line)  # Mantém o texto original com links
                     global_fingerprints.add(fingerprint)
-            
-            # Adicionar conteúdo ao all_text
+
             if unique_lines:  # Só adiciona se houver conteúdo único
-                all_text += f"\n\n=== {result['title']} ({url}) ===\n\n"
-                all_text += "\n".join(unique_lines)
-            
-            # Processar os links encontrados
-            page_node_links = len(result['node_links'])
-            print(f"  Estatísticas desta página: {page_node_links} links com node")
-            
-            # Só adicionar novos links se não atingimos a profundidade máxima
-            if depth < MAX_DEPTH:
-                for node_url in result['node_links']:
-                    node_urls.add(node_url)
-                    if node_url not in visited and not any(item[0] == node_url for item in to_visit):
-                        print(f"  [NOVO] Emcontrado link com 'node': {node_url} (Profundidade: {depth + 1})")
-                        to_visit.append((node_url, depth + 1))
-                    else:
-                        print(f"  [JÁ VISITADO] Link com 'node': {node_url}")
-            else:
-                print(f"  Profundidade máxima ({MAX_DEPTH}) atingida. Não adicionando novos links.")
-                
-    finally:
-        driver.quit()
-    
+                out.write(f"\n\n=== {result['title']} ({url}) ===\n\n")
+                out.write("\n".join(unique_lines))
+                # Mesmo artigo no corpus estruturado (um JSON por linha), com o hash que o indexador compara
+                record = article_record(url, result['title'], unique_lines, depth=depth)
+                jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            print(f"  Estatísticas desta página: {len(result['node_links'])} links com node")
+            if depth < max_depth:
+                node_urls.update(result['node_links'])
+
     # Salva o conteúdo completo
-    with open("faq_complete.txt", "w", encoding="utf-8") as f:
-        f.write(all_text)
-    
+    os.replace(output + ".tmp", output)
+    os.replace(jsonl_output + ".tmp", jsonl_output)
+
     # Salva apenas as URLs com node encontradas
-    with open("node_urls.txt", "w", encoding="utf-8") as f:
+    with open(urls_output, "w", encoding="utf-8") as f:
         for node_url in sorted(node_urls):
             f.write(f"{node_url}\n")
-    
+
+    # Artigos novos/alterados/removidos desde o último crawl, para a reindexação incremental
+    changes = state.finish()
+    state.close()
+    with open(changes_output, "w", encoding="utf-8") as f:
+        json.dump(changes, f, ensure_ascii=False, indent=2)
+
     print(f"\n=== ESTATÍSTICAS FINAIS ===")
-    print(f"Total de páginas visitadas: {len(visited)}")
+    print(f"Total de páginas visitadas: {visited} em {time.perf_counter() - start:.1f}s")
     print(f"Total de URLs únicas com node: {len(node_urls)}")
     print(f"Total de textos únicos extraídos: {len(global_fingerprints)}")
-    print(f"Profundidade máxima utilizada: {MAX_DEPTH}")
-    print(f"\nFeito! Salvo como faq_complete.txt")
-    print(f"URLs com node salvas em node_urls.txt")
+    print(f"Profundidade máxima utilizada: {max_depth}")
+    print(f"Artigos: {len(changes['added'])} novos, {len(changes['changed'])} alterados, "
+          f"{len(changes['removed'])} removidos, {len(changes['unchanged'])} inalterados, "
+          f"{len(changes['failed'])} com falha (detalhes em {changes_output})")
+    print(f"\nFeito! Salvo como {output} e {jsonl_output}")
+    print(f"URLs com node salvas em {urls_output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawler da central de ajuda da NetFlix")
+    parser.add_argument("--start-url", default=START_URL)
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--workers", type=int, default=8, help="Downloads simultâneos no total")
+    parser.add_argument("--max-per-host", type=int, default=4, help="Downloads simultâneos por host")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="Segundos entre requisições ao mesmo host")
+    parser.add_argument("--no-selenium", action="store_true", help="Não usar o fallback com Selenium")
+    parser.add_argument("--output", default="faq_complete.txt")
+    parser.add_argument("--jsonl-output", default="faq_complete.jsonl", help="Corpus estruturado (um artigo por linha)")
+    parser.add_argument("--urls-output", default="node_urls.txt")
+    parser.add_argument("--state", default="crawl_state.sqlite", help="Estado do crawl (cache e checkpoints)")
+    parser.add_argument("--no-state", action="store_true", help="Não ler nem gravar o estado do crawl")
+    parser.add_argument("--changes-output", default="crawl_changes.json")
+    parser.add_argument("--restart", action="store_true", help="Ignora um crawl interrompido e começa de novo")
+    parser.add_argument("--save-html", help="Pasta onde gravar o HTML baixado (fixtures do benchmark)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(args.start_url, args.max_depth, args.workers, args.max_per_host, args.min_interval,
+         not args.no_selenium, args.output, args.urls_output, None if args.no_state else args.state,
+         args.changes_output, args.restart, args.save_html, args.jsonl_output)
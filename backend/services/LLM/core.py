@@ -1,18 +1,46 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 import os
-from typing import List, Tuple
-from langchain.schema import HumanMessage
+from typing import Iterator, List, Optional, Tuple
+# langchain_core direto: langchain.schema reexporta a mesma classe, mas importa transformers (segundos)
+from langchain_core.messages import HumanMessage
+import time
+from .fake import FakeStreamingChatModel
+from ..RAG.corpus import ARTICLE_HEADER
+from .tokens import estimate_tokens
+from .prompt_builder import PromptBuilder
+from .provider import LLMUnavailableError, ResilientChatModel
+from ..metrics.metrics import metrics
 
 load_dotenv()
 
+FALLBACK_NO_DOCS = (
+    "No momento não consegui gerar uma resposta. Tente novamente em instantes; "
+    "posso ajudar com perguntas relacionadas à NetFlix."
+)
+
+
 class LLMCore:
-    def __init__(self):
-        self.model =  ChatGoogleGenerativeAI(
-            model="models/gemma-3-27b-it",
-            google_api_key=os.getenv("GOOGLE_API_KEY", "").strip(),
-            temperature=0.2
-        )
+    def __init__(self, model=None, prompt_builder=None, resilience=None):
+        """
+        Args:
+            model: Chat model with invoke/stream (defaults to Gemini, or the fake model when NEXFLIX_LLM=fake)
+            prompt_builder (PromptBuilder): Token-budgeted context assembly
+            resilience (dict | None): ResilientChatModel options; pass False to call the model directly
+        """
+        if model is None and os.getenv("NEXFLIX_LLM", "").strip().lower() == "fake":
+            model = FakeStreamingChatModel()
+        if model is None:
+            # Import pesado (vários segundos): só quando o Gemini é de fato usado
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            model = ChatGoogleGenerativeAI(
+                model="models/gemma-3-27b-it",
+                google_api_key=os.getenv("GOOGLE_API_KEY", "").strip(),
+                temperature=0.2,
+                max_retries=0,  # retries/prazos ficam a cargo do ResilientChatModel
+            )
+        self.model = model if resilience is False else ResilientChatModel(model, **(resilience or {}))
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.last_prompt_report = None
         return
     def _build_gemini_prompt(self, question: str, memory_text:str, context: str) -> str:
         """
@@ -49,26 +77,103 @@ DOCUMENTOS:
 ### USER
 Human: {question}
         """
-    def generate_response(self, question: str, memory: List, context_chunks: List[Tuple[str, float]]) -> dict:
-        context = "\n\n".join([chunk for (chunk,score) in context_chunks])
-        short_memory = memory[-7:-1] if len(memory) > 7 else (memory[:-1] if len(memory) > 1 else [])
-        if context:
-            docs = context.split("\n\n")
-            documents_str = "\n".join([f"Documento {i+1}: {doc}" for i, doc in enumerate(docs)])
-        else:
-            documents_str = "Nenhum documento encontrado."
-        memory_text = ''.join([f"{('User' if m['role']=='user' else 'Assistant')}: {m['content']}\n" for m in memory])
+    def _build_messages(self, question: str, memory: List, context_chunks: List[Tuple[str, float]]) -> List:
+        base_tokens = estimate_tokens(self._build_gemini_prompt(question, "", ""))
+        documents_str, memory_text, report = self.prompt_builder.build(question, memory, context_chunks, base_tokens)
+        self.last_prompt_report = report
         prompt = self._build_gemini_prompt(question, memory_text, documents_str)
+        if metrics.enabled:
+            metrics.observe("prompt_chars", len(prompt))
+            metrics.observe("prompt_tokens", report["prompt_tokens"])
+            metrics.observe("prompt_tokens_saved", report["tokens_saved"])
         print("Prompt para Gemini:\n", prompt)
+        return [HumanMessage(content=prompt)]
+
+    def generate_response(self, question: str, memory: List, context_chunks: List[Tuple[str, float]]) -> dict:
         # Generate response using Google Gemini
-        messages = [HumanMessage(content=prompt)]
-        response = self.model.invoke(messages)
-        response_text = response.content
+        with metrics.span("llm.build_prompt"):
+            messages = self._build_messages(question, memory, context_chunks)
+        fallback = False
+        try:
+            with metrics.span("llm.generate"):
+                response = self.model.invoke(messages)
+            response_text = response.content
+        except LLMUnavailableError as e:
+            print(f"LLM indisponível, usando resposta de fallback: {e}")
+            response_text = self.fallback_answer(context_chunks)
+            fallback = True
         
         # Extract references (original chunk texts)
         references = context_chunks
         
         return {
             "answer": response_text.strip(),
-            "references": references
-        }
\ No newline at end of file
+            "references": references,
+            "fallback": fallback
+        }
+
+    def stream_response(self, question: str, memory: List, context_chunks: List[Tuple[str, float]],
+                        outcome: Optional[dict] = None) -> Iterator[str]:
+        """
+        Yield the answer text as the model produces it.
+
+        Args:
+            question (str): User's question
+            memory (List): Conversation history
+            context_chunks (List): Retrieved (chunk, score) pairs
+            outcome (dict | None): Filled with {"fallback": bool} as the stream runs; True when the
+                LLM was unavailable and the retrieval-only answer was used
+
+        Returns:
+            Iterator[str]: Text fragments, in order
+        """
+        with metrics.span("llm.build_prompt"):
+            messages = self._build_messages(question, memory, context_chunks)
+        start = time.perf_counter()
+        first = True
+        if outcome is not None:
+            outcome["fallback"] = False
+        try:
+            with metrics.span("llm.stream"):
+                for chunk in self.model.stream(messages):
+                    content = chunk.content
+                    if isinstance(content, list):
+                        content = "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+                    if content:
+                        if first:
+                            metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm.first_token")
+                            first = False
+                        yield content
+        except LLMUnavailableError as e:
+            print(f"LLM indisponível, usando resposta de fallback: {e}")
+            if outcome is not None:
+                outcome["fallback"] = True
+            yield ("\n\n" if not first else "") + self.fallback_answer(context_chunks)
+
+    def fallback_answer(self, context_chunks: List[Tuple[str, float]], max_passages: int = 3, max_chars: int = 400) -> str:
+        """
+        Retrieval-only answer used when the LLM is unavailable (timeouts, retries exhausted, open circuit).
+
+        Args:
+            context_chunks (List): Retrieved (chunk, score) pairs
+            max_passages (int): How many passages to show
+            max_chars (int): Maximum characters per passage
+
+        Returns:
+            str: Answer listing the most relevant FAQ excerpts
+        """
+        metrics.inc("llm_fallbacks_total")
+        if not context_chunks:
+            return FALLBACK_NO_DOCS
+        passages, _ = self.prompt_builder.merge_passages([chunk for (chunk, score) in context_chunks])
+        lines = ["No momento não consegui gerar uma resposta completa, mas estes trechos da central de ajuda "
+                 "da NetFlix parecem responder à sua pergunta:"]
+        for passage in passages[:max_passages]:
+            header, _, body = passage.partition("\n") if passage.startswith("=== ") else ("", "", passage)
+            match = ARTICLE_HEADER.match(header)
+            title = f"**[{match.group('title')}]({match.group('url')})**: " if match else ""
+            excerpt = " ".join(body.split())
+            if len(excerpt) > max_chars:
+                excerpt = excerpt[:max_chars].rsplit(" ", 1)[0] + "..."
+            lines.append(f"- {title}{excerpt}")
+        return "\n".join(lines)
@@ -0,0 +1,61 @@
+import random
+import re
+import threading
+import time
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeStreamingChatModel:
+    """
+    Modelo de chat local e determinístico, com a mesma interface usada do ChatGoogleGenerativeAI
+    (invoke/stream). Serve para rodar o pipeline offline, em testes e benchmarks.
+
+    'first_token_delay' pode ser um número ou uma função sem argumentos (latência injetável);
+    'fail_first' faz as N primeiras chamadas falharem e 'fail_rate' sorteia falhas (seed fixa),
+    sempre com a exceção criada por 'error_factory'.
+    """
+
+    def __init__(self, answer=None, first_token_delay=0.0, token_delay=0.0, fail_first=0, fail_rate=0.0,
+                 error_factory=lambda: ConnectionError("Falha simulada do provedor"), seed=0):
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.fail_rate = fail_rate
+        self.error_factory = error_factory
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _start_call(self):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first or (self.fail_rate and self._random.random() < self.fail_rate)
+        delay = self.first_token_delay() if callable(self.first_token_delay) else self.first_token_delay
+        time.sleep(delay)
+        if fail:
+            raise self.error_factory()
+
+    def _answer_for(self, messages):
+        if self.answer is not None:
+            return self.answer
+        prompt = messages[-1].content
+        match = re.search(r"Human: (.*)", prompt)
+        question = match.group(1).strip() if match else ""
+        documents = len(re.findall(r"^Documento \d+:", prompt, flags=re.MULTILINE))
+        return f"Resposta simulada para '{question}' com base em {documents} documento(s)."
+
+    def invoke(self, messages):
+        return FakeMessage("".join(chunk.content for chunk in self.stream(messages)))
+
+    def stream(self, messages):
+        tokens = re.findall(r"\S+\s*", self._answer_for(messages))
+        self._start_call()
+        for i, token in enumerate(tokens):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield FakeMessage(token)
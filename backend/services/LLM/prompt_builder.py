@@ -0,0 +1,164 @@
+from typing import List, Optional, Tuple
+from ..RAG.corpus import ARTICLE_HEADER
+from .tokens import estimate_tokens
+
+
+def _split_header(chunk: str) -> Tuple[Optional[str], str]:
+    """Separa o cabeçalho '=== título (url) ===' que prefixa os chunks indexados por artigo."""
+    first_line, _, body = chunk.partition("\n")
+    if body and ARTICLE_HEADER.match(first_line.strip()):
+        return first_line.strip(), body
+    return None, chunk
+
+
+def _overlap(left: List[str], right: List[str], min_words: int, max_words: int) -> int:
+    """Maior k tal que as últimas k palavras de 'left' são as primeiras k de 'right'."""
+    for k in range(min(len(left), len(right), max_words), min_words - 1, -1):
+        if left[-k:] == right[:k]:
+            return k
+    return 0
+
+
+def _shingles(words: List[str], size: int) -> set:
+    words = [w.lower() for w in words]
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class PromptBuilder:
+    """
+    Monta DOCUMENTOS e MEMORY dentro de um orçamento de tokens de entrada.
+
+    Chunks vizinhos do mesmo artigo (que se sobrepõem pelo overlap do chunking) são unidos,
+    trechos quase duplicados são descartados e a memória é cortada por tokens, da mensagem
+    mais recente para a mais antiga.
+    """
+
+    def __init__(self, max_input_tokens=3500, max_memory_tokens=600, min_overlap_words=8,
+                 max_overlap_words=80, near_duplicate_threshold=0.8, shingle_size=5, min_passage_tokens=40):
+        self.max_input_tokens = max_input_tokens
+        self.max_memory_tokens = max_memory_tokens
+        self.min_overlap_words = min_overlap_words
+        self.max_overlap_words = max_overlap_words
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.shingle_size = shingle_size
+        self.min_passage_tokens = min_passage_tokens
+
+    def merge_passages(self, chunks: List[str]) -> Tuple[List[str], dict]:
+        """Une chunks sobrepostos/adjacentes e remove quase duplicatas, mantendo a ordem do ranking."""
+        passages = []  # [header, words]
+        merged = duplicates = 0
+        for chunk in chunks:
+            header, body = _split_header(chunk)
+            words = body.split()
+            if not words:
+                continue
+
+            absorbed = False
+            for passage in passages:
+                if passage[0] != header:
+                    continue
+                current = passage[1]
+                k = _overlap(current, words, self.min_overlap_words, self.max_overlap_words)
+                if k:
+                    passage[1] = current + words[k:]
+                    absorbed = True
+                    break
+                k = _overlap(words, current, self.min_overlap_words, self.max_overlap_words)
+                if k:
+                    passage[1] = words + current[k:]
+                    absorbed = True
+                    break
+            if absorbed:
+                merged += 1
+                continue
+
+            candidate = _shingles(words, self.shingle_size)
+            duplicate = False
+            for passage in passages:
+                existing = _shingles(passage[1], self.shingle_size)
+                smaller = min(len(candidate), len(existing))
+                if smaller and len(candidate & existing) / smaller >= self.near_duplicate_threshold:
+                    duplicate = True
+                    break
+            if duplicate:
+                duplicates += 1
+                continue
+            passages.append([header, words])
+
+        texts = [(f"{header}\n" if header else "") + " ".join(words) for header, words in passages]
+        return texts, {"merged_chunks": merged, "dropped_duplicates": duplicates}
+
+    def memory_lines(self, memory: List[dict], question: str, budget: int) -> List[str]:
+        """Mensagens mais recentes que cabem em 'budget' tokens, em ordem cronológica."""
+        history = list(memory)
+        # O app já inclui a pergunta atual como última mensagem; ela vai na seção USER
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == question:
+            history = history[:-1]
+
+        lines, used = [], 0
+        for message in reversed(history):
+            line = f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}\n"
+            tokens = estimate_tokens(line)
+            if used + tokens > budget:
+                break
+            lines.append(line)
+            used += tokens
+        lines.reverse()
+        return lines
+
+    def build(self, question: str, memory: List[dict], context_chunks: List[Tuple[str, float]],
+              base_tokens: int) -> Tuple[str, str, dict]:
+        """
+        Retorna (documents_str, memory_text, report). 'base_tokens' é o custo fixo do template
+        com a pergunta; o restante do orçamento vai primeiro para os documentos, por ranking.
+        """
+        chunks = [chunk for (chunk, score) in context_chunks]
+        passages, report = self.merge_passages(chunks)
+
+        budget = max(0, self.max_input_tokens - base_tokens)
+        memory_budget = min(self.max_memory_tokens, budget // 4)
+        documents_budget = budget - memory_budget
+
+        documents, used, truncated, dropped = [], 0, 0, 0
+        for passage in passages:
+            line = f"Documento {len(documents) + 1}: {passage}"
+            tokens = estimate_tokens(line)
+            if used + tokens > documents_budget:
+                remaining = documents_budget - used - estimate_tokens(" [...]")
+                if remaining < self.min_passage_tokens:
+                    dropped += 1
+                    continue
+                kept, tokens = [], 0
+                for word in line.split(" "):
+                    word_tokens = estimate_tokens(word)
+                    if tokens + word_tokens > remaining:
+                        break
+                    kept.append(word)
+                    tokens += word_tokens
+                line = " ".join(kept) + " [...]"
+                tokens = estimate_tokens(line)
+                truncated += 1
+            documents.append(line)
+            used += tokens
+        documents_str = "\n".join(documents) if documents else "Nenhum documento encontrado."
+
+        # Sobra dos documentos pode ser usada pela memória, sempre respeitando o teto próprio
+        memory_budget = min(self.max_memory_tokens, budget - used)
+        memory_lines = self.memory_lines(memory, question, memory_budget)
+        memory_text = "".join(memory_lines)
+
+        naive_tokens = base_tokens + sum(estimate_tokens(chunk) for chunk in chunks) + sum(
+            estimate_tokens(f"{m['role']}: {m['content']}\n") for m in memory)
+        prompt_tokens = base_tokens + used + estimate_tokens(memory_text)
+        report.update({
+            "passages": len(documents),
+            "truncated_passages": truncated,
+            "dropped_for_budget": dropped,
+            "memory_messages": len(memory_lines),
+            "prompt_tokens": prompt_tokens,
+            "naive_tokens": naive_tokens,
+            "tokens_saved": max(0, naive_tokens - prompt_tokens),
+        })
+        return documents_str, memory_text, report
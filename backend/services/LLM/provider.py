@@ -0,0 +1,307 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from ..metrics.metrics import metrics
+
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "TooManyRequests", "Aborted", "Unavailable", "ChatGoogleGenerativeAIError",
+}
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """O provedor não respondeu dentro da política (prazo, retries ou circuit breaker)."""
+
+
+class LLMTimeoutError(LLMUnavailableError, TimeoutError):
+    pass
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(exc):
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class TokenBucket:
+    """Limita a taxa de chamadas: 'rate' tokens por segundo, com rajada de até 'capacity'."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                wait_for = self._try_take()
+            if wait_for == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+
+    def try_acquire(self):
+        with self._lock:
+            return self._try_take() == 0.0
+
+    def refund(self):
+        """Devolve um token tirado por uma chamada que acabou não acontecendo."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Abre após 'failure_threshold' falhas seguidas; depois de 'reset_timeout' deixa uma única
+    chamada de teste passar (half-open) e recusa as demais até ela registrar sucesso ou falha.
+    Toda chamada liberada por before_call deve terminar em record_success ou record_failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Circuit breaker aberto para o provedor de LLM")
+                self.state = "half-open"
+            elif self.state == "half-open" and self._probing:
+                raise CircuitOpenError("Circuit breaker em teste: aguardando a chamada de prova")
+            if self.state == "half-open":
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half-open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    metrics.inc("llm_circuit_open_total")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class ResilientChatModel:
+    """
+    Envolve um modelo de chat (invoke/stream) com prazo por chamada, retries com backoff
+    exponencial em erros transitórios, limite global de concorrência, token bucket,
+    requisição hedge opcional (após o p95 observado) e circuit breaker.
+
+    Chamadas que estouram o prazo continuam na thread de trabalho até o provedor responder
+    (não dá para cancelá-las), mas ocupam o semáforo até lá, então a concorrência real
+    nunca passa de 'max_concurrency'.
+    """
+
+    def __init__(self, model, timeout=30.0, max_retries=2, backoff_base=0.5, backoff_max=8.0,
+                 max_concurrency=8, rate_per_second=None, burst=None, hedge=False, hedge_min_samples=20,
+                 stream_idle_timeout=15.0, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.stream_idle_timeout = stream_idle_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm")
+        self._latencies = deque(maxlen=200)
+        self._latency_lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        with self._latency_lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _acquire(self, deadline, block=True):
+        """Reserva um token de taxa e uma vaga de concorrência até o prazo."""
+        if self.bucket is not None:
+            ok = self.bucket.acquire(max(0.0, deadline - time.monotonic())) if block else self.bucket.try_acquire()
+            if not ok:
+                return False
+        if block:
+            acquired = self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired and self.bucket is not None:
+            self.bucket.refund()  # sem vaga, a chamada não acontece: o token volta para o bucket
+        return acquired
+
+    def _call(self, messages):
+        start = time.perf_counter()
+        try:
+            result = self.model.invoke(messages)
+        finally:
+            self._semaphore.release()
+        with self._latency_lock:
+            self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def _attempt(self, messages, deadline):
+        if not self._acquire(deadline):
+            raise LLMTimeoutError("Sem vaga/limite de taxa para chamar o LLM dentro do prazo")
+        futures = {self._executor.submit(self._call, messages)}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None:
+            done, _ = wait(futures, timeout=min(hedge_delay, max(0.0, deadline - time.monotonic())))
+            if not done and self._acquire(deadline, block=False):
+                metrics.inc("llm_hedged_requests_total")
+                futures.add(self._executor.submit(self._call, messages))
+
+        last_error = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, futures = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        if last_error is not None and not futures:
+            raise last_error
+        raise LLMTimeoutError(f"LLM não respondeu em {self.timeout:.1f}s")
+
+    def _record_error(self, exc):
+        # Erro não transitório (pedido inválido etc.): o provedor respondeu, então conta como sucesso
+        if is_retryable(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _retry_or_raise(self, exc, attempt, deadline):
+        """Registra o erro no breaker e espera o backoff, ou levanta se não vale tentar de novo."""
+        self._record_error(exc)
+        if not is_retryable(exc):
+            raise exc
+        delay = self._backoff(attempt)
+        if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+            if isinstance(exc, LLMUnavailableError):
+                raise exc
+            raise LLMUnavailableError(f"LLM indisponível após {attempt} tentativa(s): {exc}") from exc
+        metrics.inc("llm_retries_total")
+        time.sleep(delay)
+        self.breaker.before_call()
+
+    def invoke(self, messages):
+        deadline = time.monotonic() + self.timeout
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._attempt(messages, deadline)
+            except Exception as exc:
+                self._retry_or_raise(exc, attempt, deadline)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _stream_attempt(self, messages, deadline):
+        if not self._acquire(deadline):
+            raise LLMTimeoutError("Sem vaga/limite de taxa para chamar o LLM dentro do prazo")
+        chunks = queue.Queue()
+
+        def produce():
+            try:
+                for chunk in self.model.stream(messages):
+                    chunks.put(("chunk", chunk))
+                chunks.put(("done", None))
+            except Exception as exc:
+                chunks.put(("error", exc))
+            finally:
+                self._semaphore.release()
+
+        self._executor.submit(produce)
+        timeout = max(0.0, deadline - time.monotonic())  # o prazo vale até o primeiro token
+        while True:
+            try:
+                kind, value = chunks.get(timeout=timeout)
+            except queue.Empty:
+                raise LLMTimeoutError("LLM parou de enviar tokens dentro do prazo")
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+            timeout = self.stream_idle_timeout
+
+    def stream(self, messages):
+        deadline = time.monotonic() + self.timeout
+        self.breaker.before_call()
+        attempt = 0
+        settled = False
+        try:
+            while True:
+                attempt += 1
+                started = False
+                try:
+                    for chunk in self._stream_attempt(messages, deadline):
+                        started = True
+                        yield chunk
+                except Exception as exc:
+                    settled = True  # os dois caminhos abaixo registram o erro no breaker
+                    if started:
+                        # Já entregamos texto: repetir duplicaria a resposta
+                        self._record_error(exc)
+                        if is_retryable(exc) and not isinstance(exc, LLMUnavailableError):
+                            raise LLMUnavailableError(f"LLM interrompeu a resposta: {exc}") from exc
+                        raise
+                    self._retry_or_raise(exc, attempt, deadline)
+                    settled = False
+                    continue
+                self.breaker.record_success()
+                settled = True
+                return
+        finally:
+            if not settled:
+                # Quem consumia o stream parou no meio: o provedor estava respondendo
+                self.breaker.record_success()
@@ -0,0 +1,12 @@
+import math
+import re
+
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Estimativa barata de tokens (sem tokenizer): cada pontuação conta 1 e cada palavra
+    ~1 token a cada 4 caracteres, próximo do que o SentencePiece do Gemma faz em português.
+    """
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in TOKEN_PIECE.findall(text))
@@ -0,0 +1,124 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+# Cabeçalho gerado pelo web_scraping.py para cada artigo: "=== Título (URL) ==="
+ARTICLE_HEADER = re.compile(r"^=== (?P<title>.*) \((?P<url>https?://\S+)\) ===$")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def preferred_corpus(path):
+    """Usa a versão JSONL do corpus (mesmo nome, extensão .jsonl) quando ela existe."""
+    jsonl_path = os.path.splitext(path)[0] + ".jsonl"
+    return jsonl_path if os.path.exists(jsonl_path) else path
+
+
+def iter_articles(path):
+    """Gera um dict por artigo (url, title, content, content_hash, ...) do corpus em texto ou JSONL."""
+    if path.endswith(".jsonl"):
+        return iter_jsonl_articles(path)
+    return iter_text_articles(path)
+
+
+def iter_jsonl_articles(path):
+    """
+    Lê o corpus JSONL (um artigo por linha: url, title, blocks, content_hash e metadados extras).
+    Só o artigo atual fica em memória; campos extras seguem no dict e vão para os payloads.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            blocks = record.pop("blocks", [])
+            content = "\n".join(blocks).strip()
+            if not content:
+                continue
+            record["content"] = content
+            record.setdefault("content_hash", content_hash(content))
+            yield record
+
+
+def article_record(url, title, blocks, **metadata):
+    """Registro JSONL de um artigo; o hash é o mesmo que iter_text_articles calcularia."""
+    return {"url": url, "title": title, "blocks": blocks, "content_hash": content_hash("\n".join(blocks).strip()),
+            **metadata}
+
+
+def write_jsonl(articles, path):
+    """Grava artigos (dicts de iter_articles) como corpus JSONL."""
+    with open(path, "w", encoding="utf-8") as f:
+        for article in articles:
+            article = dict(article)
+            blocks = article.pop("content").split("\n")
+            article.pop("content_hash", None)
+            record = article_record(article.pop("url"), article.pop("title"), blocks, **article)
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def iter_text_articles(path):
+    """Lê o corpus em texto linha a linha e gera um dict por artigo (url, title, content, content_hash)."""
+    title = url = None
+    lines = []
+
+    def build():
+        content = "\n".join(lines).strip()
+        if url is None or not content:
+            return None
+        return {"url": url, "title": title, "content": content, "content_hash": content_hash(content)}
+
+    with open(path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            line = raw_line.rstrip()
+            match = ARTICLE_HEADER.match(line)
+            if match:
+                article = build()
+                if article:
+                    yield article
+                title, url = match.group("title"), match.group("url")
+                lines = []
+            else:
+                lines.append(line)
+
+    article = build()
+    if article:
+        yield article
+
+
+def chunk_text_by_words(text, chunk_size, overlap):
+    """Divide texto em chunks de 'chunk_size' palavras, com sobreposição de 'overlap'."""
+    words = text.split()
+    chunks = []
+    start = 0
+
+    while start < len(words):
+        end = start + chunk_size
+        chunk = " ".join(words[start:end])
+        chunks.append(chunk)
+        start += chunk_size - overlap
+
+    return chunks
+
+
+def chunk_article(article, chunk_size, overlap):
+    """Chunks de um artigo, cada um prefixado pelo cabeçalho original (título e URL)."""
+    header = f"=== {article['title']} ({article['url']}) ==="
+    return [f"{header}\n{chunk}" for chunk in chunk_text_by_words(article["content"], chunk_size, overlap)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte o corpus em texto (=== título (url) ===) para JSONL")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+    write_jsonl(iter_articles(args.source), args.target)
+    print(f"✅ Corpus convertido para {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,138 @@
+import hashlib
+import time
 import uuid
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .corpus import chunk_article
+from .encoder_registry import get_encoder
+from .parallel_encoder import ParallelEncoder
+
+
+def point_id(*parts):
+    """ID determinístico (UUID5) para um ponto, derivado das partes que o identificam."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "#".join(str(p) for p in parts)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 class DocumentIndexer:
-    def __init__(self, db_manager, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, db_manager, model_name="all-MiniLM-L6-v2", cache=None, batch_size=256, workers=1,
+                 encode_batch_size=64):
         self.db_manager = db_manager
-        self.encoder = SentenceTransformer(model_name)
-
-    def add_documents(self, texts):
-        vectors = self.encoder.encode(texts, show_progress_bar=True).tolist()
-
-        self.db_manager.client.upsert(
-            collection_name=self.db_manager.collection_name,
-            points=[
-                models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=vectors[i],
-                    payload={"text": texts[i]}
-                )
-                for i in range(len(texts))
-            ],
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = batch_size
+        self.workers = workers
+        self.encode_batch_size = encode_batch_size
+        self._pool = None
+
+    @property
+    def encoder(self):
+        """Modelo do processo ou, com workers > 1, um pool de processos com uma cópia do modelo cada."""
+        if self.workers <= 1:
+            return get_encoder(self.model_name)
+        if self._pool is None:
+            self._pool = ParallelEncoder(self.model_name, self.workers, self.encode_batch_size)
+        return self._pool
+
+    def close(self):
+        """Encerra o pool de workers de embedding, se houver."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def add_documents(self, texts, ids=None, payloads=None, batch_size=None):
+        """Indexa chunks de qualquer iterável (lista ou gerador); ids e payloads são opcionais."""
+        return self.add_records(self._records(texts, ids, payloads), batch_size=batch_size)
+
+    def add_records(self, records, batch_size=None):
+        """
+        Indexa tuplas (id, texto, payload) em lotes de 'batch_size'.
+
+        O upsert do lote N roda em outra thread enquanto o lote N+1 é embedado, e só esses
+        dois lotes ficam em memória. Retorna contagem, tempo e throughput (chunks/s).
+        """
+        batch_size = batch_size or self.batch_size
+        total = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=1) as upserter:
+            pending = None
+            for batch in batched(records, batch_size):
+                vectors = self.encode([text for _, text, _ in batch])
+                if pending is not None:
+                    pending.result()
+                pending = upserter.submit(self._upsert_batch, batch, vectors)
+                total += len(batch)
+            if pending is not None:
+                pending.result()
+
+        elapsed = time.perf_counter() - start
+        stats = {"chunks": total, "seconds": elapsed, "chunks_per_s": total / elapsed if elapsed else 0.0}
+        print(f"📥 {total} documentos indexados com sucesso ({stats['chunks_per_s']:.1f} chunks/s).")
+        return stats
+
+    @staticmethod
+    def _records(texts, ids, payloads):
+        ids = iter(ids) if ids is not None else None
+        payloads = iter(payloads) if payloads is not None else None
+        for i, text in enumerate(texts):
+            record_id = next(ids) if ids is not None else point_id(i, hashlib.sha256(text.encode("utf-8")).hexdigest())
+            payload = next(payloads) if payloads is not None else {"text": text}
+            yield record_id, text, payload
+
+    def _upsert_batch(self, batch, vectors):
+        self.db_manager.upsert(
+            [record_id for record_id, _, _ in batch],
+            vectors.tolist(),
+            [payload for _, _, payload in batch],
         )
-        print(f"📥 {len(texts)} documentos indexados com sucesso.")
+
+    def encode(self, texts):
+        """Embeddings dos textos; com cache, só os chunks inéditos passam pelo modelo."""
+        if self.cache is None:
+            return self.encoder.encode(texts, show_progress_bar=False)
+        return self.cache.encode(texts, lambda missing: self.encoder.encode(missing, show_progress_bar=False))
+
+    def sync_articles(self, articles, chunk_size, overlap):
+        """
+        Sincroniza a collection com os artigos do corpus (modo incremental).
+
+        Artigos com o mesmo content_hash já indexado são ignorados; novos ou alterados são
+        (re)indexados e os que sumiram do corpus têm seus pontos removidos. Só o diff é embedado,
+        e os artigos são consumidos em streaming (só os chunks do lote atual ficam em memória).
+        """
+        existing = self.db_manager.article_hashes()
+        seen = set()
+        changed = {}
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+
+        def changed_chunks():
+            for article in articles:
+                url, article_hash = article["url"], article["content_hash"]
+                seen.add(url)
+                if existing.get(url) == article_hash:
+                    counts["unchanged"] += 1
+                    continue
+                counts["updated" if url in existing else "added"] += 1
+                changed[url] = article_hash
+                # Metadados do artigo (url, title, content_hash e extras do JSONL) vão para cada chunk
+                metadata = {key: value for key, value in article.items() if key != "content"}
+                for i, chunk in enumerate(chunk_article(article, chunk_size, overlap)):
+                    yield point_id(url, article_hash, i), chunk, {**metadata, "text": chunk, "chunk": i}
+
+        ingest = self.add_records(changed_chunks())
+
+        # Os chunks antigos só saem depois que os novos foram gravados
+        removed = [url for url in existing if url not in seen]
+        self.db_manager.delete_articles(removed)
+        self.db_manager.delete_outdated({url: article_hash for url, article_hash in changed.items() if url in existing})
+
+        stats = {**counts, "removed": len(removed), "chunks": ingest["chunks"]}
+        print(f"🔄 Artigos: {stats['added']} novos, {stats['updated']} alterados, "
+              f"{stats['removed']} removidos, {stats['unchanged']} inalterados ({stats['chunks']} chunks embedados).")
+        return stats
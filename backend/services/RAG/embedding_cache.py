@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import numpy as np
+
+KEY_SIZE = 16  # bytes por chave (blake2b-128 do texto normalizado)
+DEFAULT_PATH = "backend/data/embedding_cache"
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings por (modelo, hash do chunk normalizado).
+
+    Cada modelo tem um diretório com um arquivo de vetores append-only, lido via memmap,
+    e um índice compacto de chaves de 16 bytes (a linha i do índice é a linha i da matriz).
+
+    compact() grava os dois arquivos numa pasta de geração nova e só então troca o ponteiro
+    CURRENT com um rename atômico: uma interrupção no meio nunca junta vetores compactados
+    com chaves antigas (o que devolveria o vetor de outro texto).
+    """
+
+    def __init__(self, model_name, dim, path=DEFAULT_PATH, dtype="float32"):
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.dir = os.path.join(path, re.sub(r"[^\w.-]", "_", model_name))
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._load()
+
+    def _current_generation(self):
+        """Geração apontada por CURRENT; "" é o formato antigo, com os arquivos na própria pasta."""
+        try:
+            with open(os.path.join(self.dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _set_generation(self, generation):
+        self.generation = generation
+        data_dir = os.path.join(self.dir, generation)
+        self.vectors_path = os.path.join(data_dir, f"vectors.{self.dtype.name}")
+        self.keys_path = os.path.join(data_dir, "keys.bin")
+
+    def _remove_generations(self, keep):
+        """Apaga as gerações fora de 'keep' ("" são os arquivos do formato antigo)."""
+        for entry in os.scandir(self.dir):
+            if entry.is_dir() and entry.name.startswith(GENERATION_PREFIX) and entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        if "" not in keep:
+            for name in (f"vectors.{self.dtype.name}", "keys.bin"):
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                except OSError:
+                    pass
+
+    def _load(self):
+        meta = {"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name}
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stored = None
+        if stored != meta:
+            # Dimensão/dtype diferentes tornam os vetores gravados inúteis: recomeça o cache
+            current_path = os.path.join(self.dir, CURRENT_FILE)
+            if os.path.exists(current_path):
+                os.remove(current_path)
+            self._remove_generations(keep=())
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        self._set_generation(self._current_generation())
+
+        row_bytes = self.dim * self.dtype.itemsize
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                keys = f.read()
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+
+        # Um append interrompido pode deixar um arquivo maior que o outro: trunca no menor
+        rows = min(len(keys) // KEY_SIZE, vectors_size // row_bytes)
+        if len(keys) != rows * KEY_SIZE:
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(rows * KEY_SIZE)
+        if vectors_size != rows * row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+
+        self._index = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(rows)}
+        self._rows = rows
+        self._vectors = None
+
+    def _matrix(self):
+        if self._vectors is None and self._rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dim))
+        return self._vectors
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_many(self, keys):
+        """Retorna uma lista com o vetor (float32) de cada chave, ou None quando não está no cache."""
+        with self._lock:
+            rows = [self._index.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            if not found:
+                return [None] * len(keys)
+            matrix = np.asarray(self._matrix()[found], dtype=np.float32)
+        it = iter(matrix)
+        return [None if row is None else next(it) for row in rows]
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=self.dtype).reshape(len(keys), self.dim)
+        with self._lock:
+            new = [(key, i) for i, key in enumerate(keys) if key not in self._index]
+            if not new:
+                return
+            # vetores primeiro, chaves depois: uma chave nunca aponta para um vetor não gravado
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[[i for _, i in new]].tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(key for key, _ in new))
+            for offset, (key, _) in enumerate(new):
+                self._index[key] = self._rows + offset
+            self._rows += len(new)
+            self._vectors = None
+
+    def encode(self, texts, encode_fn):
+        """
+        Retorna os embeddings de 'texts' (matriz float32), chamando 'encode_fn' só para os
+        textos que não estão no cache.
+        """
+        keys = [text_key(text) for text in texts]
+        cached = self.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+        misses = sum(1 for vector in cached if vector is None)
+        self.hits += len(texts) - misses
+        self.misses += misses
+
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self.put_many(list(missing.keys()), encoded)
+            fresh = dict(zip(missing.keys(), encoded))
+            cached = [fresh[key] if vector is None else vector for key, vector in zip(keys, cached)]
+
+        return np.stack(cached) if cached else np.zeros((0, self.dim), dtype=np.float32)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "entries": len(self._index),
+            "rows": self._rows,
+            "bytes": self._rows * (self.dim * self.dtype.itemsize + KEY_SIZE),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def compact(self, keep_texts=None):
+        """
+        Reescreve o cache sem linhas duplicadas e, se 'keep_texts' for informado, só com os
+        vetores desses textos. Retorna (linhas antes, linhas depois).
+        """
+        with self._lock:
+            before = self._rows
+            keep = None if keep_texts is None else {text_key(text) for text in keep_texts}
+            entries = [(key, row) for key, row in self._index.items() if keep is None or key in keep]
+            entries.sort(key=lambda entry: entry[1])
+            matrix = self._matrix()
+
+            previous = self.generation
+            number = int(previous[len(GENERATION_PREFIX):]) + 1 if previous.startswith(GENERATION_PREFIX) else 1
+            generation = f"{GENERATION_PREFIX}{number:06d}"
+            data_dir = os.path.join(self.dir, generation)
+            shutil.rmtree(data_dir, ignore_errors=True)  # resto de uma compactação interrompida
+            os.makedirs(data_dir)
+            with open(os.path.join(data_dir, f"vectors.{self.dtype.name}"), "wb") as f:
+                for start in range(0, len(entries), 4096):
+                    rows = [row for _, row in entries[start:start + 4096]]
+                    f.write(np.asarray(matrix[rows], dtype=self.dtype).tobytes())
+            with open(os.path.join(data_dir, "keys.bin"), "wb") as f:
+                f.write(b"".join(key for key, _ in entries))
+
+            current_path = os.path.join(self.dir, CURRENT_FILE)
+            with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(generation + "\n")
+            os.replace(current_path + ".tmp", current_path)
+
+            # Libera o memmap antes de apagar a geração antiga
+            self._vectors = None
+            del matrix
+            self._remove_generations(keep=(generation,))
+            self._load()
+            return before, self._rows
+
+
+def main():
+    from .corpus import iter_articles, chunk_article
+
+    parser = argparse.ArgumentParser(description="Utilitários do cache de embeddings")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--corpus", help="Mantém só os chunks deste corpus ao compactar")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.model, args.dim, path=args.path, dtype=args.dtype)
+    if args.command == "compact":
+        keep = None
+        if args.corpus:
+            keep = [chunk for article in iter_articles(args.corpus)
+                    for chunk in chunk_article(article, args.chunk_size, args.overlap)]
+        before, after = cache.compact(keep)
+        print(f"🧹 Cache compactado: {before} -> {after} vetores.")
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
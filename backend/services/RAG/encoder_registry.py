@@ -0,0 +1,26 @@
+import threading
+
+_encoders = {}
+_lock = threading.Lock()
+
+
+def get_encoder(model_name):
+    """
+    Retorna o SentenceTransformer do processo para 'model_name', carregando-o no primeiro uso.
+
+    Indexer e Retriever compartilham a mesma instância; o lock garante que sessões
+    concorrentes não carreguem o modelo duas vezes.
+    """
+    encoder = _encoders.get(model_name)
+    if encoder is None:
+        with _lock:
+            encoder = _encoders.get(model_name)
+            if encoder is None:
+                from sentence_transformers import SentenceTransformer
+                encoder = SentenceTransformer(model_name)
+                _encoders[model_name] = encoder
+    return encoder
+
+
+def is_loaded(model_name):
+    return model_name in _encoders
@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from ..metrics.metrics import metrics
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 2.0
+
+
+def batching_from_env():
+    """
+    Opções de micro-batching das consultas: NEXFLIX_QUERY_BATCH_MS (espera máxima, em ms) e
+    NEXFLIX_QUERY_BATCH_SIZE. NEXFLIX_QUERY_BATCH_SIZE=1 desliga (retorna False).
+    """
+    max_batch_size = int(os.getenv("NEXFLIX_QUERY_BATCH_SIZE", str(DEFAULT_MAX_BATCH_SIZE)))
+    if max_batch_size <= 1:
+        return False
+    return {"max_batch_size": max_batch_size,
+            "max_wait_ms": float(os.getenv("NEXFLIX_QUERY_BATCH_MS", str(DEFAULT_MAX_WAIT_MS)))}
+
+
+class MicroBatcher:
+    """
+    Junta chamadas concorrentes de 'fn' em lotes. Cada chamador envia um item e recebe o seu
+    resultado; uma thread dedicada pega o primeiro item, recolhe os que chegarem em até
+    'max_wait_ms' (ou até 'max_batch_size') e chama fn(lista de itens) uma vez, que deve
+    devolver os resultados na mesma ordem. Um erro em fn é repassado a todos do lote, e os
+    itens que ficarem sem resultado (fn devolveu menos que o lote) recebem RuntimeError.
+
+    A espera só acontece quando o lote anterior teve mais de um item: sem concorrência, o item
+    segue na hora (um usuário sozinho não paga 'max_wait_ms'), e os que chegam enquanto fn roda
+    formam o próximo lote. Registra os histogramas batch_size e batch_queue_wait_seconds
+    (label batcher='name').
+    """
+
+    def __init__(self, fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, name="batch"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._last_size = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        """Enfileira 'item' e devolve um Future com o resultado."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        linger = self._last_size > 1
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter() if linger else 0
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._last_size = len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if metrics.enabled:
+                now = time.perf_counter()
+                metrics.observe("batch_size", len(batch), batcher=self.name)
+                for _, _, enqueued in batch:
+                    metrics.observe("batch_queue_wait_seconds", now - enqueued, batcher=self.name)
+            try:
+                results = list(self.fn([item for item, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            # Sem isso, quem ficou sem resultado esperaria no Future para sempre
+            for _, future, _ in batch[len(results):]:
+                future.set_exception(RuntimeError(
+                    f"Lote '{self.name}': {len(results)} resultado(s) para {len(batch)} item(ns)"))
@@ -0,0 +1,221 @@
+import argparse
+import json
+import re
+import zlib
+import numpy as np
+from .corpus import content_hash, iter_articles, write_jsonl
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+MARKDOWN_LINK = re.compile(r"\[([^\]]+)\]\([^)]+\)")
+WORD = re.compile(r"\w+")
+
+
+def words_of(text):
+    """Palavras normalizadas para comparação (links [texto](url) contam só pelo texto)."""
+    return WORD.findall(MARKDOWN_LINK.sub(r"\1", text).lower())
+
+
+def lsh_bands(threshold, num_perm):
+    """
+    Escolhe (bandas, linhas por banda) para o LSH. O limiar efetivo do banding, (1/b)^(1/r),
+    fica um pouco abaixo do pedido para favorecer o recall; a similaridade é confirmada depois.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.05:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """Assinaturas MinHash sobre shingles de palavras, com permutações (a*x + b) mod p vetorizadas."""
+
+    def __init__(self, num_perm=128, shingle_size=4, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, words):
+        """Assinatura (uint32, num_perm) das palavras, ou None se não houver palavras."""
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        # crc32 é determinístico entre processos (o hash() do Python não é)
+        shingles = {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        permuted = (hashes[:, None] * self._a + self._b) % MERSENNE_PRIME
+        return (permuted.min(axis=0) & MAX_HASH).astype(np.uint32)
+
+
+class LSHIndex:
+    """Índice LSH por bandas: só itens que colidem em alguma banda são comparados."""
+
+    def __init__(self, threshold, num_perm):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+
+    def _keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, signature, accept=None):
+        """
+        (chave, similaridade estimada) do item indexado mais parecido acima do limiar, ou None.
+        'accept(chave)' pode vetar candidatos (ex.: quando o item novo traz informação própria).
+        """
+        candidates = set()
+        for band, key in self._keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        best = None
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                if accept is None or accept(candidate):
+                    best = (candidate, similarity)
+        return best
+
+    def insert(self, key, signature):
+        self._signatures[key] = signature
+        for band, band_key in self._keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+
+class NearDuplicateFilter:
+    """
+    Remove quase duplicatas do corpus em streaming, na ordem dos artigos (o primeiro fica).
+
+    Um artigo cuja similaridade de Jaccard estimada com um artigo já mantido passa de
+    'threshold' é descartado inteiro; nos demais, parágrafos (linhas) com pelo menos
+    'min_paragraph_words' palavras que repetem um parágrafo já visto são removidos. O
+    content_hash é recalculado sobre o conteúdo filtrado. 'report' acumula o que saiu.
+
+    Similaridade alta não basta: o item só sai se o mantido o cobrir, isto é, se pelo menos
+    'min_containment' das suas palavras distintas aparecerem no mantido (uma frase a mais num
+    artigo ainda é duplicata) e nenhuma das que faltam for um número ("3 GB" x "4 GB"
+    continuam os dois).
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=4, min_paragraph_words=10,
+                 min_containment=0.9, article_level=True, paragraph_level=True, max_examples=20):
+        self.threshold = threshold
+        self.min_paragraph_words = min_paragraph_words
+        self.min_containment = min_containment
+        self.article_level = article_level
+        self.paragraph_level = paragraph_level
+        self.max_examples = max_examples
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.articles = LSHIndex(threshold, num_perm)
+        self.paragraphs = LSHIndex(threshold, num_perm)
+        self._vocabulary = {}  # chave indexada -> conjunto de palavras, para o teste de cobertura
+        self.report = {
+            "threshold": threshold,
+            "articles": 0, "articles_removed": 0,
+            "paragraphs": 0, "paragraphs_removed": 0,
+            "chars": 0, "chars_removed": 0,
+            "removed_articles": [], "removed_paragraphs": [],
+        }
+
+    def _covered_by(self, words):
+        words = set(words)
+
+        def accept(key):
+            novel = words - self._vocabulary[key]
+            if any(any(c.isdigit() for c in w) for w in novel):
+                return False
+            return 1 - len(novel) / len(words) >= self.min_containment
+        return accept
+
+    def _index(self, lsh, key, signature, words):
+        lsh.insert(key, signature)
+        self._vocabulary[key] = set(words)
+
+    def filter(self, articles):
+        for article in articles:
+            article = self.filter_article(article)
+            if article is not None:
+                yield article
+
+    def filter_article(self, article):
+        report = self.report
+        content = article["content"]
+        report["articles"] += 1
+        report["chars"] += len(content)
+
+        words = words_of(content)
+        signature = self.hasher.signature(words)
+        if self.article_level and signature is not None:
+            match = self.articles.query(signature, self._covered_by(words))
+            if match:
+                report["articles_removed"] += 1
+                report["chars_removed"] += len(content)
+                report["paragraphs"] += content.count("\n") + 1
+                if len(report["removed_articles"]) < self.max_examples:
+                    report["removed_articles"].append(
+                        {"url": article["url"], "duplicate_of": match[0], "similarity": round(match[1], 3)})
+                return None
+            self._index(self.articles, article["url"], signature, words)
+
+        kept = []
+        for i, paragraph in enumerate(content.split("\n")):
+            report["paragraphs"] += 1
+            words = words_of(paragraph)
+            if not self.paragraph_level or len(words) < self.min_paragraph_words:
+                kept.append(paragraph)
+                continue
+            paragraph_signature = self.hasher.signature(words)
+            match = self.paragraphs.query(paragraph_signature, self._covered_by(words))
+            if match:
+                report["paragraphs_removed"] += 1
+                report["chars_removed"] += len(paragraph) + 1
+                if len(report["removed_paragraphs"]) < self.max_examples:
+                    report["removed_paragraphs"].append({"url": article["url"], "text": paragraph[:200],
+                                                         "duplicate_of": match[0], "similarity": round(match[1], 3)})
+                continue
+            self._index(self.paragraphs, (article["url"], i), paragraph_signature, words)
+            kept.append(paragraph)
+
+        filtered = "\n".join(kept).strip()
+        if not filtered:
+            report["articles_removed"] += 1
+            return None
+        if filtered == content:
+            return article
+        return {**article, "content": filtered, "content_hash": content_hash(filtered)}
+
+    def summary(self):
+        report = self.report
+        removed = report["chars_removed"] / report["chars"] if report["chars"] else 0.0
+        return (f"{report['articles_removed']}/{report['articles']} artigos e "
+                f"{report['paragraphs_removed']}/{report['paragraphs']} parágrafos quase duplicados removidos "
+                f"({report['chars_removed']} caracteres, {removed:.1%} do texto)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove artigos e parágrafos quase duplicados do corpus (MinHash + LSH)")
+    parser.add_argument("source", help="Corpus em texto ou JSONL")
+    parser.add_argument("target", help="Corpus JSONL filtrado")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Similaridade de Jaccard mínima para duplicata")
+    parser.add_argument("--min-paragraph-words", type=int, default=10)
+    parser.add_argument("--min-containment", type=float, default=0.9,
+                        help="Fração mínima das palavras da duplicata presentes no artigo mantido")
+    parser.add_argument("--no-paragraphs", action="store_true", help="Só compara artigos inteiros")
+    parser.add_argument("--report", help="Grava o relatório do que foi removido (JSON)")
+    args = parser.parse_args()
+
+    dedup = NearDuplicateFilter(args.threshold, min_paragraph_words=args.min_paragraph_words,
+                                min_containment=args.min_containment, paragraph_level=not args.no_paragraphs)
+    write_jsonl(dedup.filter(iter_articles(args.source)), args.target)
+    print(f"🧹 {dedup.summary()}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(dedup.report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import json
+import os
+import shutil
+import numpy as np
+from .vector_store import BaseVectorStore
+
+SEARCH_BLOCK_ROWS = 8192  # limita a matriz temporária float32 ao desquantizar int8
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+
+def quantize_int8(vectors):
+    """Quantização simétrica por linha: v ~= q * scale, com q em int8."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    Backend vetorial em processo: vetores normalizados numa matriz contígua (float32 ou int8
+    quantizado) e busca top-k com um produto matriz-vetor + argpartition.
+
+    O snapshot em disco (vectors.npy, scales.npy, points.jsonl) é aberto via memmap, então
+    vários processos podem compartilhar as mesmas páginas em modo somente leitura. Com
+    read_only=True a pasta não é criada e qualquer alteração levanta RuntimeError.
+
+    Cada flush grava os três arquivos numa pasta de geração nova (gen-000001, ...) e só então
+    troca o ponteiro CURRENT com rename atômico: um leitor nunca combina vetores de uma geração
+    com pontos de outra. A geração anterior é mantida para quem ainda a está abrindo.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, collection_name="faq", vector_size=384, path="./backend/data/vector_np", quantize=True,
+                 read_only=False):
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.quantize = quantize
+        self.read_only = read_only
+        self.path = os.path.join(path, collection_name)
+        if not read_only:
+            os.makedirs(self.path, exist_ok=True)
+        self._dirty = False
+        self._load()
+
+    def _current_generation(self):
+        """Geração apontada por CURRENT; "" é o formato antigo, com os arquivos na própria pasta."""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _load(self):
+        self.generation = self._current_generation()
+        data_path = os.path.join(self.path, self.generation)
+        self.vectors_path = os.path.join(data_path, "vectors.npy")
+        self.scales_path = os.path.join(data_path, "scales.npy")
+        self.points_path = os.path.join(data_path, "points.jsonl")
+        self._ids, self._payloads = [], []
+        self._vectors = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._pending = []
+        self._scales = None
+        self._exists = os.path.exists(self.points_path)
+        if not self._exists:
+            self._index = {}
+            return
+
+        with open(self.points_path, "r", encoding="utf-8") as f:
+            for line in f:
+                point = json.loads(line)
+                self._ids.append(point["id"])
+                self._payloads.append(point["payload"])
+        self._index = {point_id: row for row, point_id in enumerate(self._ids)}
+        if self._ids:
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")
+            if self._vectors.dtype == np.int8:
+                self._scales = np.load(self.scales_path)
+
+    def _require_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Índice em {self.path} aberto somente para leitura")
+
+    def _writable(self):
+        """Garante uma matriz float32 em memória antes de qualquer alteração."""
+        self._require_writable()
+        if self._scales is not None:
+            self._vectors = np.asarray(self._vectors, dtype=np.float32) * self._scales[:, None]
+            self._scales = None
+        elif isinstance(self._vectors, np.memmap) or not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors, dtype=np.float32)
+        self._dirty = True
+
+    def _matrix(self):
+        """A matriz de vetores, juntando de uma vez as linhas novas acumuladas pelos upserts."""
+        if self._pending:
+            self._vectors = np.concatenate([self._vectors, np.stack(self._pending)])
+            self._pending = []
+        return self._vectors
+
+    def _keep_rows(self, keep):
+        rows = [row for row in range(len(self._ids)) if keep(row)]
+        if len(rows) == len(self._ids):
+            return
+        self._writable()
+        self._matrix()
+        self._vectors = self._vectors[rows]
+        self._ids = [self._ids[row] for row in rows]
+        self._payloads = [self._payloads[row] for row in rows]
+        self._index = {point_id: row for row, point_id in enumerate(self._ids)}
+
+    def create_collection(self):
+        self._require_writable()
+        current_path = os.path.join(self.path, CURRENT_FILE)
+        if os.path.exists(current_path):
+            os.remove(current_path)
+        self._vectors = None  # libera o memmap antes de apagar os arquivos
+        self._remove_generations(keep=())
+        self._load()
+        self._exists = True
+        self._dirty = True
+        print(f"✅ Collection '{self.collection_name}' criada com {self.vector_size} dimensões (numpy).")
+
+    def collection_exists(self):
+        return self._exists
+
+    def count(self):
+        return len(self._ids)
+
+    def upsert(self, ids, vectors, payloads):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        self._writable()
+
+        # Linhas novas ficam numa lista e viram matriz uma vez só (_matrix), na busca ou no flush:
+        # concatenar a cada lote copiaria a matriz inteira por lote (O(n²) num build)
+        stored = len(self._vectors)
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            row = self._index.get(point_id)
+            if row is None:
+                self._index[point_id] = len(self._ids)
+                self._ids.append(point_id)
+                self._payloads.append(payload)
+                self._pending.append(vector)
+                continue
+            if row < stored:
+                self._vectors[row] = vector
+            else:
+                self._pending[row - stored] = vector
+            self._payloads[row] = payload
+
+    def search(self, query_vector, limit, score_threshold=None):
+        return self.search_batch([(query_vector, limit, score_threshold)])[0]
+
+    def search_batch(self, queries):
+        """Todas as consultas num único produto de matrizes (consultas x pontos); top-k por linha."""
+        if not self._ids:
+            return [[] for _ in queries]
+        matrix = np.asarray([query_vector for query_vector, _, _ in queries], dtype=np.float32)
+        matrix = matrix.reshape(len(queries), self.vector_size)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+        if self._scales is None:
+            scores = matrix @ self._matrix().T
+        else:
+            scores = np.empty((len(queries), len(self._ids)), dtype=np.float32)
+            for start in range(0, len(self._ids), SEARCH_BLOCK_ROWS):
+                block = self._vectors[start:start + SEARCH_BLOCK_ROWS]
+                scores[:, start:start + len(block)] = (matrix @ block.T) * self._scales[start:start + len(block)]
+        return [self._top(row, limit, score_threshold) for row, (_, limit, score_threshold) in zip(scores, queries)]
+
+    def _top(self, scores, limit, score_threshold):
+        if limit <= 0:
+            return []
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
+        return [(self._ids[row], self._payloads[row], float(scores[row])) for row in top]
+
+    def get_payloads(self, ids):
+        return {point_id: self._payloads[self._index[point_id]] for point_id in ids if point_id in self._index}
+
+    def iter_points(self):
+        vectors = self._matrix()
+        for start in range(0, len(self._ids), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            if self._scales is not None:
+                block = block * self._scales[start:start + len(block), None]
+            for row, vector in enumerate(block, start):
+                yield self._ids[row], vector, self._payloads[row]
+
+    def article_hashes(self):
+        return {payload["url"]: payload.get("content_hash") for payload in self._payloads if "url" in payload}
+
+    def delete_articles(self, urls):
+        urls = set(urls)
+        if urls:
+            self._keep_rows(lambda row: self._payloads[row].get("url") not in urls)
+
+    def delete_outdated(self, article_hashes):
+        if article_hashes:
+            self._keep_rows(lambda row: article_hashes.get(self._payloads[row].get("url"),
+                                                           self._payloads[row].get("content_hash"))
+                            == self._payloads[row].get("content_hash"))
+
+    def flush(self):
+        """Grava o snapshot (quantizado se configurado) e o reabre via memmap."""
+        if not self._dirty:
+            return
+        vectors = np.asarray(self._matrix(), dtype=np.float32)
+        previous = self.generation
+        number = int(previous[len(GENERATION_PREFIX):]) + 1 if previous.startswith(GENERATION_PREFIX) else 1
+        generation = f"{GENERATION_PREFIX}{number:06d}"
+        data_path = os.path.join(self.path, generation)
+        shutil.rmtree(data_path, ignore_errors=True)  # resto de um flush interrompido
+        os.makedirs(data_path)
+        if self.quantize:
+            quantized, scales = quantize_int8(vectors)
+            np.save(os.path.join(data_path, "vectors.npy"), quantized)
+            np.save(os.path.join(data_path, "scales.npy"), scales)
+        else:
+            np.save(os.path.join(data_path, "vectors.npy"), vectors)
+        with open(os.path.join(data_path, "points.jsonl"), "w", encoding="utf-8") as f:
+            for point_id, payload in zip(self._ids, self._payloads):
+                f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+
+        current_path = os.path.join(self.path, CURRENT_FILE)
+        with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(generation + "\n")
+        os.replace(current_path + ".tmp", current_path)
+
+        # Libera o memmap antigo antes de apagar as gerações que ninguém deve estar abrindo
+        self._vectors = None
+        self._remove_generations(keep=(generation, previous))
+        self._dirty = False
+        self._load()
+
+    def _remove_generations(self, keep):
+        """Apaga as gerações fora de 'keep' ("" são os arquivos do formato antigo, na própria pasta)."""
+        if not os.path.isdir(self.path):
+            return
+        for entry in os.scandir(self.path):
+            if entry.is_dir() and entry.name.startswith(GENERATION_PREFIX) and entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        if "" not in keep:
+            for name in ("vectors.npy", "scales.npy", "points.jsonl"):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+
+    def write_manifest(self, manifest):
+        # O manifest marca o índice como completo: o snapshot precisa estar em disco antes dele
+        self._require_writable()
+        self.flush()
+        super().write_manifest(manifest)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+_worker_model = None
+
+
+def default_workers():
+    """Workers de embedding: NEXFLIX_ENCODE_WORKERS ou 1 (encode no próprio processo)."""
+    return int(os.getenv("NEXFLIX_ENCODE_WORKERS", "1"))
+
+
+def _init_worker(model_name, threads_per_worker):
+    global _worker_model
+    # Cada worker usa poucas threads: N processos x todas as threads da máquina só disputam CPU
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    from .encoder_registry import get_encoder
+    _worker_model = get_encoder(model_name)
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+
+
+class ParallelEncoder:
+    """
+    Pool de processos (spawn, seguro com torch) em que cada worker carrega sua própria cópia do
+    modelo. O encode divide os textos em lotes de até 'batch_size', distribui entre os workers e
+    remonta o resultado na ordem original. Mesma interface do SentenceTransformer.encode.
+
+    Se um worker morrer (ex.: falha ao carregar o modelo), o encode levanta BrokenProcessPool
+    em vez de ficar esperando.
+    """
+
+    def __init__(self, model_name, workers=None, batch_size=64, threads_per_worker=1):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(model_name, threads_per_worker))
+
+    def encode(self, texts, show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Lotes menores quando há poucos textos, para todos os workers terem trabalho
+        size = max(1, min(self.batch_size, -(-len(texts) // self.workers)))
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        return np.concatenate(list(self._pool.map(_encode_batch, batches)))
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
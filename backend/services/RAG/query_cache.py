@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query):
+    # O tokenizer do all-MiniLM-L6-v2 é uncased, então caixa e espaços não mudam o embedding
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """LRU exato (por texto normalizado) dos vetores de pergunta."""
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, query, encode_fn):
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = np.asarray(encode_fn(query), dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def get_many_or_encode(self, queries, encode_many_fn):
+        """Como get_or_encode para várias perguntas: as ausentes vão juntas numa única chamada."""
+        keys = [normalize_query(query) for query in queries]
+        vectors = [None] * len(queries)
+        missing = {}  # chave -> índice da primeira pergunta com ela
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vectors[i] = vector
+                elif key not in missing:
+                    self.misses += 1
+                    missing[key] = i
+
+        if missing:
+            encoded = encode_many_fn([queries[i] for i in missing.values()])
+            fresh = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, encoded)}
+            with self._lock:
+                for key, vector in fresh.items():
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas por similaridade: uma pergunta reaproveita a resposta de outra quando
+    os embeddings têm cosseno >= threshold e a busca retornou exatamente o mesmo conjunto de chunks.
+
+    A memória da conversa não faz parte da chave; o cache vale para perguntas autocontidas.
+    """
+
+    def __init__(self, threshold=0.92, max_size=1024, ttl=3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # id -> (vetor normalizado, chunk_ids, resposta, criado_em)
+        self._by_chunks = {}  # chunk_ids -> ids das entradas com esse conjunto
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id):
+        _, chunk_ids, _, _ = self._entries.pop(entry_id)
+        ids = self._by_chunks[chunk_ids]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_chunks[chunk_ids]
+
+    def _expire(self, now):
+        # Varre só o início (menos usadas); expiradas no meio da fila caem no lookup ou por tamanho
+        while self._entries:
+            entry_id, (_, _, _, created) = next(iter(self._entries.items()))
+            if now - created < self.ttl:
+                break
+            self._drop(entry_id)
+
+    def lookup(self, vector, chunk_ids):
+        chunk_ids = frozenset(chunk_ids)
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_chunks.get(chunk_ids, ())):
+                cached_vector, _, _, created = self._entries[entry_id]
+                if now - created >= self.ttl:
+                    self._drop(entry_id)
+                    continue
+                similarity = float(cached_vector @ query)
+                if similarity >= best_score:
+                    best_id, best_score = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def store(self, vector, chunk_ids, answer):
+        chunk_ids = frozenset(chunk_ids)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (self._normalize(vector), chunk_ids, answer, time.monotonic())
+            self._by_chunks.setdefault(chunk_ids, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
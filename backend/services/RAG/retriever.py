@@ -1,19 +1,76 @@
-from sentence_transformers import SentenceTransformer
+from .encoder_registry import get_encoder
+from .micro_batcher import MicroBatcher, batching_from_env
+from .query_cache import QueryEmbeddingCache
+from ..metrics.metrics import metrics
 
 
 class Retriever:
-    def __init__(self, db_manager, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, db_manager, model_name="all-MiniLM-L6-v2", query_cache_size=2048, batching=None):
+        """
+        'batching' são as opções do MicroBatcher (max_batch_size, max_wait_ms) para juntar encodes
+        e buscas de sessões concorrentes; None lê do ambiente (batching_from_env) e False desliga.
+        """
         self.db_manager = db_manager
-        self.encoder = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.query_cache = QueryEmbeddingCache(query_cache_size)
+        if batching is None:
+            batching = batching_from_env()
+        self._encode_batcher = MicroBatcher(self._encode_many, name="encode", **batching) if batching else None
+        self._search_batcher = MicroBatcher(db_manager.search_batch, name="search", **batching) if batching else None
 
-    def search(self, query, top_k=3, score=0.5):
-        query_vector = self.encoder.encode([query])[0].tolist()
+    @property
+    def encoder(self):
+        return get_encoder(self.model_name)
 
-        results = self.db_manager.client.search(
-            collection_name=self.db_manager.collection_name,
-            query_vector=query_vector,
-            limit=top_k,
-            score_threshold=score
-        )
+    def _encode_many(self, queries):
+        return list(self.encoder.encode(queries, batch_size=len(queries), show_progress_bar=False))
 
-        return [(hit.payload["text"], hit.score) for hit in results]
+    def encode_query(self, query):
+        encode = self._encode_batcher or (lambda q: self.encoder.encode([q])[0])
+        with metrics.span("retriever.encode"):
+            return self.query_cache.get_or_encode(query, encode)
+
+    def encode_queries(self, queries, batch_size=64):
+        """Vetores de várias perguntas; as que não estão no cache são embedadas em lotes de 'batch_size'."""
+        encode_many = lambda missing: self.encoder.encode(missing, batch_size=batch_size, show_progress_bar=False)
+        with metrics.span("retriever.encode_batch"):
+            return self.query_cache.get_many_or_encode(queries, encode_many)
+
+    def search_many(self, query_vectors, top_k=3, score=0.5):
+        """Uma busca vetorial (search_batch) para vários vetores; retorna (id, texto, score) por consulta."""
+        with metrics.span("retriever.search_batch"):
+            results = self.db_manager.search_batch([(vector, top_k, score) for vector in query_vectors])
+        for hits in results:
+            metrics.observe("retrieval_hits", len(hits))
+            metrics.inc("retrieval_hits_total", len(hits))
+            if not hits:
+                metrics.inc("empty_retrievals_total")
+        return [[(point_id, payload["text"], hit_score) for point_id, payload, hit_score in hits] for hits in results]
+
+    def search_with_ids(self, query, top_k=3, score=0.5, query_vector=None):
+        """Como search, mas retorna (id, texto, score) para identificar os chunks recuperados."""
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+
+        with metrics.span("retriever.search"):
+            if self._search_batcher is not None:
+                results = self._search_batcher((query_vector, top_k, score))
+            else:
+                results = self.db_manager.search(query_vector, limit=top_k, score_threshold=score)
+
+        metrics.observe("retrieval_hits", len(results))
+        metrics.inc("retrieval_hits_total", len(results))
+        if not results:
+            metrics.inc("empty_retrievals_total")
+
+        return [(point_id, payload["text"], hit_score) for point_id, payload, hit_score in results]
+
+    def chunk_texts(self, chunk_ids):
+        """Textos dos chunks pelo id, como {id: texto}; ids que saíram do índice ficam de fora."""
+        with metrics.span("retriever.fetch_chunks"):
+            payloads = self.db_manager.get_payloads(chunk_ids)
+        return {point_id: payload["text"] for point_id, payload in payloads.items()}
+
+    def search(self, query, top_k=3, score=0.5, query_vector=None):
+        hits = self.search_with_ids(query, top_k=top_k, score=score, query_vector=query_vector)
+        return [(text, hit_score) for _, text, hit_score in hits]
@@ -0,0 +1,175 @@
+import os
+import shutil
+import threading
+import time
+from .document_indexer import batched
+from .numpy_store import NumpyVectorStore
+from .vector_store import BaseVectorStore
+from ..metrics.metrics import metrics
+
+SNAPSHOTS_PATH = "./backend/data/index_snapshots"
+CURRENT_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 3
+
+
+def current_version(root=SNAPSHOTS_PATH):
+    """Versão apontada por CURRENT, ou None se nenhum snapshot foi publicado."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_snapshot(db, manifest, root=SNAPSHOTS_PATH, collection_name="faq", keep=KEEP_SNAPSHOTS):
+    """
+    Publica o índice de 'db' como snapshot imutável em root/<index_version> e aponta CURRENT
+    para ele. O snapshot é escrito numa pasta temporária e renomeado, e CURRENT é trocado com
+    rename atômico: os processos de serviço nunca veem um snapshot pela metade. Mantém os
+    'keep' snapshots mais recentes (CURRENT nunca é apagado). Retorna a pasta publicada.
+    """
+    version = manifest["index_version"]
+    os.makedirs(root, exist_ok=True)
+    target = os.path.join(root, version)
+    if not os.path.exists(target):
+        tmp_dir = os.path.join(root, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        snapshot = NumpyVectorStore(collection_name, db.vector_size, path=tmp_dir)
+        for batch in batched(db.iter_points(), 1024):
+            ids, vectors, payloads = zip(*batch)
+            snapshot.upsert(ids, vectors, payloads)
+        snapshot.write_manifest({**manifest, "backend": SnapshotVectorStore.backend, "source_backend": manifest["backend"]})
+        os.replace(tmp_dir, target)
+
+    current_path = os.path.join(root, CURRENT_FILE)
+    with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(current_path + ".tmp", current_path)
+    prune_snapshots(root, keep)
+    print(f"📦 Snapshot {version} publicado em {target}")
+    return target
+
+
+def prune_snapshots(root=SNAPSHOTS_PATH, keep=KEEP_SNAPSHOTS):
+    """
+    Apaga snapshots antigos além dos 'keep' mais recentes. Processos que ainda usam um snapshot
+    apagado seguem com os arquivos já abertos (memmap) até trocarem para o atual.
+    """
+    current = current_version(root)
+    snapshots = sorted((entry for entry in os.scandir(root) if entry.is_dir() and not entry.name.startswith(".")),
+                       key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in snapshots[keep:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _read_only(*args, **kwargs):
+    raise RuntimeError("Snapshots são somente leitura; publique um novo com `python -m backend.services.build_index --publish`")
+
+
+class SnapshotVectorStore(BaseVectorStore):
+    """
+    Backend de serviço: abre o snapshot apontado por CURRENT (NumpyVectorStore somente leitura,
+    vetores via memmap, então N processos compartilham as mesmas páginas) e, a cada
+    'check_interval' segundos, troca para um snapshot mais novo sem reiniciar. Buscas em
+    andamento terminam no snapshot antigo; as seguintes já usam o novo.
+
+    Só troca para snapshots construídos com o mesmo modelo ('model_name'; se omitido, o do
+    primeiro snapshot aberto) e a mesma dimensão; os demais são ignorados com um aviso.
+    """
+
+    backend = "snapshot"
+    create_collection = upsert = delete_articles = delete_outdated = write_manifest = clear_manifest = _read_only
+
+    def __init__(self, collection_name="faq", vector_size=384, path=SNAPSHOTS_PATH, check_interval=5.0,
+                 model_name=None):
+        self.root = path
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.check_interval = check_interval
+        self.model_name = model_name
+        self.version = None
+        self._rejected = None
+        self.path = os.path.join(path, CURRENT_FILE)
+        self._store = None
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Troca para o snapshot apontado por CURRENT, se ele mudou. Retorna True se trocou."""
+        version = current_version(self.root)
+        if version is None or version in (self.version, self._rejected):
+            return False
+        try:
+            store = NumpyVectorStore(self.collection_name, self.vector_size, path=os.path.join(self.root, version),
+                                     read_only=True)
+            if not store.collection_exists():
+                raise FileNotFoundError(store.points_path)
+        except (OSError, ValueError) as e:
+            # Snapshot removido/corrompido entre a leitura de CURRENT e a abertura: fica no atual
+            print(f"⚠️ Snapshot {version} não pôde ser aberto: {e}")
+            return False
+
+        # Um snapshot de outro modelo/dimensão quebraria todas as buscas com o encoder do processo
+        manifest = store.load_manifest() or {}
+        expected = {"model_name": self.model_name, "vector_size": self.vector_size}
+        mismatched = sorted(key for key, value in expected.items()
+                            if value is not None and manifest.get(key) != value)
+        if mismatched:
+            self._rejected = version
+            metrics.inc("index_swaps_rejected_total")
+            details = ", ".join(f"{key}={manifest.get(key)!r} (esperado {expected[key]!r})" for key in mismatched)
+            print(f"⚠️ Snapshot {version} ignorado, construído com outro {details}; "
+                  f"mantendo {self.version or 'nenhum snapshot'}")
+            return False
+        if self.model_name is None:
+            self.model_name = manifest.get("model_name")
+        previous = self.version
+        self._store, self.version, self.path = store, version, store.path
+        if previous is not None:
+            metrics.inc("index_swaps_total")
+            print(f"🔄 Índice trocado do snapshot {previous} para {version}")
+        return True
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            self.refresh()
+        finally:
+            self._lock.release()
+
+    def collection_exists(self):
+        return self._store is not None and self._store.collection_exists()
+
+    def count(self):
+        return self._store.count() if self._store is not None else 0
+
+    def search(self, query_vector, limit, score_threshold=None):
+        self._maybe_refresh()
+        store = self._store
+        if store is None:
+            return []
+        return store.search(query_vector, limit, score_threshold)
+
+    def search_batch(self, queries):
+        self._maybe_refresh()
+        store = self._store
+        if store is None:
+            return [[] for _ in queries]
+        return store.search_batch(queries)
+
+    def get_payloads(self, ids):
+        return self._store.get_payloads(ids) if self._store is not None else {}
+
+    def article_hashes(self):
+        return self._store.article_hashes() if self._store is not None else {}
+
+    def iter_points(self):
+        return self._store.iter_points() if self._store is not None else iter(())
+
+    def load_manifest(self):
+        return self._store.load_manifest() if self._store is not None else None
@@ -1,13 +1,15 @@
 import os
-import shutil
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from .vector_store import BaseVectorStore
 
 
-class VectorDBManager:
+class VectorDBManager(BaseVectorStore):
+    backend = "qdrant"
+
     def __init__(self, collection_name="faq", vector_size=384, path="./backend/data/vector_db"):
-        if os.path.exists(path):
-            shutil.rmtree(path)  
+        os.makedirs(path, exist_ok=True)
+        self.path = path
         self.client = QdrantClient(path=path)
 
         self.collection_name = collection_name
@@ -19,3 +21,107 @@ class VectorDBManager:
             vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE),
         )
         print(f"✅ Collection '{self.collection_name}' criada com {self.vector_size} dimensões.")
+
+    def collection_exists(self):
+        return self.client.collection_exists(self.collection_name)
+
+    def count(self):
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+
+    def upsert(self, ids, vectors, payloads):
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                models.PointStruct(id=point_id, vector=vector, payload=payload)
+                for point_id, vector, payload in zip(ids, vectors, payloads)
+            ],
+        )
+
+    def search(self, query_vector, limit, score_threshold=None):
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=[float(x) for x in query_vector],
+            limit=limit,
+            score_threshold=score_threshold
+        )
+        return [(hit.id, hit.payload, hit.score) for hit in results]
+
+    def search_batch(self, queries):
+        results = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                models.SearchRequest(vector=[float(x) for x in query_vector], limit=limit,
+                                     score_threshold=score_threshold, with_payload=True)
+                for query_vector, limit, score_threshold in queries
+            ],
+        )
+        return [[(hit.id, hit.payload, hit.score) for hit in hits] for hits in results]
+
+    def get_payloads(self, ids):
+        points = self.client.retrieve(collection_name=self.collection_name, ids=list(ids),
+                                      with_payload=True, with_vectors=False)
+        return {point.id: point.payload for point in points}
+
+    def article_hashes(self):
+        """Mapeia url -> content_hash dos artigos presentes na collection (sem carregar vetores)."""
+        hashes = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                with_payload=["url", "content_hash"],
+                with_vectors=False,
+                limit=1024,
+                offset=offset,
+            )
+            for point in points:
+                url = point.payload.get("url")
+                if url is not None:
+                    hashes[url] = point.payload.get("content_hash")
+            if offset is None:
+                return hashes
+
+    def iter_points(self):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                with_payload=True,
+                with_vectors=True,
+                limit=1024,
+                offset=offset,
+            )
+            for point in points:
+                yield point.id, point.vector, point.payload
+            if offset is None:
+                return
+
+    def delete_articles(self, urls):
+        """Remove todos os pontos cujos payloads pertencem aos artigos informados."""
+        urls = list(urls)
+        if not urls:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="url", match=models.MatchAny(any=urls))]
+                )
+            ),
+        )
+
+    def delete_outdated(self, article_hashes):
+        """Remove, para cada url, os pontos cujo content_hash não é o atual."""
+        for url, content_hash in article_hashes.items():
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[models.FieldCondition(key="url", match=models.MatchValue(value=url))],
+                        must_not=[models.FieldCondition(key="content_hash", match=models.MatchValue(value=content_hash))],
+                    )
+                ),
+            )
+
+    def close(self):
+        self.client.close()
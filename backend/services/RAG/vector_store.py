@@ -0,0 +1,95 @@
+import json
+import os
+
+BACKENDS = ("qdrant", "numpy", "snapshot")
+
+
+class BaseVectorStore:
+    """
+    Interface comum dos backends vetoriais usados por DocumentIndexer, Retriever e StartRAG.
+
+    search retorna uma lista de tuplas (id, payload, score) em ordem decrescente de score.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    backend = None
+
+    def create_collection(self):
+        raise NotImplementedError
+
+    def collection_exists(self):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def upsert(self, ids, vectors, payloads):
+        raise NotImplementedError
+
+    def search(self, query_vector, limit, score_threshold=None):
+        raise NotImplementedError
+
+    def search_batch(self, queries):
+        """Várias buscas de uma vez; 'queries' é uma lista de (query_vector, limit, score_threshold)."""
+        return [self.search(query_vector, limit, score_threshold) for query_vector, limit, score_threshold in queries]
+
+    def get_payloads(self, ids):
+        """Payloads dos pontos com esses ids, como {id: payload}; ids ausentes ficam de fora."""
+        raise NotImplementedError
+
+    def article_hashes(self):
+        raise NotImplementedError
+
+    def iter_points(self):
+        """Gera (id, vetor, payload) de todos os pontos; usado para publicar snapshots."""
+        raise NotImplementedError
+
+    def delete_articles(self, urls):
+        raise NotImplementedError
+
+    def delete_outdated(self, article_hashes):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def load_manifest(self):
+        """Retorna o manifest gravado junto ao índice, ou None se não existir/for inválido."""
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def write_manifest(self, manifest):
+        """Grava o manifest de forma atômica (arquivo temporário + rename)."""
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def clear_manifest(self):
+        manifest_path = os.path.join(self.path, self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+
+def open_vector_store(backend="qdrant", collection_name="faq", vector_size=384, path=None, **kwargs):
+    """
+    Abre o backend vetorial escolhido: 'qdrant' (embedded), 'numpy' (matriz em memória/memmap)
+    ou 'snapshot' (snapshot publicado, somente leitura; 'path' é a pasta dos snapshots).
+    """
+    if path is not None:
+        kwargs["path"] = path
+    if backend == "qdrant":
+        from .vector_db_manager import VectorDBManager
+        return VectorDBManager(collection_name=collection_name, vector_size=vector_size, **kwargs)
+    if backend == "numpy":
+        from .numpy_store import NumpyVectorStore
+        return NumpyVectorStore(collection_name=collection_name, vector_size=vector_size, **kwargs)
+    if backend == "snapshot":
+        from .snapshots import SnapshotVectorStore
+        return SnapshotVectorStore(collection_name=collection_name, vector_size=vector_size, **kwargs)
+    raise ValueError(f"Backend vetorial desconhecido: {backend!r} (opções: {', '.join(BACKENDS)})")
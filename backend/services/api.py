@@ -0,0 +1,325 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .serving import ServingState
+from .logger.logger import SimpleLogger
+from .metrics.metrics import metrics
+
+logger = SimpleLogger()
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_QUESTIONS = 64
+MAX_TOP_K = 50
+MEMORY_ROLES = ("user", "assistant")
+_DONE = object()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = list(headers)
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def _field(payload, name, cast, default):
+    try:
+        return cast(payload.get(name, default))
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPError(400, f"Campo '{name}' inválido")
+
+
+def _search_args(payload, default_top_k, default_score):
+    """top_k limitado a 1..MAX_TOP_K; score precisa ser finito e estar em [-1, 1] (similaridade cosseno)."""
+    top_k = min(max(_field(payload, "top_k", int, default_top_k), 1), MAX_TOP_K)
+    score = _field(payload, "score", float, default_score)
+    if not math.isfinite(score) or not -1.0 <= score <= 1.0:
+        raise HTTPError(400, "Campo 'score' inválido: esperado um número entre -1 e 1")
+    return top_k, score
+
+
+def _memory(payload):
+    """Histórico da conversa: lista de {"role": "user"|"assistant", "content": texto}."""
+    memory = payload.get("memory") or []
+    if not isinstance(memory, list) or not all(
+            isinstance(message, dict) and message.get("role") in MEMORY_ROLES and isinstance(message.get("content"), str)
+            for message in memory):
+        raise HTTPError(400, "Campo 'memory' inválido: esperada uma lista de {\"role\": \"user\" ou \"assistant\", "
+                             "\"content\": texto}")
+    return [{"role": message["role"], "content": message["content"]} for message in memory]
+
+
+def _references(hits):
+    return [{"text": text, "score": score} for text, score in hits]
+
+
+class NexFlixAPI:
+    """
+    API HTTP assíncrona (ASGI, sem framework) sobre o InputService:
+
+        POST /ask          {"question", "memory"?, "session_id"?, "top_k"?, "score"?} -> resposta completa
+        POST /ask/stream   mesmo corpo -> NDJSON: references, um evento por trecho de texto, done
+        POST /ask/batch    {"questions": [...], "top_k"?, "score"?} -> uma resposta por pergunta
+        GET  /health       readiness (503 enquanto o serviço aquece)
+        GET  /metrics      métricas em texto Prometheus
+
+    O event loop só faz I/O HTTP. Encode e busca (CPU) rodam num pool limitado ('cpu_workers');
+    a chamada ao LLM, que passa pelo ResilientChatModel síncrono, roda num pool separado de
+    I/O ('llm_workers'), então respostas lentas não ocupam o pool de CPU. Acima de
+    'max_in_flight' perguntas em andamento, novos pedidos recebem 503 com Retry-After em vez
+    de enfileirar sem limite. O aquecimento (ServingState) começa no startup do servidor.
+    """
+
+    def __init__(self, serving=None, max_in_flight=None, cpu_workers=None, llm_workers=None, default_top_k=5,
+                 default_score=0.3):
+        self.serving = serving or ServingState()
+        self.max_in_flight = max_in_flight or _env_int("NEXFLIX_API_MAX_IN_FLIGHT", 64)
+        self.cpu_executor = ThreadPoolExecutor(cpu_workers or _env_int("NEXFLIX_API_CPU_WORKERS", 4),
+                                               thread_name_prefix="api-cpu")
+        self.llm_executor = ThreadPoolExecutor(llm_workers or _env_int("NEXFLIX_API_LLM_WORKERS", 32),
+                                               thread_name_prefix="api-llm")
+        self.default_top_k = default_top_k
+        self.default_score = default_score
+        self.in_flight = 0
+        self._routes = {
+            ("POST", "/ask"): self._ask,
+            ("POST", "/ask/stream"): self._ask_stream,
+            ("POST", "/ask/batch"): self._ask_batch,
+            ("GET", "/health"): self._health,
+            ("GET", "/metrics"): self._metrics,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"].rstrip("/") or "/"
+        handler = self._routes.get((scope["method"], path))
+        endpoint = path if handler is not None else "unknown"
+        status = 500
+        try:
+            with metrics.span(f"api{path.replace('/', '.')}" if handler is not None else "api.unknown"):
+                if handler is None:
+                    known = any(route_path == path for _, route_path in self._routes)
+                    raise HTTPError(405 if known else 404, "Método não permitido" if known else "Rota não encontrada")
+                status = await handler(receive, send)
+        except HTTPError as e:
+            status = e.status
+            await self._send_json(send, e.status, {"error": str(e)}, e.headers)
+        except Exception as e:
+            logger.error(f"Erro na API ({path}): {str(e)}", exc_info=True)
+            try:
+                await self._send_json(send, 500, {"error": str(e)})
+            except Exception:
+                pass  # resposta já iniciada ou cliente desconectado
+        metrics.inc("api_requests_total", endpoint=endpoint, status=status)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.serving.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+                self.llm_executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- Utilitários HTTP ---
+
+    async def _read_json(self, receive):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get("body", b""))
+            if len(body) > MAX_BODY_BYTES:
+                raise HTTPError(413, "Corpo da requisição grande demais")
+            if not message.get("more_body"):
+                break
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "JSON inválido")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "O corpo deve ser um objeto JSON")
+        return payload
+
+    async def _send_json(self, send, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                                *[(k.encode(), v.encode()) for k, v in headers]]})
+        await send({"type": "http.response.body", "body": body})
+        return status
+
+    # --- Admissão (readiness + backpressure) ---
+
+    def _service(self):
+        if not self.serving.ready():
+            if self.serving.error is not None:
+                raise HTTPError(503, f"Serviço indisponível: {self.serving.error}")
+            raise HTTPError(503, "Serviço aquecendo", [("retry-after", "1")])
+        return self.serving.service
+
+    def _admit(self, cost=1):
+        # Sem await entre a checagem e o incremento: atômico no event loop
+        if self.in_flight + cost > self.max_in_flight:
+            metrics.inc("api_rejected_total")
+            raise HTTPError(503, "Servidor saturado, tente novamente", [("retry-after", "1")])
+        self.in_flight += cost
+        metrics.observe("api_in_flight", self.in_flight)
+
+    def _release(self, cost=1):
+        self.in_flight -= cost
+
+    def _question_args(self, payload):
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "Campo 'question' obrigatório")
+        return (question, _memory(payload), payload.get("session_id") or "api",
+                *_search_args(payload, self.default_top_k, self.default_score))
+
+    # --- Pipeline ---
+
+    async def _retrieve(self, service, question, memory, session_id, top_k, score):
+        """Encode + busca no pool de CPU; devolve {"references", "stream"} do InputService."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_executor, service.process_question_stream,
+                                          question, memory, session_id, top_k, score)
+
+    async def _answer(self, service, question, memory, session_id, top_k, score):
+        start = time.perf_counter()
+        response = await self._retrieve(service, question, memory, session_id, top_k, score)
+        retrieved = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        answer = await loop.run_in_executor(self.llm_executor, lambda: "".join(response["stream"]).strip())
+        return {"answer": answer, "references": _references(response["references"]),
+                "timings": {"retrieve_s": retrieved - start, "total_s": time.perf_counter() - start}}
+
+    async def _iterate_in_thread(self, iterator):
+        """Consome um iterador bloqueante no pool de I/O, entregando os itens ao event loop."""
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for item in iterator:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, e)
+                return
+            finally:
+                if hasattr(iterator, "close"):
+                    iterator.close()
+            loop.call_soon_threadsafe(items.put_nowait, _DONE)
+
+        loop.run_in_executor(self.llm_executor, produce)
+        try:
+            while True:
+                item = await items.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()  # cliente desconectou ou erro: o produtor para no próximo trecho
+
+    # --- Endpoints ---
+
+    async def _health(self, receive, send):
+        status = self.serving.status()
+        status["in_flight"] = self.in_flight
+        return await self._send_json(send, 200 if status["ready"] else 503, status)
+
+    async def _metrics(self, receive, send):
+        body = metrics.render_prometheus().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain; version=0.0.4"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+        return 200
+
+    async def _ask(self, receive, send):
+        args = self._question_args(await self._read_json(receive))
+        service = self._service()
+        self._admit()
+        try:
+            result = await self._answer(service, *args)
+        finally:
+            self._release()
+        return await self._send_json(send, 200, result)
+
+    async def _ask_stream(self, receive, send):
+        args = self._question_args(await self._read_json(receive))
+        service = self._service()
+        self._admit()
+        try:
+            start = time.perf_counter()
+            response = await self._retrieve(service, *args)
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/x-ndjson"), (b"cache-control", b"no-cache")]})
+
+            async def event(payload):
+                line = json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+                await send({"type": "http.response.body", "body": line, "more_body": True})
+
+            await event({"type": "references", "references": _references(response["references"])})
+            parts = []
+            try:
+                async for part in self._iterate_in_thread(response["stream"]):
+                    parts.append(part)
+                    await event({"type": "token", "text": part})
+                await event({"type": "done", "answer": "".join(parts).strip(),
+                             "timings": {"total_s": time.perf_counter() - start}})
+            except Exception as e:
+                # O status 200 já foi enviado: o erro vai como último evento do stream
+                logger.error(f"Erro no streaming da resposta: {str(e)}", exc_info=True)
+                await event({"type": "error", "error": str(e)})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            self._release()
+        return 200
+
+    async def _ask_batch(self, receive, send):
+        payload = await self._read_json(receive)
+        questions = payload.get("questions")
+        if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip()
+                                                                       for q in questions):
+            raise HTTPError(400, "Campo 'questions' deve ser uma lista de perguntas")
+        # Um lote maior que 'max_in_flight' nunca seria admitido: 413 em vez de 503 para sempre
+        limit = min(MAX_BATCH_QUESTIONS, self.max_in_flight)
+        if len(questions) > limit:
+            raise HTTPError(413, f"No máximo {limit} perguntas por lote")
+        top_k, score = _search_args(payload, self.default_top_k, self.default_score)
+        session_id = payload.get("session_id") or "api-batch"
+        service = self._service()
+        self._admit(len(questions))
+        try:
+            # As perguntas vão juntas ao pool: o micro-batcher do Retriever agrupa encode e busca
+            results = await asyncio.gather(*(self._answer(service, question, [], session_id, top_k, score)
+                                             for question in questions), return_exceptions=True)
+        finally:
+            self._release(len(questions))
+        return await self._send_json(send, 200, {"results": [
+            {"question": question, "error": str(result)} if isinstance(result, Exception)
+            else {"question": question, **result}
+            for question, result in zip(questions, results)
+        ]})
+
+
+app = NexFlixAPI()
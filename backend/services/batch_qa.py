@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .start_rag import StartRAG
+from .RAG.document_indexer import batched
+
+
+def read_questions(path):
+    """
+    Gera (id, pergunta) de um arquivo de perguntas: .jsonl com {"question", "id"?} por linha, ou
+    texto com uma pergunta por linha. Sem "id", o id é o número da linha (linhas vazias contam).
+    Linhas de .jsonl que não são um objeto com "question" são ignoradas com um aviso.
+    """
+    is_jsonl = path.endswith(".jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if is_jsonl:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or not isinstance(record.get("question"), str):
+                    print(f"⚠️ Linha {number} de {path} ignorada: não é um objeto JSON com \"question\"")
+                    continue
+                question_id, question = str(record.get("id", number)), record["question"]
+            else:
+                question_id, question = str(number), line
+            if question.strip():
+                yield question_id, question
+
+
+def completed(output_path):
+    """
+    Pares (id, pergunta) já respondidos em 'output_path'. Registros com erro ou resposta de
+    fallback não contam, então são refeitos. Antes de retomar, o arquivo é compactado: saem
+    esses registros, as linhas corrompidas (como uma última linha cortada por uma interrupção
+    no meio da escrita) e as repetições de um par, então cada pergunta termina com um só registro.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    corrupted = 0
+    changed = False
+    tmp_path = output_path + ".tmp"
+    with open(output_path, "rb") as f, open(tmp_path, "wb") as compacted:
+        for line in f:
+            try:
+                record = json.loads(line)
+                key = (record["id"], record["question"])
+            except (ValueError, KeyError, TypeError):
+                corrupted += 1
+                continue
+            if "error" in record or record.get("fallback") or key in done:
+                changed = True
+                continue
+            if not line.endswith(b"\n"):
+                line += b"\n"
+                changed = True
+            done.add(key)
+            compacted.write(line)
+    if corrupted or changed:
+        os.replace(tmp_path, output_path)
+    else:
+        os.remove(tmp_path)
+    if corrupted:
+        print(f"⚠️ {corrupted} linha(s) corrompida(s) removida(s) de {output_path}")
+    return done
+
+
+def run(service, questions, output_path, batch_size=256, encode_batch_size=64, concurrency=8, top_k=5, score=0.3):
+    """
+    Responde 'questions' ((id, pergunta)) gravando um JSON por linha em 'output_path' (append).
+
+    Cada lote de 'batch_size' perguntas é embedado e buscado de uma vez (InputService.retrieve_batch);
+    as respostas saem de um pool de 'concurrency' threads, enquanto a thread principal já busca o
+    próximo lote. No máximo 2 * concurrency perguntas esperam pelo LLM. Cada registro é gravado e
+    descarregado assim que fica pronto, então uma execução interrompida perde no máximo as
+    perguntas em andamento. Os tempos de encode/busca são do lote, divididos entre as perguntas.
+    """
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(2 * concurrency)
+    summary = {"answered": 0, "cached": 0, "fallback": 0, "errors": 0}
+    llm_seconds = []
+
+    def answer(output, question_id, question, retrieved, retrieve_share, retrieved_at):
+        vector, hits, chunk_ids = retrieved
+        started = time.perf_counter()
+        record = {"id": question_id, "question": question}
+        try:
+            response = service.answer_retrieved(question, vector, hits, chunk_ids)
+            llm_s = time.perf_counter() - started
+            record.update({
+                "answer": response["answer"], "cached": response["cached"], "fallback": response["fallback"],
+                "references": [{"text": text, "score": hit_score} for text, hit_score in hits],
+                "chunk_ids": chunk_ids,
+                "timings": {"retrieve_s": retrieve_share, "queue_s": started - retrieved_at, "llm_s": llm_s,
+                            "total_s": retrieve_share + time.perf_counter() - retrieved_at},
+            })
+        except Exception as e:
+            llm_s = None
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            slots.release()
+
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with lock:
+            output.write(line)
+            output.flush()
+            if "error" in record:
+                summary["errors"] += 1
+            else:
+                summary["answered"] += 1
+                summary["cached"] += record["cached"]
+                summary["fallback"] += record["fallback"]
+                if not record["cached"]:
+                    llm_seconds.append(llm_s)
+
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as output, \
+            ThreadPoolExecutor(concurrency, thread_name_prefix="batch-qa") as executor:
+        try:
+            for batch in batched(questions, batch_size):
+                retrieve_start = time.perf_counter()
+                retrieved = service.retrieve_batch([question for _, question in batch], top_k=top_k, score=score,
+                                                   batch_size=encode_batch_size)
+                retrieved_at = time.perf_counter()
+                retrieve_share = (retrieved_at - retrieve_start) / len(batch)
+                for (question_id, question), item in zip(batch, retrieved):
+                    slots.acquire()
+                    executor.submit(answer, output, question_id, question, item, retrieve_share, retrieved_at)
+        except KeyboardInterrupt:
+            # As perguntas em andamento terminam e são gravadas; as que não começaram ficam para a retomada
+            print("⏹️ Interrompido; aguardando as respostas em andamento...")
+            executor.shutdown(wait=True, cancel_futures=True)
+            summary["interrupted"] = True
+
+    elapsed = time.perf_counter() - start
+    llm_seconds.sort()
+    summary.update({
+        "elapsed_s": elapsed,
+        "questions_per_s": (summary["answered"] + summary["errors"]) / elapsed if elapsed else 0.0,
+        "llm_p50_s": llm_seconds[len(llm_seconds) // 2] if llm_seconds else None,
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Responde um arquivo de perguntas em lote (avaliação offline / respostas pré-computadas)")
+    parser.add_argument("questions", help="Perguntas: texto (uma por linha) ou .jsonl com {\"question\", \"id\"?}")
+    parser.add_argument("output", help="JSONL de saída (append); rodar de novo retoma de onde parou")
+    parser.add_argument("--backend", default=os.getenv("NEXFLIX_VECTOR_BACKEND", "qdrant"))
+    parser.add_argument("--db-path", help="Pasta do índice (padrão do backend se omitido)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Perguntas por lote de encode + busca")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="Lote interno do modelo de embeddings")
+    parser.add_argument("--concurrency", type=int, default=8, help="Chamadas simultâneas ao LLM")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--score", type=float, default=0.3)
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="Não reaproveita respostas de perguntas quase iguais")
+    args = parser.parse_args()
+
+    # Import pesado (LLM): só depois de validar os argumentos
+    from .input import InputService
+    from .LLM.core import LLMCore
+
+    done = completed(args.output)
+    pending = [(question_id, question) for question_id, question in read_questions(args.questions)
+               if (question_id, question) not in done]
+    print(f"📝 {len(pending)} perguntas pendentes ({len(done)} já respondidas em {args.output})")
+    if not pending:
+        return
+
+    rag = StartRAG(build=False, backend=args.backend, db_path=args.db_path)
+    service = InputService(rag=rag, llm=LLMCore(resilience={"max_concurrency": args.concurrency}),
+                           answer_cache=not args.no_answer_cache, query_batching=False)
+    summary = run(service, pending, args.output, batch_size=args.batch_size,
+                  encode_batch_size=args.encode_batch_size, concurrency=args.concurrency,
+                  top_k=args.top_k, score=args.score)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
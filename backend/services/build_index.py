@@ -0,0 +1,38 @@
+import argparse
+import json
+import os
+import time
+from .start_rag import StartRAG, FAQ_PATH, MODEL_NAME, DEDUP_THRESHOLD
+from .RAG.snapshots import SNAPSHOTS_PATH, KEEP_SNAPSHOTS, publish_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Constrói (ou sincroniza) o índice vetorial offline; o app só abre o artefato gerado")
+    parser.add_argument("--corpus", default=FAQ_PATH, help="Corpus em texto ou JSONL (prefere o .jsonl ao lado)")
+    parser.add_argument("--backend", default=os.getenv("NEXFLIX_VECTOR_BACKEND", "qdrant"))
+    parser.add_argument("--db-path", help="Pasta do índice (padrão do backend se omitido)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, help="Processos de embedding (padrão: NEXFLIX_ENCODE_WORKERS ou 1)")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD)
+    parser.add_argument("--no-dedup", action="store_true", help="Não remove quase duplicatas")
+    parser.add_argument("--force", action="store_true", help="Reconstrói do zero mesmo se nada mudou")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publica o índice como snapshot somente leitura para os processos de serviço")
+    parser.add_argument("--snapshots", default=SNAPSHOTS_PATH, help="Pasta dos snapshots publicados")
+    parser.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS, help="Snapshots antigos mantidos em disco")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rag = StartRAG(faq_path=args.corpus, model_name=args.model, backend=args.backend, db_path=args.db_path,
+                   encode_workers=args.workers, dedup_threshold=None if args.no_dedup else args.dedup_threshold,
+                   force_rebuild=args.force)
+    if args.publish:
+        publish_snapshot(rag.get_db(), rag.manifest, args.snapshots, keep=args.keep)
+    rag.close_db()
+    print(json.dumps(rag.manifest, ensure_ascii=False, indent=2))
+    print(f"✅ Índice {rag.manifest['index_version']} pronto em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
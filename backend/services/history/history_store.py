@@ -0,0 +1,184 @@
+import argparse
+import atexit
+import csv
+import glob
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from ..logger.logger import SimpleLogger
+
+logger = SimpleLogger()
+
+DEFAULT_DIR = "backend/data/history/"
+
+
+class HistoryStore:
+    """
+    Histórico de conversas append-only em JSONL, um arquivo por sessão.
+
+    append() só enfileira o registro; uma thread em background grava em lotes (uma única
+    escrita O_APPEND por sessão e lote, então processos diferentes podem escrever ao mesmo
+    tempo sem intercalar linhas) e faz fsync periódico. Falhas de gravação são registradas no
+    log e contadas em 'errors', sem derrubar a thread.
+    """
+
+    def __init__(self, log_dir=DEFAULT_DIR, batch_size=64, flush_interval=0.5, fsync_interval=5.0, max_open_files=64):
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_open_files = max_open_files
+        self.written = 0
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._files = OrderedDict()
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def path_for(self, session_id):
+        safe_id = re.sub(r"[^\w.-]", "_", str(session_id))
+        return os.path.join(self.log_dir, f"chat_history_{safe_id}.jsonl")
+
+    def append(self, session_id, question, answer, references=()):
+        self._queue.put({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "session_id": session_id,
+            "question": question,
+            "answer": answer,
+            "references": [list(ref) if isinstance(ref, tuple) else ref for ref in references],
+        })
+
+    def flush(self, timeout=None):
+        """Bloqueia até que tudo o que foi enfileirado antes desta chamada tenha sido gravado (ou contado em 'errors')."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                try:
+                    self._sync(force=False)
+                except Exception as e:
+                    logger.error(f"Erro ao sincronizar o histórico: {str(e)}", exc_info=True)
+                continue
+
+            batch, waiters = [], []
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if not running or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+                self._sync(force=not running or bool(waiters))
+            except Exception as e:
+                logger.error(f"Erro no gravador do histórico: {str(e)}", exc_info=True)
+            finally:
+                # Mesmo com erro: flush() não pode ficar esperando para sempre
+                for waiter in waiters:
+                    waiter.set()
+
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+
+    def _write(self, batch):
+        by_path = {}
+        for record in batch:
+            by_path.setdefault(self.path_for(record["session_id"]), []).append(record)
+        for path, records in by_path.items():
+            try:
+                data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+                os.write(self._handle(path).fileno(), data.encode("utf-8"))
+                self.written += len(records)
+            except Exception as e:
+                self.errors += len(records)
+                logger.error(f"Erro ao gravar {len(records)} registro(s) em {path}: {str(e)}", exc_info=True)
+
+    def _handle(self, path):
+        handle = self._files.get(path)
+        if handle is None:
+            handle = open(path, "ab", buffering=0)
+            self._files[path] = handle
+            while len(self._files) > self.max_open_files:
+                _, old = self._files.popitem(last=False)
+                os.fsync(old.fileno())
+                old.close()
+        else:
+            self._files.move_to_end(path)
+        return handle
+
+    def _sync(self, force):
+        if not force and time.monotonic() - self._last_fsync < self.fsync_interval:
+            return
+        self._last_fsync = time.monotonic()
+        for path, handle in self._files.items():
+            try:
+                os.fsync(handle.fileno())
+            except OSError as e:
+                logger.error(f"Erro no fsync de {path}: {str(e)}", exc_info=True)
+
+
+def iter_records(log_dir=DEFAULT_DIR):
+    """Lê todos os registros gravados, sessão por sessão."""
+    for path in sorted(glob.glob(os.path.join(log_dir, "chat_history_*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def export_csv(out_path, log_dir=DEFAULT_DIR):
+    """Exporta o histórico para um único CSV (referências serializadas em JSON)."""
+    fields = ["timestamp", "session_id", "question", "answer", "references"]
+    rows = 0
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for record in iter_records(log_dir):
+            writer.writerow({**record, "references": json.dumps(record.get("references", []), ensure_ascii=False)})
+            rows += 1
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o histórico de conversas para CSV")
+    parser.add_argument("out", help="Arquivo CSV de saída")
+    parser.add_argument("--log-dir", default=DEFAULT_DIR)
+    args = parser.parse_args()
+    rows = export_csv(args.out, args.log_dir)
+    print(f"{rows} registros exportados para {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from ..metrics.metrics import metrics
+
+
+def _message_bytes(message):
+    """Estimativa do tamanho de uma mensagem em memória (dict, textos e referências)."""
+    size = sys.getsizeof(message) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in message.items())
+    for reference in message.get("references", ()):
+        size += sys.getsizeof(reference) + sum(sys.getsizeof(part) for part in reference)
+    return size
+
+
+class Session:
+    """Histórico de uma sessão: as últimas 'max_messages' mensagens, numeradas em sequência."""
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.next_seq = 0
+        self.dropped = 0
+        self.bytes = 0
+        self.created = self.last_access = time.monotonic()
+
+    def append(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.bytes -= _message_bytes(self.messages[0])
+            self.dropped += 1
+        message = {**message, "seq": self.next_seq}
+        self.next_seq += 1
+        self.messages.append(message)
+        self.bytes += _message_bytes(message)
+        return message
+
+
+class SessionStore:
+    """
+    Memória das conversas no servidor, por sessão, com uso de memória limitado:
+
+    - cada sessão guarda só as últimas 'max_messages' mensagens (ring buffer);
+    - referências ficam como (chunk_id, score); o texto é buscado no índice quando exibido;
+    - sessões paradas há mais de 'ttl' segundos são removidas, e acima de 'max_sessions' sai a
+      usada há mais tempo (LRU).
+
+    Cada mensagem recebe um 'seq' crescente na sessão, para a UI desenhar só as mensagens novas.
+    """
+
+    def __init__(self, max_messages=20, max_sessions=1000, ttl=1800):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessões em ordem de último acesso: as expiradas ficam no início
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_access < self.ttl:
+                break
+            del self._sessions[session_id]
+            self.evicted += 1
+            metrics.inc("sessions_evicted_total")
+
+    def _session(self, session_id, create):
+        now = time.monotonic()
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = Session(self.max_messages)
+            self._evict(now)
+        self._sessions.move_to_end(session_id)
+        session.last_access = now
+        return session
+
+    def append(self, session_id, role, content, references=()):
+        """Acrescenta uma mensagem; 'references' é uma lista de (chunk_id, score). Retorna a mensagem."""
+        message = {"role": role, "content": content}
+        if references:
+            message["references"] = [(chunk_id, float(score)) for chunk_id, score in references]
+        with self._lock:
+            message = self._session(session_id, create=True).append(message)
+            metrics.observe("sessions_active", len(self._sessions))
+        return message
+
+    def messages(self, session_id, after_seq=-1):
+        """Mensagens guardadas da sessão com seq > 'after_seq', em ordem."""
+        with self._lock:
+            session = self._session(session_id, create=False)
+            if session is None:
+                return []
+            return [message for message in session.messages if message["seq"] > after_seq]
+
+    def memory(self, session_id):
+        """Histórico no formato que o LLMCore espera ({"role", "content"}), sem as referências."""
+        return [{"role": message["role"], "content": message["content"]} for message in self.messages(session_id)]
+
+    def dropped(self, session_id):
+        """Quantas mensagens antigas da sessão já saíram do ring buffer."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.dropped if session is not None else 0
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @staticmethod
+    def _report(session, now):
+        return {
+            "messages": len(session.messages),
+            "dropped": session.dropped,
+            "bytes": session.bytes,
+            "age_s": now - session.created,
+            "idle_s": now - session.last_access,
+        }
+
+    def session_report(self, session_id):
+        """Uso de memória estimado de uma sessão (como em memory_report), ou None se ela não existir."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return self._report(session, now) if session is not None else None
+
+    def memory_report(self):
+        """Uso de memória estimado por sessão (bytes, mensagens, idade e tempo parado) e o total."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            sessions = {session_id: self._report(session, now) for session_id, session in self._sessions.items()}
+        return {
+            "sessions": sessions,
+            "total_sessions": len(sessions),
+            "total_bytes": sum(session["bytes"] for session in sessions.values()),
+            "evicted": self.evicted,
+        }
@@ -1,63 +1,164 @@
 from .start_rag import StartRAG
 from .RAG.retriever import Retriever
+from .RAG.query_cache import SemanticAnswerCache
 from .LLM.core import LLMCore
-import pandas as pd
-from datetime import datetime
+from .history.history_store import HistoryStore
 from .logger.logger import SimpleLogger
+from .metrics.metrics import metrics
 
 logger = SimpleLogger()
 
 class InputService:
-    def __init__(self):
-        self.rag = StartRAG()
-        self.retriever = Retriever(self.rag.get_db())
-        self.llm = LLMCore()
-        self.log_historychat = "backend/data/history/"
+    def __init__(self, query_cache_size=2048, answer_cache=True, answer_cache_threshold=0.92,
+                 answer_cache_size=1024, answer_cache_ttl=3600, rag=None, llm=None,
+                 history_dir="backend/data/history/", query_batching=None):
+        # Só abre o índice construído offline (python -m backend.services.build_index)
+        self.rag = rag or StartRAG(build=False)
+        self.retriever = Retriever(self.rag.get_db(), model_name=self.rag.model_name,
+                                   query_cache_size=query_cache_size, batching=query_batching)
+        self.llm = llm or LLMCore()
+        self.answer_cache = SemanticAnswerCache(
+            threshold=answer_cache_threshold, max_size=answer_cache_size, ttl=answer_cache_ttl
+        ) if answer_cache else None
+        self.log_historychat = history_dir
+        self.history = HistoryStore(self.log_historychat)
+        metrics.serve_from_env()
         return
+
+    def cache_stats(self):
+        return {
+            "query_embeddings": self.retriever.query_cache.stats(),
+            "answers": self.answer_cache.stats() if self.answer_cache else None,
+        }
     
-    def log_conversation(self, question, session_id, response, log_dir):
-        log_file = f"{log_dir}chat_history_{session_id}.csv"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        df = pd.DataFrame([{
-            'timestamp': [timestamp],
-            "session_id": session_id,
-            "question": question,
-            "answer": response["answer"],
-            "references": response.get("references", [])
-        }])
-        try:
-            df_existing = pd.read_csv(log_file)
-            df = pd.concat([df_existing, df], ignore_index=True)
-        except FileNotFoundError:
-            pass
-        df.to_csv(log_file, index=False)
+    def log_conversation(self, question, session_id, response):
+        # Só enfileira: a gravação acontece em background, fora do caminho da resposta
+        self.history.append(session_id, question, response["answer"], response.get("references", []))
         return
-    
+
+    def _retrieve(self, question, top_k, score):
+        """Busca os chunks da pergunta e consulta o cache semântico de respostas."""
+        logger.info("Buscando documentos relevantes...")
+        query_vector = self.retriever.encode_query(question)
+        scored = self.retriever.search_with_ids(question, top_k=top_k, score=score, query_vector=query_vector)
+        hits = [(text, hit_score) for _, text, hit_score in scored]
+        chunk_ids = [point_id for point_id, _, _ in scored]
+        logger.info(f"Encontrados {len(hits)} documentos com score > {score}")
+
+        if not hits:
+            logger.warning("Nenhum documento relevante encontrado para a pergunta")
+
+        return query_vector, hits, chunk_ids, self._cached_answer(query_vector, hits, chunk_ids)
+
+    def _cached_answer(self, query_vector, hits, chunk_ids):
+        cached_answer = None
+        if self.answer_cache is not None and hits:
+            cached_answer = self.answer_cache.lookup(query_vector, chunk_ids)
+            if cached_answer is not None:
+                metrics.inc("answer_cache_hits_total")
+                logger.info("Resposta servida pelo cache semântico")
+        return cached_answer
+
+    def _remember_answer(self, query_vector, hits, chunk_ids, answer):
+        if self.answer_cache is not None and hits:
+            self.answer_cache.store(query_vector, chunk_ids, answer)
+
+    def reference_texts(self, chunk_ids):
+        """Textos dos chunks referenciados por id (para exibir referências guardadas só como ids)."""
+        return self.retriever.chunk_texts(chunk_ids)
+
+    def _log_turn(self, question, session_id, response):
+        try:
+            # Registrar a conversa no histórico
+            self.log_conversation(question, session_id, response)
+            logger.info("Conversa registrada no histórico")
+        except Exception as e:
+            logger.error(f"Erro ao registrar conversa no histórico: {str(e)}", exc_info=True)
+
+    def retrieve_batch(self, questions, top_k=5, score=0.3, batch_size=64):
+        """
+        Busca de várias perguntas de uma vez: um encode em lotes de 'batch_size' (só das que não
+        estão no cache) e um único search_batch. Retorna (vetor, hits, chunk_ids) por pergunta,
+        para answer_retrieved.
+        """
+        with metrics.span("input.retrieve_batch"):
+            vectors = self.retriever.encode_queries(questions, batch_size=batch_size)
+            results = self.retriever.search_many(vectors, top_k=top_k, score=score)
+        return [(vector, [(text, hit_score) for _, text, hit_score in scored], [point_id for point_id, _, _ in scored])
+                for vector, scored in zip(vectors, results)]
+
+    def answer_retrieved(self, question, query_vector, hits, chunk_ids, memory=()):
+        """
+        Resposta de uma pergunta já buscada com retrieve_batch, pelo cache semântico ou pelo LLM.
+        Não grava histórico (uso offline). Retorna {"answer", "cached", "fallback"}; respostas de
+        fallback (LLM indisponível) não entram no cache.
+        """
+        cached_answer = self._cached_answer(query_vector, hits, chunk_ids)
+        if cached_answer is not None:
+            return {"answer": cached_answer, "cached": True, "fallback": False}
+        response = self.llm.generate_response(question, list(memory), hits)
+        if not response["fallback"]:
+            self._remember_answer(query_vector, hits, chunk_ids, response["answer"])
+        return {"answer": response["answer"], "cached": False, "fallback": response["fallback"]}
+
     def process_question(self, question, memory, session_id, top_k=5, score=0.3):
         logger.info(f"Iniciando processamento de pergunta - Sessão: {session_id}")
         logger.debug(f"Pergunta: {question}")
         try:
-            logger.info("Buscando documentos relevantes...")
-            hits = self.retriever.search(question, top_k=top_k, score=score)
-            logger.info(f"Encontrados {len(hits)} documentos com score > {score}")
-            
-            if not hits:
-                logger.warning("Nenhum documento relevante encontrado para a pergunta")
-            
-            logger.info("Gerando resposta com LLM...")
-            response = self.llm.generate_response(question, memory, hits)
-            logger.info("Resposta gerada com sucesso")
+            with metrics.span("input.process_question"):
+                query_vector, hits, chunk_ids, cached_answer = self._retrieve(question, top_k, score)
+
+                if cached_answer is not None:
+                    response = {"answer": cached_answer, "references": hits}
+                else:
+                    logger.info("Gerando resposta com LLM...")
+                    response = self.llm.generate_response(question, memory, hits)
+                    logger.info("Resposta gerada com sucesso")
+                    # Resposta de fallback (LLM fora do ar) não entra no cache
+                    if not response["fallback"]:
+                        self._remember_answer(query_vector, hits, chunk_ids, response["answer"])
             
         except Exception as e:
             logger.error(f"Erro ao processar pergunta: {str(e)}", exc_info=True)
             raise
 
+        self._log_turn(question, session_id, response)
+        return response
+
+    def process_question_stream(self, question, memory, session_id, top_k=5, score=0.3):
+        """
+        Versão em streaming de process_question: a busca roda na chamada e a resposta vem em
+        "stream", um gerador de fragmentos de texto; "chunk_ids" traz os ids das referências.
+        Cache e histórico são atualizados quando o gerador termina.
+        """
+        logger.info(f"Iniciando processamento de pergunta (streaming) - Sessão: {session_id}")
+        logger.debug(f"Pergunta: {question}")
         try:
-            # Registrar a conversa no histórico
-            self.log_conversation(question, session_id, response, self.log_historychat)
-            logger.info("Conversa registrada no histórico")
+            with metrics.span("input.retrieve"):
+                query_vector, hits, chunk_ids, cached_answer = self._retrieve(question, top_k, score)
         except Exception as e:
-            logger.error(f"Erro ao registrar conversa no histórico: {str(e)}", exc_info=True)
-        
-        return response
\ No newline at end of file
+            logger.error(f"Erro ao processar pergunta: {str(e)}", exc_info=True)
+            raise
+
+        def stream():
+            if cached_answer is not None:
+                answer = cached_answer
+                yield answer
+            else:
+                logger.info("Gerando resposta com LLM (streaming)...")
+                parts = []
+                outcome = {}
+                try:
+                    for part in self.llm.stream_response(question, memory, hits, outcome=outcome):
+                        parts.append(part)
+                        yield part
+                except Exception as e:
+                    logger.error(f"Erro ao gerar resposta: {str(e)}", exc_info=True)
+                    raise
+                answer = "".join(parts).strip()
+                logger.info("Resposta gerada com sucesso")
+                if not outcome.get("fallback"):
+                    self._remember_answer(query_vector, hits, chunk_ids, answer)
+            self._log_turn(question, session_id, {"answer": answer, "references": hits})
+
+        return {"references": hits, "chunk_ids": chunk_ids, "stream": stream()}
@@ -0,0 +1,207 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "nexflix_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Contagem, soma e um reservatório das últimas observações para p50/p95/p99."""
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)] for q in QUANTILES}
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc("stage_errors_total", stage=self.stage)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Metrics:
+    """
+    Registro de métricas do pipeline: spans por estágio (latência), contadores e histogramas.
+
+    Desligado por padrão (NEXFLIX_METRICS=1 liga); desligado, span() devolve um contexto
+    vazio compartilhado e observe/inc retornam de imediato.
+    """
+
+    def __init__(self, enabled=None, window=2048):
+        if enabled is None:
+            enabled = os.getenv("NEXFLIX_METRICS", "").strip().lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.window = window
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._serving_from_env = False
+
+    def span(self, stage):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.window)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            histograms = [
+                {"name": name, "labels": dict(labels), "count": h.count, "sum": h.total,
+                 **{f"p{int(q * 100)}": v for q, v in h.quantiles().items()}}
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+        return {"histograms": histograms, "counters": counters}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} summary")
+                    typed.add(name)
+                for q, v in histogram.quantiles().items():
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels, quantile=q)} {v:.6g}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.total:.6g}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Grava as métricas em texto Prometheus (.prom/.txt) ou JSON (demais extensões)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.render_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_http_server(self, port, host="0.0.0.0"):
+        """Expõe GET /metrics em texto Prometheus numa thread daemon."""
+        if self._server is not None:
+            return self._server
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def serve_from_env(self):
+        """
+        Liga o endpoint (NEXFLIX_METRICS_PORT) e/ou o dump no encerramento (NEXFLIX_METRICS_FILE).
+        Só a primeira chamada do processo tem efeito (cada InputService chama ao ser criado).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._serving_from_env:
+                return
+            self._serving_from_env = True
+        port = os.getenv("NEXFLIX_METRICS_PORT")
+        if port:
+            try:
+                self.start_http_server(int(port))
+            except OSError:
+                pass  # outro processo/sessão já expõe a porta
+        dump_path = os.getenv("NEXFLIX_METRICS_FILE")
+        if dump_path:
+            atexit.register(self.dump, dump_path)
+
+
+metrics = Metrics()
@@ -0,0 +1,112 @@
+import threading
+import time
+from .RAG.encoder_registry import get_encoder
+from .logger.logger import SimpleLogger
+from .metrics.metrics import metrics
+
+logger = SimpleLogger()
+
+# Referência para os tempos de prontidão: o módulo é importado logo no início do processo de serviço
+PROCESS_START = time.monotonic()
+WARMUP_QUERY = "Como cancelar a Netflix?"
+
+
+class ServingState:
+    """
+    Prepara o serviço em uma thread de background, sem bloquear quem importa o app.
+
+    A thread abre o índice construído offline (StartRAG(build=False)), carrega o modelo de
+    embeddings e roda uma busca de aquecimento, e por fim cria o InputService (que importa o
+    LLM). Os módulos pesados só são importados dentro da thread. ready() e status() servem
+    de readiness check; wait() bloqueia até o serviço estar pronto e o devolve (ou levanta o
+    erro da inicialização). Os tempos são medidos desde PROCESS_START.
+    """
+
+    def __init__(self, rag_options=None, service_options=None, warmup_query=WARMUP_QUERY):
+        self.rag_options = rag_options or {}
+        self.service_options = service_options or {}
+        self.warmup_query = warmup_query
+        self.stage = "starting"
+        self.service = None
+        self.error = None
+        self.timings = {}
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._warm, name="serving-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _mark(self, stage):
+        self.timings[f"{stage}_s"] = time.monotonic() - PROCESS_START
+
+    def _warm(self):
+        try:
+            self.stage = "imports"
+            from .input import InputService
+            from .start_rag import StartRAG
+            self._mark("imports")
+
+            self.stage = "index"
+            rag = StartRAG(build=False, **self.rag_options)
+            self._mark("index")
+
+            self.stage = "encoder"
+            with metrics.span("serving.warm_encoder"):
+                query_vector = get_encoder(rag.model_name).encode([self.warmup_query])[0]
+                rag.get_db().search(query_vector, limit=1)
+            self._mark("encoder")
+
+            self.stage = "service"
+            self.service = InputService(rag=rag, **self.service_options)
+            self._mark("ready")
+            self.stage = "ready"
+            metrics.observe("time_to_ready_seconds", self.timings["ready_s"])
+            logger.info(f"Serviço pronto em {self.timings['ready_s']:.2f}s desde o início do processo "
+                        f"(índice {rag.manifest.get('index_version', '?')})")
+        except Exception as e:
+            self.error = e
+            self.stage = "failed"
+            logger.error(f"Falha ao preparar o serviço: {str(e)}", exc_info=True)
+        finally:
+            self._done.set()
+
+    def ready(self):
+        return self.stage == "ready"
+
+    def status(self):
+        """Estado para readiness checks: estágio atual, erro (se houver) e tempos desde o início."""
+        version = None
+        if self.service is not None:
+            # Com snapshots o índice pode ter sido trocado depois do início
+            rag = self.service.rag
+            version = getattr(rag.get_db(), "version", None) or rag.manifest.get("index_version")
+        return {
+            "ready": self.ready(),
+            "stage": self.stage,
+            "error": str(self.error) if self.error is not None else None,
+            "index_version": version,
+            "timings": dict(self.timings),
+        }
+
+    def wait(self, timeout=None):
+        """Devolve o InputService quando pronto; TimeoutError se 'timeout' estourar antes."""
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Serviço ainda não está pronto (estágio: {self.stage})")
+        if self.error is not None:
+            raise self.error
+        return self.service
+
+    def answered(self):
+        """Registra o tempo até a primeira resposta do processo (só a primeira conta)."""
+        with self._lock:
+            if "first_answer_s" in self.timings:
+                return
+            self._mark("first_answer")
+        metrics.observe("time_to_first_answer_seconds", self.timings["first_answer_s"])
+        logger.info(f"Primeira resposta {self.timings['first_answer_s']:.2f}s após o início do processo")
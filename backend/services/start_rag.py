@@ -1,63 +1,258 @@
-from .RAG.vector_db_manager import VectorDBManager
+import hashlib
+import json
+import os
+from datetime import datetime
+from .RAG.vector_store import open_vector_store
 from .RAG.document_indexer import DocumentIndexer
+from .RAG.corpus import iter_articles, chunk_text_by_words, preferred_corpus
+from .RAG.embedding_cache import EmbeddingCache
+from .RAG.near_duplicates import NearDuplicateFilter
+from .RAG.parallel_encoder import default_workers
 from .logger.logger import SimpleLogger
+from .metrics.metrics import metrics
 
 logger = SimpleLogger()
 
+FAQ_PATH = "backend/data/raw_data/faq_complete.txt"
+MODEL_NAME = "all-MiniLM-L6-v2"
+VECTOR_SIZE = 384
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+DEDUP_THRESHOLD = 0.8  # similaridade (Jaccard estimada por MinHash) para remover quase duplicatas
+MANIFEST_VERSION = 1
+# Parâmetros que, se mudarem, invalidam todos os vetores (exigem rebuild completo)
+REBUILD_KEYS = ("version", "backend", "index_mode", "chunk_size", "chunk_overlap", "model_name", "vector_size", "collection")
+# Metadados do artefato gravados pelo build; não entram na comparação dos parâmetros
+ARTIFACT_KEYS = ("index_version", "built_at", "points")
+BUILD_COMMAND = "python -m backend.services.build_index"
+
+
+class IndexNotBuiltError(RuntimeError):
+    """O processo de serviço não encontrou um índice construído compatível com a configuração."""
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Calcula o sha256 do arquivo em blocos, sem carregá-lo inteiro na memória."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_params(manifest):
+    """Parâmetros do índice no manifest, sem os metadados do artefato."""
+    return {key: value for key, value in manifest.items() if key not in ARTIFACT_KEYS}
+
+
+def index_version(params):
+    """Versão do artefato: hash dos parâmetros e do corpus (mesma entrada, mesma versão)."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
 class StartRAG:
-    def __init__(self):
+    """
+    Com build=True (padrão), abre o índice e o constrói/sincroniza se o corpus ou os parâmetros
+    mudaram; é o caminho do build offline (build_index.py). Com build=False, só abre o artefato
+    já construído e levanta IndexNotBuiltError se ele não existir ou não for compatível: o
+    processo de serviço nunca lê o corpus nem calcula embeddings de chunks.
+    """
+
+    def __init__(self, faq_path=FAQ_PATH, model_name=MODEL_NAME, vector_size=VECTOR_SIZE,
+                 chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, incremental=True, force_rebuild=False,
+                 embedding_cache=True, batch_size=256, backend=None, db_path=None, cache_path=None,
+                 dedup_threshold=DEDUP_THRESHOLD, encode_workers=None, build=True):
         logger.info("Iniciando inicialização do RAG system...")
-        
+        self.faq_path = preferred_corpus(faq_path)
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.incremental = incremental
+        self.vector_size = vector_size
+        self.embedding_cache = embedding_cache
+        self.batch_size = batch_size
+        self.backend = backend or os.getenv("NEXFLIX_VECTOR_BACKEND", "qdrant")
+        self.db_path = db_path
+        self.cache_path = cache_path
+        self.dedup_threshold = dedup_threshold
+        self.encode_workers = encode_workers or default_workers()
+        self.dedup_report = None
+        self._dedup = None
+        self.indexer = None
+
         try:
-            logger.info("Lendo arquivo FAQ...")
-            with open("backend/data/raw_data/faq_complete.txt", "r", encoding="utf-8") as f:
-                text = f.read()
-            logger.info(f"Arquivo FAQ lido com sucesso ({len(text)} caracteres)")
-            
-            # 2. Criar chunks de 500 palavras (com overlap de 50)
-            logger.info("Criando chunks de texto...")
-            chunks = self.chunk_text_by_words(text, 500, 50)
-            logger.info(f"📑 Total de chunks gerados: {len(chunks)}")
-            
-            # 3. Inicializar DB
-            logger.info("Inicializando banco de dados vetorial...")
-            self.db = VectorDBManager(collection_name="faq", vector_size=384)  # modo embedded
-            logger.info("Criando collection no banco de dados...")
-            self.db.create_collection()
-            logger.info("Collection criada com sucesso")
-            
-            # 4. Indexar documentos
-            logger.info("Iniciando indexação de documentos...")
-            self.indexer = DocumentIndexer(self.db)
-            logger.info("Adicionando documentos ao índice...")
-            self.indexer.add_documents(chunks)
-            logger.info("Documentos indexados com sucesso")
-            
+            with metrics.span("startup.total"):
+                if build:
+                    self._start(vector_size, force_rebuild)
+                else:
+                    self._open(vector_size)
             logger.info("✅ Sistema RAG inicializado com sucesso!")
-            
+
         except Exception as e:
             logger.error(f"Erro durante inicialização do RAG: {str(e)}", exc_info=True)
             raise
-    
+
+    def _start(self, vector_size, force_rebuild):
+        # 1. Identificar a versão do corpus e dos parâmetros do índice
+        logger.info("Calculando hash do arquivo FAQ...")
+        with metrics.span("startup.hash_corpus"):
+            self.manifest = {
+                "version": MANIFEST_VERSION,
+                "backend": self.backend,
+                "index_mode": "articles" if self.incremental else "words",
+                "corpus_hash": file_sha256(self.faq_path),
+                "chunk_size": self.chunk_size,
+                "chunk_overlap": self.overlap,
+                "model_name": self.model_name,
+                "vector_size": vector_size,
+                "dedup_threshold": self.dedup_threshold if self.incremental else None,
+            }
+
+        # 2. Abrir DB persistente
+        logger.info("Abrindo banco de dados vetorial...")
+        with metrics.span("startup.open_db"):
+            self.db = open_vector_store(self.backend, collection_name="faq", vector_size=vector_size, path=self.db_path)
+            self.manifest["collection"] = self.db.collection_name
+            stored = None if force_rebuild else self._load_valid_manifest()
+
+        if stored is not None and index_params(stored) == self.manifest:
+            self.manifest = stored
+            logger.info(f"Índice existente reaproveitado ({self.db.count()} pontos)")
+        elif stored is not None and self.incremental and self._same_index_params(stored):
+            with metrics.span("startup.refresh"):
+                self._refresh()
+        else:
+            with metrics.span("startup.rebuild"):
+                self._rebuild()
+
+        # O pool de embedding só serve para indexar; as buscas usam o modelo do processo
+        if self.indexer is not None:
+            self.indexer.close()
+
+    def _open(self, vector_size):
+        """Abre o índice construído offline, sem tocar no corpus."""
+        # Snapshots podem ser trocados em execução: só aceita os do mesmo modelo
+        options = {"model_name": self.model_name} if self.backend == "snapshot" else {}
+        with metrics.span("startup.open_db"):
+            self.db = open_vector_store(self.backend, collection_name="faq", vector_size=vector_size, path=self.db_path,
+                                        **options)
+            stored = self.db.load_manifest()
+        if stored is None or not self.db.collection_exists():
+            raise IndexNotBuiltError(f"Nenhum índice construído em {self.db.path}; rode `{BUILD_COMMAND}`")
+        expected = {"backend": self.backend, "model_name": self.model_name, "vector_size": vector_size}
+        mismatched = sorted(key for key, value in expected.items() if stored.get(key) != value)
+        if mismatched:
+            raise IndexNotBuiltError(f"Índice em {self.db.path} construído com outro {', '.join(mismatched)}; "
+                                     f"rode `{BUILD_COMMAND}`")
+        self.manifest = stored
+        logger.info(f"Índice {stored.get('index_version', '?')} aberto ({self.db.count()} pontos, "
+                    f"construído em {stored.get('built_at', '?')})")
+
+    def _load_valid_manifest(self):
+        stored = self.db.load_manifest()
+        if stored is None:
+            logger.info("Nenhum manifest encontrado, o índice será construído")
+            return None
+        if not self.db.collection_exists():
+            logger.warning("Manifest presente mas collection ausente, o índice será reconstruído")
+            return None
+        if index_params(stored) != self.manifest:
+            changed = sorted(k for k in self.manifest if stored.get(k) != self.manifest[k])
+            logger.info(f"Manifest divergente ({', '.join(changed)})")
+        return stored
+
+    def _same_index_params(self, stored):
+        return all(stored.get(k) == self.manifest.get(k) for k in REBUILD_KEYS)
+
+    def _refresh(self):
+        """Atualiza só os artigos novos/alterados/removidos desde o último manifest."""
+        # A sincronização compara com os hashes gravados nos payloads, então é idempotente:
+        # se cair no meio, o manifest antigo continua divergente e o próximo boot retoma.
+        logger.info("Corpus alterado, sincronizando artigos de forma incremental...")
+        stats = self.get_indexer().sync_articles(self._articles(), self.chunk_size, self.overlap)
+        self._log_dedup_report()
+        logger.info(f"Sincronização incremental concluída: {stats}")
+        self._log_cache_stats()
+        self._write_manifest()
+
+    def _rebuild(self):
+        # Remove o manifest antes de mexer na collection: se o processo cair no meio
+        # da indexação, o próximo boot reconstrói em vez de reabrir um índice parcial.
+        self.db.clear_manifest()
+
+        logger.info("Criando collection no banco de dados...")
+        self.db.create_collection()
+        logger.info("Collection criada com sucesso")
+
+        if self.incremental:
+            logger.info("Indexando artigos do FAQ...")
+            stats = self.get_indexer().sync_articles(self._articles(), self.chunk_size, self.overlap)
+            logger.info(f"Documentos indexados com sucesso: {stats}")
+            self._log_dedup_report()
+        else:
+            self._index_words()
+
+        self._log_cache_stats()
+        self._write_manifest()
+
+    def _write_manifest(self):
+        params = index_params(self.manifest)
+        self.manifest = {**params, "index_version": index_version(params),
+                         "built_at": datetime.now().isoformat(timespec="seconds"), "points": self.db.count()}
+        self.db.write_manifest(self.manifest)
+        logger.info(f"Manifest do índice gravado (versão {self.manifest['index_version']})")
+
+    def _articles(self):
+        """Artigos do corpus em streaming, sem as quase duplicatas (se o filtro estiver ligado)."""
+        articles = iter_articles(self.faq_path)
+        if self.dedup_threshold is None:
+            return articles
+        self._dedup = NearDuplicateFilter(self.dedup_threshold)
+        return self._dedup.filter(articles)
+
+    def _log_dedup_report(self):
+        if self.dedup_threshold is not None:
+            self.dedup_report = self._dedup.report
+            logger.info(f"Quase duplicatas: {self._dedup.summary()}")
+
+    def _index_words(self):
+        logger.info("Lendo arquivo FAQ...")
+        if self.faq_path.endswith(".jsonl"):
+            text = "\n".join(article["content"] for article in iter_articles(self.faq_path))
+        else:
+            with open(self.faq_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        logger.info(f"Arquivo FAQ lido com sucesso ({len(text)} caracteres)")
+
+        # Criar chunks de 500 palavras (com overlap de 50)
+        logger.info("Criando chunks de texto...")
+        chunks = self.chunk_text_by_words(text, self.chunk_size, self.overlap)
+        logger.info(f"📑 Total de chunks gerados: {len(chunks)}")
+
+        logger.info("Adicionando documentos ao índice...")
+        self.get_indexer().add_documents(chunks)
+        logger.info("Documentos indexados com sucesso")
+
+    def _log_cache_stats(self):
+        cache = self.get_indexer().cache
+        if cache is not None:
+            logger.info(f"Cache de embeddings: {cache.stats()}")
+
     def chunk_text_by_words(self, text, chunk_size, overlap):
         """Divide texto em chunks de 'chunk_size' palavras, com sobreposição de 'overlap'."""
-        words = text.split()
-        chunks = []
-        start = 0
-
-        while start < len(words):
-            end = start + chunk_size
-            chunk = " ".join(words[start:end])
-            chunks.append(chunk)
-            start += chunk_size - overlap
-
-        return chunks
-    
+        return chunk_text_by_words(text, chunk_size, overlap)
+
     def get_db(self):
         return self.db
     def get_indexer(self):
+        if self.indexer is None:
+            cache = None
+            if self.embedding_cache:
+                cache_kwargs = {"path": self.cache_path} if self.cache_path else {}
+                cache = EmbeddingCache(self.model_name, self.vector_size, **cache_kwargs)
+            self.indexer = DocumentIndexer(self.db, model_name=self.model_name, cache=cache,
+                                           batch_size=self.batch_size, workers=self.encode_workers)
         return self.indexer
     def close_db(self):
-        self.db.client.close()
+        self.db.close()
         return
-
@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from backend.services.LLM.fake import FakeMessage
+
+TOKENS = ("Olá ", "mundo.")
+
+
+class ScriptedChatModel:
+    """
+    Modelo de chat roteirizado para testes: cada chamada (invoke ou stream) consome o próximo
+    passo de 'script', e com o roteiro esgotado as chamadas respondem normalmente. Passos:
+
+        "ok"                responde TOKENS
+        ("sleep", s)        espera s segundos e responde
+        exceção             levanta a exceção antes do primeiro token
+        ("break", exceção)  envia o primeiro token e levanta a exceção
+    """
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next_step(self):
+        with self._lock:
+            self.calls += 1
+            return self.script.pop(0) if self.script else "ok"
+
+    def stream(self, messages):
+        step = self._next_step()
+        if isinstance(step, BaseException):
+            raise step
+        if isinstance(step, tuple) and step[0] == "sleep":
+            time.sleep(step[1])
+        for i, token in enumerate(TOKENS):
+            if i and isinstance(step, tuple) and step[0] == "break":
+                raise step[1]
+            yield FakeMessage(token)
+
+    def invoke(self, messages):
+        return FakeMessage("".join(chunk.content for chunk in self.stream(messages)))
+
+
+class FakeEncoder:
+    """
+    Substituto do SentenceTransformer: vetor unitário determinístico por texto (derivado do
+    hash), sem carregar modelo. Guarda os textos recebidos em 'encoded'.
+    """
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode(self, texts, show_progress_bar=False, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self.encoded.extend(texts)
+        return np.stack([self.vector(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
@@ -0,0 +1,68 @@
+import json
+from backend.services.batch_qa import completed, read_questions, run
+
+
+class FakeService:
+    """Responde sem índice nem LLM; as perguntas em 'fail' levantam erro, as em 'fallback' caem no fallback."""
+
+    def __init__(self, fail=(), fallback=()):
+        self.fail, self.fallback = set(fail), set(fallback)
+
+    def retrieve_batch(self, questions, top_k, score, batch_size):
+        return [([0.0], [("trecho", 0.9)], [1]) for _ in questions]
+
+    def answer_retrieved(self, question, vector, hits, chunk_ids):
+        if question in self.fail:
+            raise RuntimeError("LLM fora do ar")
+        return {"answer": f"resposta: {question}", "cached": False, "fallback": question in self.fallback}
+
+
+def records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_questions_skips_records_without_a_question(tmp_path, capsys):
+    path = tmp_path / "perguntas.jsonl"
+    path.write_text('{"id": "a", "question": "Como cancelar?"}\n'
+                    '{"id": "b", "pergunta": "campo errado"}\n'
+                    'isto não é json\n'
+                    '\n'
+                    '["lista"]\n'
+                    '{"question": "Como mudar a senha?"}\n', encoding="utf-8")
+    assert list(read_questions(str(path))) == [("a", "Como cancelar?"), ("6", "Como mudar a senha?")]
+    output = capsys.readouterr().out
+    assert all(f"Linha {number} " in output for number in (2, 3, 5))
+
+
+def test_completed_compacts_the_output_before_resuming(tmp_path, capsys):
+    path = tmp_path / "respostas.jsonl"
+    lines = [
+        {"id": "1", "question": "q1", "answer": "r1", "fallback": False},
+        {"id": "2", "question": "q2", "error": "RuntimeError: LLM fora do ar"},
+        {"id": "3", "question": "q3", "answer": "r3", "fallback": True},
+        {"id": "1", "question": "q1", "answer": "r1 de novo", "fallback": False},
+    ]
+    text = "".join(json.dumps(line) + "\n" for line in lines[:2]) + '{"id": "x", "quest\n' + \
+        "".join(json.dumps(line) + "\n" for line in lines[2:]) + '{"id": "4", "question": "q4", "ans'
+    path.write_text(text, encoding="utf-8")
+
+    assert completed(str(path)) == {("1", "q1")}
+    assert records(path) == [lines[0]]
+    assert "2 linha(s) corrompida(s)" in capsys.readouterr().out
+    assert not (tmp_path / "respostas.jsonl.tmp").exists()
+
+
+def test_resumed_run_leaves_one_record_per_question(tmp_path):
+    questions = [(str(i), f"pergunta {i}") for i in range(6)]
+    path = str(tmp_path / "respostas.jsonl")
+    summary = run(FakeService(fail={"pergunta 1"}, fallback={"pergunta 4"}), questions, path, batch_size=4,
+                  concurrency=2)
+    assert (summary["answered"], summary["errors"], summary["fallback"]) == (5, 1, 1)
+
+    done = completed(path)
+    run(FakeService(), [item for item in questions if item not in done], path, batch_size=4, concurrency=2)
+
+    result = records(path)
+    assert sorted(record["id"] for record in result) == [str(i) for i in range(6)]
+    assert not any("error" in record or record["fallback"] for record in result)
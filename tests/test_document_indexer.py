@@ -0,0 +1,70 @@
+import uuid
+import pytest
+from backend.services.RAG import encoder_registry
+from backend.services.RAG.corpus import content_hash
+from backend.services.RAG.document_indexer import DocumentIndexer, point_id
+from backend.services.RAG.numpy_store import NumpyVectorStore
+from tests.helpers import FakeEncoder
+
+MODEL = "fake-minilm"
+DIM = 8
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = FakeEncoder(DIM)
+    monkeypatch.setitem(encoder_registry._encoders, MODEL, encoder)
+    return encoder
+
+
+def article(n, content=None):
+    content = content or f"Resposta do artigo {n} sobre a conta."
+    return {"url": f"https://help.netflix.com/pt/node/{n}", "title": f"Artigo {n}", "content": content,
+            "content_hash": content_hash(content)}
+
+
+def sync(path, articles):
+    db = NumpyVectorStore("faq", DIM, path=str(path), quantize=False)
+    stats = DocumentIndexer(db, model_name=MODEL).sync_articles(articles, chunk_size=50, overlap=5)
+    db.flush()
+    return db, stats
+
+
+def points(db):
+    return {point: payload["url"] for point, _, payload in db.iter_points()}
+
+
+def test_point_id_is_a_stable_uuid5():
+    first = point_id("https://help.netflix.com/pt/node/1", "abc", 0)
+    assert uuid.UUID(first).version == 5
+    assert first == str(uuid.uuid5(uuid.NAMESPACE_URL, "https://help.netflix.com/pt/node/1#abc#0"))
+    assert first != point_id("https://help.netflix.com/pt/node/1", "abc", 1)
+
+
+def test_sync_adds_updates_and_removes_articles(encoder, tmp_path):
+    db, stats = sync(tmp_path, [article(1), article(2), article(3)])
+    assert stats == {"added": 3, "updated": 0, "unchanged": 0, "removed": 0, "chunks": 3}
+    before = points(db)
+
+    encoder.encoded.clear()
+    changed = article(2, "Resposta nova do artigo 2.")
+    db, stats = sync(tmp_path, [article(1), changed, article(4)])
+    assert stats == {"added": 1, "updated": 1, "unchanged": 1, "removed": 1, "chunks": 2}
+    assert len(encoder.encoded) == 2  # só o diff passa pelo modelo
+
+    after = points(db)
+    assert sorted(set(after.values())) == [article(n)["url"] for n in (1, 2, 4)]
+    assert db.article_hashes()[changed["url"]] == changed["content_hash"]  # só os chunks novos ficaram
+    kept = {point for point, url in before.items() if url == article(1)["url"]}
+    assert kept and kept <= set(after)
+
+
+def test_point_ids_are_stable_across_runs(encoder, tmp_path):
+    articles = [article(1), article(2)]
+    first, _ = sync(tmp_path / "a", articles)
+    second, _ = sync(tmp_path / "b", articles)
+    assert sorted(points(first)) == sorted(points(second))
+
+    again, stats = sync(tmp_path / "a", articles)  # mesma collection: nada muda
+    assert stats["unchanged"] == 2 and stats["chunks"] == 0
+    assert points(again) == points(first)
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pytest
+from backend.services.RAG import embedding_cache
+from backend.services.RAG.embedding_cache import CURRENT_FILE, EmbeddingCache
+
+DIM = 4
+TEXTS = [f"pergunta {i}" for i in range(6)]
+
+
+def fake_encode(texts):
+    """Vetor determinístico por texto, para conferir que cada texto volta com o seu vetor."""
+    return np.array([[int(text.split()[-1])] * DIM for text in texts], dtype=np.float32)
+
+
+def filled_cache(path):
+    cache = EmbeddingCache("modelo/teste", DIM, path=str(path))
+    cache.encode(TEXTS, fake_encode)
+    cache.encode(TEXTS[:2] + ["pergunta 1"], fake_encode)  # só acertos
+    return cache
+
+
+def assert_vectors(cache, texts):
+    vectors = cache.encode(texts, lambda missing: pytest.fail(f"não deveria recodificar {missing}"))
+    assert np.array_equal(vectors, fake_encode(texts))
+
+
+def test_compact_keeps_each_text_with_its_vector(tmp_path):
+    cache = filled_cache(tmp_path)
+    assert cache.compact(keep_texts=TEXTS[3:]) == (6, 3)
+    assert_vectors(cache, TEXTS[3:])
+
+    reopened = EmbeddingCache("modelo/teste", DIM, path=str(tmp_path))
+    assert len(reopened) == 3
+    assert_vectors(reopened, TEXTS[3:])
+    assert sorted(os.listdir(reopened.dir)) == [CURRENT_FILE, "gen-000001", "meta.json"]
+
+    reopened.encode(["pergunta 7"], fake_encode)  # novos vetores vão para a geração atual
+    reopened.compact()
+    assert sorted(os.listdir(reopened.dir)) == [CURRENT_FILE, "gen-000002", "meta.json"]
+    assert_vectors(EmbeddingCache("modelo/teste", DIM, path=str(tmp_path)), TEXTS[3:] + ["pergunta 7"])
+
+
+def test_crash_before_the_pointer_swap_keeps_the_old_cache(tmp_path, monkeypatch):
+    cache = filled_cache(tmp_path)
+    cache.compact()
+    real_replace = os.replace
+
+    def crash(src, dst):
+        raise OSError("processo interrompido")
+
+    # Compactação interrompida depois de gravar vetores e chaves novos, antes de trocar o ponteiro
+    monkeypatch.setattr(embedding_cache.os, "replace", crash)
+    with pytest.raises(OSError):
+        cache.compact(keep_texts=TEXTS[4:])
+    monkeypatch.setattr(embedding_cache.os, "replace", real_replace)
+
+    reopened = EmbeddingCache("modelo/teste", DIM, path=str(tmp_path))
+    assert reopened.generation == "gen-000001"
+    assert len(reopened) == 6
+    assert_vectors(reopened, TEXTS)
+
+    assert reopened.compact(keep_texts=TEXTS[4:]) == (6, 2)  # a próxima compactação reaproveita o nome
+    assert_vectors(EmbeddingCache("modelo/teste", DIM, path=str(tmp_path)), TEXTS[4:])
+
+
+def test_crash_after_the_pointer_swap_uses_the_new_cache(tmp_path, monkeypatch):
+    cache = filled_cache(tmp_path)
+
+    def crash(keep):
+        raise OSError("processo interrompido")
+
+    # Interrompida depois da troca, antes de apagar os arquivos do formato antigo
+    monkeypatch.setattr(cache, "_remove_generations", crash)
+    with pytest.raises(OSError):
+        cache.compact(keep_texts=TEXTS[3:])
+
+    reopened = EmbeddingCache("modelo/teste", DIM, path=str(tmp_path))
+    assert reopened.generation == "gen-000001"
+    assert len(reopened) == 3
+    assert_vectors(reopened, TEXTS[3:])
+
+
+def test_model_change_discards_every_generation(tmp_path):
+    filled_cache(tmp_path).compact()
+    cache = EmbeddingCache("modelo/teste", DIM + 1, path=str(tmp_path))
+    assert len(cache) == 0 and cache.generation == ""
+    assert sorted(os.listdir(cache.dir)) == ["meta.json"]
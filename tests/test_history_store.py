@@ -0,0 +1,38 @@
+import os
+from backend.services.history import history_store
+from backend.services.history.history_store import HistoryStore, iter_records
+
+
+def test_unexpected_writer_error_does_not_block_flush(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    write = store._write
+
+    def broken(batch):
+        raise ValueError("falha inesperada")
+
+    store._write = broken
+    store.append("s1", "pergunta", "resposta")
+    assert store.flush(timeout=2)
+
+    store._write = write  # a thread continua viva e grava os próximos registros
+    store.append("s1", "outra pergunta", "outra resposta", references=[("trecho", {1, 2})])
+    assert store.flush(timeout=2)
+    store.close()
+    records = list(iter_records(str(tmp_path)))
+    assert [record["question"] for record in records] == ["outra pergunta"]
+    assert records[0]["references"] == [["trecho", "{1, 2}"]]  # valores fora do JSON viram texto
+
+
+def test_failed_writes_are_counted(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path))
+
+    def full_disk(fd, data):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(history_store.os, "write", full_disk)
+    for i in range(3):
+        store.append("s1", f"pergunta {i}", "resposta")
+    assert store.flush(timeout=2)
+    monkeypatch.setattr(history_store.os, "write", os.write)
+    store.close()
+    assert (store.written, store.errors) == (0, 3)
@@ -0,0 +1,162 @@
+import threading
+import time
+import pytest
+from backend.services.LLM.provider import (CircuitBreaker, CircuitOpenError, LLMTimeoutError, LLMUnavailableError,
+                                           ResilientChatModel)
+from tests.helpers import ScriptedChatModel
+
+MESSAGES = ["pergunta"]
+ANSWER = "Olá mundo."
+
+
+def resilient(script=(), **options):
+    model = ScriptedChatModel(script)
+    options = {"backoff_base": 0.001, "backoff_max": 0.001, **options}
+    return model, ResilientChatModel(model, **options)
+
+
+def open_breaker(client, reset_timeout):
+    """Abre o breaker com falhas transitórias e espera o reset_timeout (próxima chamada é a prova)."""
+    for _ in range(client.breaker.failure_threshold):
+        with pytest.raises(LLMUnavailableError):
+            client.invoke(MESSAGES)
+    assert client.breaker.state == "open"
+    time.sleep(reset_timeout + 0.02)
+
+
+# --- Retries e prazo ---
+
+def test_retries_transient_errors_then_succeeds():
+    model, client = resilient([ConnectionError(), TimeoutError()], max_retries=2)
+    assert client.invoke(MESSAGES).content == ANSWER
+    assert model.calls == 3
+
+
+def test_gives_up_after_max_retries():
+    model, client = resilient([ConnectionError()] * 5, max_retries=1)
+    with pytest.raises(LLMUnavailableError):
+        client.invoke(MESSAGES)
+    assert model.calls == 2
+
+
+def test_non_retryable_error_is_raised_without_retry():
+    model, client = resilient([ValueError("pedido inválido")], max_retries=2)
+    with pytest.raises(ValueError):
+        client.invoke(MESSAGES)
+    assert model.calls == 1
+    assert client.breaker.state == "closed"
+
+
+def test_invoke_respects_deadline():
+    _, client = resilient([("sleep", 1.0)], timeout=0.1, max_retries=0)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        client.invoke(MESSAGES)
+    assert time.monotonic() - start < 0.5
+
+
+def test_stream_deadline_applies_until_first_token():
+    _, client = resilient([("sleep", 1.0)], timeout=0.1, max_retries=0)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        list(client.stream(MESSAGES))
+    assert time.monotonic() - start < 0.5
+
+
+def test_stream_retries_before_first_token_only():
+    model, client = resilient([ConnectionError()], max_retries=1)
+    assert "".join(chunk.content for chunk in client.stream(MESSAGES)) == ANSWER
+    assert model.calls == 2
+
+    model, client = resilient([("break", ConnectionError())], max_retries=2)
+    received = []
+    with pytest.raises(LLMUnavailableError):
+        for chunk in client.stream(MESSAGES):
+            received.append(chunk.content)
+    assert received == ["Olá "]
+    assert model.calls == 1  # repetir duplicaria o texto já entregue
+
+
+# --- Circuit breaker ---
+
+def test_circuit_opens_and_rejects_without_calling_model():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    model, client = resilient([ConnectionError()] * 2, max_retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            client.invoke(MESSAGES)
+    with pytest.raises(CircuitOpenError):
+        client.invoke(MESSAGES)
+    assert model.calls == 2
+
+
+def test_half_open_lets_a_single_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    model, client = resilient([ConnectionError()] * 2 + [("sleep", 0.2)], max_retries=0, breaker=breaker)
+    open_breaker(client, 0.05)
+
+    probe = {}
+    thread = threading.Thread(target=lambda: probe.setdefault("result", client.invoke(MESSAGES)))
+    thread.start()
+    time.sleep(0.05)
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        client.invoke(MESSAGES)  # a prova ainda está em andamento
+    thread.join()
+
+    assert probe["result"].content == ANSWER
+    assert breaker.state == "closed"
+    assert model.calls == 3
+    assert client.invoke(MESSAGES).content == ANSWER
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    model, client = resilient([ConnectionError()] * 3, max_retries=0, breaker=breaker)
+    open_breaker(client, 0.05)
+    with pytest.raises(LLMUnavailableError):
+        client.invoke(MESSAGES)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.invoke(MESSAGES)
+    assert model.calls == 3
+
+
+def test_non_retryable_probe_error_does_not_leave_circuit_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    _, client = resilient([ConnectionError()] * 2 + [ValueError("pedido inválido")], max_retries=0,
+                          breaker=breaker)
+    open_breaker(client, 0.05)
+    with pytest.raises(ValueError):
+        client.invoke(MESSAGES)
+    assert breaker.state == "closed"
+    assert client.invoke(MESSAGES).content == ANSWER
+
+
+def test_abandoned_stream_probe_settles_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    _, client = resilient([ConnectionError()] * 2, max_retries=0, breaker=breaker)
+    open_breaker(client, 0.05)
+    stream = client.stream(MESSAGES)
+    assert next(stream).content == "Olá "
+    stream.close()
+    assert breaker.state == "closed"
+
+
+# --- Hedge e limites ---
+
+def test_hedged_request_returns_the_faster_response():
+    model, client = resilient([("sleep", 1.0)], hedge=True, hedge_min_samples=5, timeout=5)
+    client._latencies.extend([0.01] * 5)
+    start = time.monotonic()
+    assert client.invoke(MESSAGES).content == ANSWER
+    assert time.monotonic() - start < 0.5
+    assert model.calls == 2
+
+
+def test_failed_slot_acquire_returns_the_rate_token():
+    _, client = resilient(max_concurrency=1, rate_per_second=0.001, burst=1)
+    client._semaphore.acquire()  # a única vaga está ocupada
+    assert not client._acquire(time.monotonic() + 1, block=False)
+    client._semaphore.release()
+    assert client._acquire(time.monotonic() + 1, block=False)  # o token não foi desperdiçado
@@ -0,0 +1,48 @@
+from backend.services.LLM.core import FALLBACK_NO_DOCS, LLMCore
+from backend.services.LLM.fake import FakeStreamingChatModel
+from tests.helpers import ScriptedChatModel
+
+CHUNKS = [
+    ("=== Como cancelar a Netflix (https://help.netflix.com/pt/node/407) ===\n"
+     "Para cancelar, acesse a página Conta e selecione Cancelar assinatura.", 0.91),
+]
+FAST_FAILURE = {"max_retries": 0, "backoff_base": 0.001}
+
+
+def test_stream_response_yields_fragments_in_order():
+    llm = LLMCore(model=FakeStreamingChatModel(answer="Acesse a página Conta e cancele."), resilience=False)
+    outcome = {}
+    parts = list(llm.stream_response("Como cancelar?", [], CHUNKS, outcome=outcome))
+    assert parts == ["Acesse ", "a ", "página ", "Conta ", "e ", "cancele."]
+    assert outcome == {"fallback": False}
+
+
+def test_stream_and_generate_give_the_same_answer():
+    llm = LLMCore(model=FakeStreamingChatModel(), resilience=False)
+    streamed = "".join(llm.stream_response("Como cancelar?", [], CHUNKS)).strip()
+    response = llm.generate_response("Como cancelar?", [], CHUNKS)
+    assert streamed == response["answer"]
+    assert response["fallback"] is False
+
+
+def test_stream_response_falls_back_when_llm_is_unavailable():
+    llm = LLMCore(model=FakeStreamingChatModel(fail_first=10), resilience=FAST_FAILURE)
+    outcome = {}
+    parts = list(llm.stream_response("Como cancelar?", [], CHUNKS, outcome=outcome))
+    assert parts == [llm.fallback_answer(CHUNKS)]
+    assert "https://help.netflix.com/pt/node/407" in parts[0]
+    assert outcome == {"fallback": True}
+
+
+def test_stream_response_appends_fallback_after_partial_answer():
+    llm = LLMCore(model=ScriptedChatModel([("break", ConnectionError())]), resilience=FAST_FAILURE)
+    outcome = {}
+    parts = list(llm.stream_response("Como cancelar?", [], CHUNKS, outcome=outcome))
+    assert parts[0] == "Olá "
+    assert parts[1] == "\n\n" + llm.fallback_answer(CHUNKS)
+    assert outcome == {"fallback": True}
+
+
+def test_fallback_without_documents():
+    llm = LLMCore(model=FakeStreamingChatModel(fail_first=10), resilience=FAST_FAILURE)
+    assert list(llm.stream_response("Como cancelar?", [], [])) == [FALLBACK_NO_DOCS]
@@ -0,0 +1,75 @@
+import pytest
+from backend.services.metrics import metrics as metrics_module
+from backend.services.metrics.metrics import Histogram, Metrics
+
+
+def test_spans_record_latency_and_errors():
+    registry = Metrics(enabled=True)
+    with registry.span("retrieve"):
+        pass
+    with pytest.raises(ValueError):
+        with registry.span("retrieve"):
+            raise ValueError("falhou")
+
+    snapshot = registry.snapshot()
+    [histogram] = snapshot["histograms"]
+    assert histogram["name"] == "stage_seconds" and histogram["labels"] == {"stage": "retrieve"}
+    assert histogram["count"] == 2 and histogram["sum"] >= 0
+    assert snapshot["counters"] == [{"name": "stage_errors_total", "labels": {"stage": "retrieve"}, "value": 1}]
+
+
+def test_disabled_registry_records_nothing():
+    registry = Metrics(enabled=False)
+    with registry.span("retrieve"):
+        registry.inc("requests_total")
+        registry.observe("latency", 1.0)
+    assert registry.snapshot() == {"histograms": [], "counters": []}
+    assert registry.render_prometheus() == "\n"
+
+
+def test_histogram_percentiles_use_the_recent_window():
+    histogram = Histogram(window=100)
+    for value in range(1, 101):
+        histogram.observe(value)
+    assert histogram.quantiles() == {0.5: 50, 0.95: 95, 0.99: 99}
+
+    for value in range(1001, 1051):  # as 50 mais antigas saem da janela
+        histogram.observe(value)
+    assert histogram.count == 150 and histogram.total == sum(range(1, 101)) + sum(range(1001, 1051))
+    assert histogram.quantiles()[0.5] == 100
+    assert Histogram().quantiles() == {0.5: 0.0, 0.95: 0.0, 0.99: 0.0}
+
+
+def test_prometheus_text_format():
+    registry = Metrics(enabled=True)
+    registry.inc("api_requests_total", endpoint="/ask", status=200)
+    registry.inc("api_requests_total", 2, endpoint="/ask", status=503)
+    for value in (0.1, 0.2, 0.3):
+        registry.observe("stage_seconds", value, stage="llm")
+
+    assert registry.render_prometheus().splitlines() == [
+        "# TYPE nexflix_api_requests_total counter",
+        'nexflix_api_requests_total{endpoint="/ask",status="200"} 1',
+        'nexflix_api_requests_total{endpoint="/ask",status="503"} 2',
+        "# TYPE nexflix_stage_seconds summary",
+        'nexflix_stage_seconds{stage="llm",quantile="0.5"} 0.2',
+        'nexflix_stage_seconds{stage="llm",quantile="0.95"} 0.3',
+        'nexflix_stage_seconds{stage="llm",quantile="0.99"} 0.3',
+        'nexflix_stage_seconds_sum{stage="llm"} 0.6',
+        'nexflix_stage_seconds_count{stage="llm"} 3',
+    ]
+
+
+def test_serve_from_env_registers_the_dump_once(monkeypatch, tmp_path):
+    registered = []
+    monkeypatch.setattr(metrics_module.atexit, "register", lambda *args: registered.append(args))
+    monkeypatch.setenv("NEXFLIX_METRICS_FILE", str(tmp_path / "metrics.json"))
+    monkeypatch.delenv("NEXFLIX_METRICS_PORT", raising=False)
+
+    registry = Metrics(enabled=True)
+    for _ in range(3):  # um InputService por sessão
+        registry.serve_from_env()
+    assert registered == [(registry.dump, str(tmp_path / "metrics.json"))]
+
+    Metrics(enabled=False).serve_from_env()
+    assert len(registered) == 1
@@ -0,0 +1,57 @@
+import threading
+import pytest
+from backend.services.RAG.micro_batcher import MicroBatcher
+
+
+class Gate:
+    """fn que segura o primeiro lote até release(), para os itens seguintes formarem um único lote."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.sizes = []
+        self.started = threading.Event()
+        self._released = threading.Event()
+
+    def __call__(self, items):
+        self.sizes.append(len(items))
+        self.started.set()
+        self._released.wait(2)
+        return self.fn(items)
+
+    def submit(self, batcher, items):
+        futures = [batcher.submit(items[0])]
+        assert self.started.wait(2)
+        futures += [batcher.submit(item) for item in items[1:]]
+        self._released.set()
+        return futures
+
+
+def test_results_follow_the_order_of_the_batch():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(10)]
+    assert [future.result(timeout=2) for future in futures] == list(range(0, 20, 2))
+
+
+def test_items_without_a_result_get_an_error_instead_of_hanging():
+    gate = Gate(lambda items: items[:1])  # só o primeiro item de cada lote recebe resultado
+    batcher = MicroBatcher(gate, max_wait_ms=50, name="curto")
+    futures = gate.submit(batcher, ["a", "b", "c", "d"])
+
+    assert futures[0].result(timeout=2) == "a"
+    assert gate.sizes == [1, 3]
+    assert futures[1].result(timeout=2) == "b"
+    for future in futures[2:]:
+        with pytest.raises(RuntimeError, match="1 resultado"):
+            future.result(timeout=2)
+
+
+def test_error_in_fn_reaches_every_item_of_the_batch():
+    def broken(items):
+        raise ValueError("modelo indisponível")
+
+    gate = Gate(broken)
+    batcher = MicroBatcher(gate, max_wait_ms=50)
+    futures = gate.submit(batcher, [1, 2, 3])
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
@@ -0,0 +1,37 @@
+from backend.services.RAG.near_duplicates import NearDuplicateFilter
+
+BASE = (
+    "Para alterar a forma de pagamento da sua conta Netflix, entre na página Conta pelo navegador. "
+    "Em Assinatura e cobrança, selecione Gerenciar informações de pagamento e escolha a nova forma. "
+    "Você pode usar cartão de crédito, cartão de débito ou um parceiro de cobrança disponível na sua região. "
+    "A alteração vale a partir da próxima cobrança e não muda a data de vencimento da assinatura. "
+    "Se o pagamento for recusado, confira os dados do cartão com o banco emissor e tente novamente. "
+    "Caso o problema continue, entre em contato com o atendimento para verificar a situação da conta."
+)
+
+
+def article(url, content):
+    return {"url": url, "title": url, "content": content}
+
+
+def test_removes_article_that_only_adds_one_sentence():
+    dedup = NearDuplicateFilter(paragraph_level=False)
+    copy = BASE + " Lembre que o perfil infantil não permite alterar dados de pagamento."
+    kept = list(dedup.filter([article("a", BASE), article("b", copy)]))
+    assert [a["url"] for a in kept] == ["a"]
+    assert dedup.report["removed_articles"][0]["duplicate_of"] == "a"
+
+
+def test_keeps_near_duplicates_that_differ_in_numbers():
+    dedup = NearDuplicateFilter(paragraph_level=False)
+    copy = BASE.replace("próxima cobrança", "cobrança de 15 dias depois")
+    kept = list(dedup.filter([article("a", BASE), article("b", copy)]))
+    assert [a["url"] for a in kept] == ["a", "b"]
+
+
+def test_keeps_article_with_mostly_new_content():
+    dedup = NearDuplicateFilter(paragraph_level=False, threshold=0.5)
+    extra = ("Planos com anúncios exibem propagandas curtas antes e durante filmes e séries, "
+             "e alguns títulos ficam indisponíveis por questões de licenciamento com os estúdios parceiros.")
+    kept = list(dedup.filter([article("a", BASE), article("b", BASE + " " + extra)]))
+    assert [a["url"] for a in kept] == ["a", "b"]
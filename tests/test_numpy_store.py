@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from backend.services.RAG.numpy_store import CURRENT_FILE, NumpyVectorStore
+
+SIZE = 4
+
+
+def unit(i):
+    return np.eye(1, SIZE, i % SIZE, dtype=np.float32)[0]
+
+
+def test_upsert_batches_update_new_and_stored_rows(tmp_path):
+    store = NumpyVectorStore("faq", SIZE, path=str(tmp_path), quantize=False)
+    store.upsert([1, 2], [unit(0), unit(1)], [{"n": 1}, {"n": 2}])
+    store.upsert([2, 3], [unit(2), unit(3)], [{"n": 22}, {"n": 3}])  # 2 ainda está pendente
+    store.flush()
+    store.upsert([1, 4], [unit(3), unit(0)], [{"n": 11}, {"n": 4}])  # 1 já está na matriz
+
+    assert store.count() == 4
+    assert [point_id for point_id, _, _ in store.search(unit(2), limit=1)] == [2]
+    assert {point_id for point_id, _, _ in store.search(unit(3), limit=2)} == {1, 3}
+    assert store.get_payloads([1, 2]) == {1: {"n": 11}, 2: {"n": 22}}
+    assert [point_id for point_id, _, _ in store.iter_points()] == [1, 2, 3, 4]
+
+
+def test_flush_publishes_a_new_generation_and_keeps_the_previous_one(tmp_path):
+    store = NumpyVectorStore("faq", SIZE, path=str(tmp_path))
+    store.upsert([1], [unit(0)], [{"n": 1}])
+    store.flush()
+    reader = NumpyVectorStore("faq", SIZE, path=str(tmp_path), read_only=True)
+
+    for generation in range(2, 4):
+        store.upsert([generation], [unit(generation)], [{"n": generation}])
+        store.flush()
+    collection = tmp_path / "faq"
+    assert (collection / CURRENT_FILE).read_text().strip() == "gen-000003"
+    assert sorted(entry for entry in os.listdir(collection) if entry.startswith("gen-")) == ["gen-000002", "gen-000003"]
+
+    assert reader.count() == 1  # segue na geração que abriu
+    reopened = NumpyVectorStore("faq", SIZE, path=str(tmp_path), read_only=True)
+    assert reopened.count() == 3
+    assert [point_id for point_id, _, _ in reopened.search(unit(2), limit=1)] == [2]
+
+
+def test_reads_and_replaces_the_layout_without_generations(tmp_path):
+    collection = tmp_path / "faq"
+    collection.mkdir()
+    np.save(collection / "vectors.npy", np.stack([unit(0), unit(1)]))
+    (collection / "points.jsonl").write_text('{"id": 1, "payload": {"n": 1}}\n{"id": 2, "payload": {"n": 2}}\n')
+
+    store = NumpyVectorStore("faq", SIZE, path=str(tmp_path))
+    assert [point_id for point_id, _, _ in store.search(unit(1), limit=1)] == [2]
+    store.upsert([3], [unit(2)], [{"n": 3}])
+    store.flush()
+    store.upsert([4], [unit(3)], [{"n": 4}])
+    store.flush()
+    assert not (collection / "points.jsonl").exists()
+    assert NumpyVectorStore("faq", SIZE, path=str(tmp_path), read_only=True).count() == 4
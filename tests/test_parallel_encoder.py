@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from backend.services.RAG import document_indexer, encoder_registry, parallel_encoder
+from backend.services.RAG.document_indexer import DocumentIndexer
+from backend.services.RAG.parallel_encoder import ParallelEncoder
+from tests.helpers import FakeEncoder
+
+MODEL = "fake-minilm"
+
+
+class SlowFirstEncoder(FakeEncoder):
+    """Os primeiros lotes demoram mais: os workers terminam fora da ordem de envio."""
+
+    def encode(self, texts, show_progress_bar=False, **kwargs):
+        time.sleep(0.05 if texts[0].endswith(("0", "1")) else 0)
+        return super().encode(texts)
+
+
+@pytest.fixture
+def threaded_pool(monkeypatch):
+    """Troca os processos por threads com o modelo falso, sem carregar torch nos workers."""
+    encoder = SlowFirstEncoder()
+    monkeypatch.setattr(parallel_encoder, "_worker_model", encoder)
+    pool = ParallelEncoder(MODEL, workers=4, batch_size=2)
+    pool._pool.shutdown()
+    pool._pool = ThreadPoolExecutor(4)
+    yield pool, encoder
+    pool.close()
+
+
+def test_vectors_come_back_in_the_original_order(threaded_pool):
+    pool, encoder = threaded_pool
+    texts = [f"texto {i}" for i in range(11)]
+    vectors = pool.encode(texts)
+
+    assert vectors.shape == (11, encoder.dim)
+    assert np.array_equal(vectors, np.stack([encoder.vector(text) for text in texts]))
+    assert encoder.encoded != texts  # os lotes terminaram fora de ordem
+    assert sorted(encoder.encoded) == sorted(texts)
+
+
+def test_few_texts_are_split_across_the_workers(threaded_pool, monkeypatch):
+    pool, _ = threaded_pool
+    batches = []
+    monkeypatch.setattr(parallel_encoder, "_encode_batch",
+                        lambda texts: batches.append(texts) or parallel_encoder._worker_model.encode(texts))
+    pool.batch_size = 64
+    pool.encode([f"texto {i}" for i in range(10)])
+    assert sorted(len(batch) for batch in batches) == [1, 3, 3, 3]  # 4 workers com trabalho, não 1 lote de 10
+    assert pool.encode([]).shape[0] == 0
+
+
+def test_single_worker_encodes_in_process(monkeypatch):
+    encoder = FakeEncoder()
+    monkeypatch.setitem(encoder_registry._encoders, MODEL, encoder)
+    monkeypatch.setattr(document_indexer, "ParallelEncoder",
+                        lambda *args, **kwargs: pytest.fail("workers=1 não deveria abrir um pool"))
+
+    indexer = DocumentIndexer(None, model_name=MODEL, workers=1)
+    assert indexer.encoder is encoder
+    assert np.array_equal(indexer.encode(["a", "b"]), encoder.encode(["a", "b"]))
+    indexer.close()
+
+
+def test_multiple_workers_share_one_pool_until_closed(monkeypatch):
+    opened = []
+
+    class RecordingPool:
+        def __init__(self, model_name, workers, batch_size):
+            self.closed = False
+            opened.append((self, model_name, workers, batch_size))
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(document_indexer, "ParallelEncoder", RecordingPool)
+    indexer = DocumentIndexer(None, model_name=MODEL, workers=3, encode_batch_size=16)
+    assert indexer.encoder is indexer.encoder
+    [(pool, model_name, workers, batch_size)] = opened
+    assert (model_name, workers, batch_size) == (MODEL, 3, 16)
+
+    indexer.close()
+    assert pool.closed
+    assert indexer.encoder is not pool  # depois de fechado, um novo pool é aberto
@@ -0,0 +1,69 @@
+from backend.services.LLM.prompt_builder import PromptBuilder
+from backend.services.LLM.tokens import estimate_tokens
+
+
+def words(prefix, start, stop):
+    """Palavras curtas e distintas ('a0', 'a1', ...): 1 token cada."""
+    return " ".join(f"{prefix}{i}" for i in range(start, stop))
+
+
+def article(n, text):
+    return f"=== Artigo {n} (https://help.netflix.com/pt/node/{n}) ===\n{text}"
+
+
+def build(builder, chunks, base_tokens=0):
+    return builder.build("Pergunta?", [], [(chunk, 0.9) for chunk in chunks], base_tokens)
+
+
+def test_passage_over_the_budget_is_truncated_at_the_limit():
+    builder = PromptBuilder(max_input_tokens=115, max_memory_tokens=0, min_passage_tokens=40)
+    first, second, third = words("a", 0, 50), words("b", 0, 100), words("c", 0, 10)
+    documents, _, report = build(builder, [first, second, third])
+
+    lines = documents.split("\n")
+    assert lines[0] == f"Documento 1: {first}"  # 55 tokens, cabe inteiro
+    # Sobram 60 tokens: 55 do trecho e 5 do marcador " [...]"
+    assert lines[1] == f"Documento 2: {words('b', 0, 50)} [...]"
+    assert len(lines) == 2
+    assert report["truncated_passages"] == 1 and report["dropped_for_budget"] == 1
+    assert report["prompt_tokens"] == estimate_tokens(lines[0]) + estimate_tokens(lines[1]) == 115
+
+
+def test_prompt_never_exceeds_the_budget():
+    chunks = [words(prefix, 0, size) for prefix, size in (("a", 120), ("b", 30), ("c", 200), ("d", 5))]
+    memory = [{"role": "user", "content": words("m", 0, 40)}, {"role": "assistant", "content": words("r", 0, 40)}]
+    for budget in range(0, 500, 7):
+        builder = PromptBuilder(max_input_tokens=budget, max_memory_tokens=60, min_passage_tokens=10)
+        documents, memory_text, report = builder.build("Pergunta?", memory, [(c, 0.9) for c in chunks], 12)
+        assert report["prompt_tokens"] <= max(budget, 12)
+        assert estimate_tokens(memory_text) <= 60
+
+
+def test_passages_keep_the_ranking_order():
+    builder = PromptBuilder(max_input_tokens=10_000)
+    head, tail = words("x", 0, 60), words("x", 50, 90)  # mesmo artigo, 10 palavras de overlap
+    chunks = [
+        article(3, head),
+        article(1, words("y", 0, 30)),
+        article(3, tail),  # junta com o primeiro, na posição dele
+        article(2, words("y", 0, 29)),  # quase duplicata do segundo
+        article(4, words("z", 0, 30)),
+    ]
+    documents, _, report = build(builder, chunks)
+
+    assert documents.split("\n") == [
+        "Documento 1: === Artigo 3 (https://help.netflix.com/pt/node/3) ===", words("x", 0, 90),
+        "Documento 2: === Artigo 1 (https://help.netflix.com/pt/node/1) ===", words("y", 0, 30),
+        "Documento 3: === Artigo 4 (https://help.netflix.com/pt/node/4) ===", words("z", 0, 30),
+    ]
+    assert report["merged_chunks"] == 1 and report["dropped_duplicates"] == 1
+
+
+def test_budget_drops_the_lowest_ranked_passages_first():
+    chunks = [words(prefix, 0, 30) for prefix in "abcd"]
+    builder = PromptBuilder(max_input_tokens=80, max_memory_tokens=0, min_passage_tokens=30)
+    documents, _, report = build(builder, chunks)
+
+    # 35 tokens por documento: os dois primeiros cabem, e os 5 que sobram não chegam ao mínimo
+    assert documents.split("\n") == [f"Documento 1: {chunks[0]}", f"Documento 2: {chunks[1]}"]
+    assert report["dropped_for_budget"] == 2 and report["truncated_passages"] == 0
@@ -0,0 +1,101 @@
+import numpy as np
+from backend.services.RAG import query_cache
+from backend.services.RAG.query_cache import QueryEmbeddingCache, SemanticAnswerCache
+
+
+class Encoder:
+    """Conta as chamadas; o vetor de cada pergunta é o seu tamanho repetido."""
+
+    def __init__(self):
+        self.calls = []
+
+    def one(self, query):
+        self.calls.append([query])
+        return [len(query)] * 3
+
+    def many(self, queries):
+        self.calls.append(list(queries))
+        return [[len(query)] * 3 for query in queries]
+
+
+def test_query_cache_hits_on_the_normalized_text():
+    cache, encoder = QueryEmbeddingCache(max_size=4), Encoder()
+    first = cache.get_or_encode("Como cancelar?", encoder.one)
+    again = cache.get_or_encode("  como   CANCELAR? ", encoder.one)
+
+    assert again is first and first.dtype == np.float32
+    assert encoder.calls == [["Como cancelar?"]]
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_query_cache_evicts_the_least_recently_used():
+    cache, encoder = QueryEmbeddingCache(max_size=2), Encoder()
+    cache.get_or_encode("a", encoder.one)
+    cache.get_or_encode("bb", encoder.one)
+    cache.get_or_encode("a", encoder.one)  # "a" volta a ser a mais recente
+    cache.get_or_encode("ccc", encoder.one)  # sai "bb"
+
+    encoder.calls.clear()
+    cache.get_or_encode("a", encoder.one)
+    cache.get_or_encode("ccc", encoder.one)
+    assert encoder.calls == []
+    cache.get_or_encode("bb", encoder.one)
+    assert encoder.calls == [["bb"]]
+
+
+def test_query_cache_batches_the_misses_in_one_call():
+    cache, encoder = QueryEmbeddingCache(max_size=8), Encoder()
+    cache.get_or_encode("a", encoder.one)
+    encoder.calls.clear()
+
+    vectors = cache.get_many_or_encode(["bb", "A", "bb", "ccc"], encoder.many)
+    assert encoder.calls == [["bb", "ccc"]]  # repetidas e em cache não vão ao modelo
+    assert [int(vector[0]) for vector in vectors] == [2, 1, 2, 3]
+    assert (cache.hits, cache.misses) == (1, 1 + 2)  # o "bb" repetido vai junto com o primeiro
+
+
+def unit(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_answer_cache_uses_the_similarity_threshold_and_the_chunk_set():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store(unit(1, 0), ["c1", "c2"], "resposta")
+
+    assert cache.lookup(unit(10, 1), ["c2", "c1"]) == "resposta"  # cosseno ~0.995, mesma ordem não importa
+    assert cache.lookup(unit(1, 1), ["c1", "c2"]) is None  # cosseno ~0.707
+    assert cache.lookup(unit(1, 0), ["c1"]) is None  # outro conjunto de chunks
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_answer_cache_returns_the_most_similar_entry():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.store(unit(1, 0), ["c1"], "longe")
+    cache.store(unit(1, 1), ["c1"], "perto")
+    assert cache.lookup(unit(1, 0.9), ["c1"]) == "perto"
+
+
+def test_answer_cache_evicts_the_least_recently_used():
+    cache = SemanticAnswerCache(threshold=0.99, max_size=2)
+    cache.store(unit(1, 0), ["a"], "A")
+    cache.store(unit(0, 1), ["b"], "B")
+    assert cache.lookup(unit(1, 0), ["a"]) == "A"  # "A" volta a ser a mais recente
+    cache.store(unit(1, 1), ["c"], "C")  # sai "B"
+
+    assert cache.lookup(unit(0, 1), ["b"]) is None
+    assert cache.lookup(unit(1, 0), ["a"]) == "A"
+    assert cache.lookup(unit(1, 1), ["c"]) == "C"
+    assert cache.stats()["size"] == 2
+
+
+def test_answer_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.9, ttl=60)
+    cache.store(unit(1, 0), ["a"], "A")
+
+    now[0] += 59
+    assert cache.lookup(unit(1, 0), ["a"]) == "A"
+    now[0] += 1
+    assert cache.lookup(unit(1, 0), ["a"]) is None
+    assert cache.stats()["size"] == 0
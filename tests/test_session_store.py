@@ -0,0 +1,14 @@
+from backend.services.history.session_store import SessionStore
+
+
+def test_session_report_matches_the_full_memory_report():
+    sessions = SessionStore(max_messages=2)
+    for content in ("pergunta 1", "resposta 1", "pergunta 2"):
+        sessions.append("a", "user", content)
+    sessions.append("b", "assistant", "resposta", references=[(7, 0.9)])
+
+    report = sessions.session_report("a")
+    full = sessions.memory_report()["sessions"]["a"]
+    assert (report["messages"], report["dropped"]) == (full["messages"], full["dropped"]) == (2, 1)
+    assert report["bytes"] == full["bytes"] > 0
+    assert sessions.session_report("desconhecida") is None
@@ -0,0 +1,41 @@
+import numpy as np
+from backend.services.RAG.numpy_store import NumpyVectorStore
+from backend.services.RAG.snapshots import SnapshotVectorStore, current_version, publish_snapshot
+
+
+def publish(root, tmp_path, version, model_name="minilm", vector_size=4):
+    db = NumpyVectorStore("faq", vector_size, path=str(tmp_path / f"build-{version}"))
+    db.upsert([1], np.eye(1, vector_size, dtype=np.float32), [{"text": version}])
+    db.flush()
+    manifest = {"index_version": version, "backend": "numpy", "model_name": model_name, "vector_size": vector_size}
+    publish_snapshot(db, manifest, root=str(root))
+
+
+def test_refresh_swaps_to_a_compatible_snapshot(tmp_path):
+    root = tmp_path / "snapshots"
+    publish(root, tmp_path, "v1")
+    store = SnapshotVectorStore(vector_size=4, path=str(root), check_interval=0, model_name="minilm")
+    publish(root, tmp_path, "v2")
+    assert store.refresh()
+    assert store.version == "v2"
+    assert store.get_payloads([1]) == {1: {"text": "v2"}}
+
+
+def test_refresh_keeps_the_current_snapshot_on_model_or_size_mismatch(tmp_path, capsys):
+    root = tmp_path / "snapshots"
+    publish(root, tmp_path, "v1")
+    store = SnapshotVectorStore(vector_size=4, path=str(root), check_interval=0)
+
+    publish(root, tmp_path, "v2", model_name="outro-modelo")
+    assert not store.refresh()
+    publish(root, tmp_path, "v3", vector_size=8)
+    assert not store.refresh()
+
+    assert current_version(str(root)) == "v3"
+    assert store.version == "v1"
+    assert store.get_payloads([1]) == {1: {"text": "v1"}}
+    output = capsys.readouterr().out
+    assert "Snapshot v2 ignorado" in output and "model_name='outro-modelo'" in output
+    assert "Snapshot v3 ignorado" in output and "vector_size=8" in output
+    assert not store.refresh()  # o mesmo snapshot rejeitado não é reaberto nem logado de novo
+    assert "ignorado" not in capsys.readouterr().out
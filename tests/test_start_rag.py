@@ -0,0 +1,74 @@
+import json
+import pytest
+from backend.services.RAG import encoder_registry
+from backend.services.RAG.corpus import article_record
+from backend.services.start_rag import IndexNotBuiltError, StartRAG
+from tests.helpers import FakeEncoder
+
+MODEL = "fake-minilm"
+DIM = 8
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = FakeEncoder(DIM)
+    monkeypatch.setitem(encoder_registry._encoders, MODEL, encoder)
+    return encoder
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "faq_complete.jsonl"
+    articles = [
+        article_record(f"https://help.netflix.com/pt/node/{n}", f"Artigo {n}",
+                       [f"Como resolver o problema {n} da conta.", " ".join(f"passo{n}_{i}" for i in range(30))])
+        for n in range(1, 4)
+    ]
+    path.write_text("".join(json.dumps(article, ensure_ascii=False) + "\n" for article in articles), encoding="utf-8")
+    return path
+
+
+def start(corpus, tmp_path, **kwargs):
+    options = {"faq_path": str(corpus), "model_name": MODEL, "vector_size": DIM, "backend": "numpy",
+               "db_path": str(tmp_path / "db"), "embedding_cache": False, "encode_workers": 1, "chunk_size": 20,
+               "overlap": 5, **kwargs}
+    return StartRAG(**options)
+
+
+def test_unchanged_manifest_reuses_the_index(encoder, corpus, tmp_path):
+    built = start(corpus, tmp_path)
+    assert encoder.encoded and built.db.count() == len(encoder.encoded)
+    encoder.encoded.clear()
+
+    reopened = start(corpus, tmp_path)
+    assert encoder.encoded == []  # nada foi embedado de novo
+    assert reopened.manifest == built.manifest
+    assert reopened.db.count() == built.db.count()
+
+
+def test_changing_a_rebuild_key_rebuilds_the_index(encoder, corpus, tmp_path):
+    built = start(corpus, tmp_path)
+    encoder.encoded.clear()
+
+    rebuilt = start(corpus, tmp_path, chunk_size=10, overlap=2)
+    assert rebuilt.manifest["chunk_size"] == 10
+    assert rebuilt.manifest["index_version"] != built.manifest["index_version"]
+    # Todos os chunks foram embedados de novo e só os do novo tamanho ficaram na collection
+    assert len(encoder.encoded) == rebuilt.db.count() > built.db.count()
+    assert sorted(payload["text"] for _, _, payload in rebuilt.db.iter_points()) == sorted(encoder.encoded)
+
+
+def test_serving_without_a_built_index_raises(encoder, corpus, tmp_path):
+    with pytest.raises(IndexNotBuiltError, match="Nenhum índice construído"):
+        start(corpus, tmp_path, build=False)
+    assert encoder.encoded == []
+
+
+def test_serving_with_another_model_raises(encoder, corpus, tmp_path):
+    built = start(corpus, tmp_path)
+    built.close_db()
+
+    served = start(corpus, tmp_path, build=False)
+    assert served.manifest["index_version"] == built.manifest["index_version"]
+    with pytest.raises(IndexNotBuiltError, match="construído com outro model_name"):
+        start(corpus, tmp_path, build=False, model_name="outro-modelo")
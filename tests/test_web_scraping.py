@@ -0,0 +1,264 @@
+import glob
+import itertools
+import os
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from urllib3.util.retry import Retry
+from backend.misc import web_scraping
+from backend.services.RAG.corpus import iter_articles
+from backend.misc.web_scraping import (SELENIUM_BLOCK_TAGS, SKIP_PARENT_CLASSES, BlockExtractor, CrawlState,
+                                       aggressive_clean_text, crawl, extract_page)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "crawler")
+HELP_PAGES = os.path.join(os.path.dirname(__file__), "fixtures", "help_pages")
+# BFS esperada: o índice, os artigos linkados por ele (ordenados) e os novos do nível 2
+EXPECTED = ["/pt"] + [f"/pt/node/{n}" for n in (101, 102, 103, 104, 105, 106, 201, 202)]
+
+
+class HelpCenter(ThreadingHTTPServer):
+    """Central de ajuda local servindo tests/fixtures/crawler; conta acessos e requisições simultâneas."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.05, failures=None):
+        super().__init__(("127.0.0.1", 0), HelpCenterHandler)
+        self.delay = delay
+        self.failures = {path: list(statuses) for path, statuses in (failures or {}).items()}
+        self.hits = Counter()
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def start_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/pt"
+
+
+class HelpCenterHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            failures = server.failures.get(self.path)
+            status = failures.pop(0) if failures else 200
+        try:
+            time.sleep(server.delay)
+            name = "pt.html" if self.path == "/pt" else self.path.replace("/pt/node/", "node_") + ".html"
+            file_path = os.path.join(FIXTURES, name)
+            if status == 200 and not os.path.exists(file_path):
+                status = 404
+            body = b""
+            if status == 200:
+                with open(file_path, "rb") as f:
+                    body = f.read()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def help_center(request):
+    server = HelpCenter(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(web_scraping, "RETRY", Retry(total=3, backoff_factor=0, status_forcelist=(500, 503),
+                                                     allowed_methods=("GET",)))
+
+
+def paths(pages, server):
+    return [url[len(server.start_url) - 3:] for url, _, _ in pages]
+
+
+def test_crawl_is_breadth_first_within_the_per_host_limit(help_center):
+    pages = list(crawl(help_center.start_url, max_depth=2, workers=8, max_per_host=2, use_selenium=False))
+
+    assert paths(pages, help_center) == EXPECTED
+    assert [depth for _, depth, _ in pages] == [0] + [1] * 6 + [2] * 2
+    assert all(result and result["content"] for _, _, result in pages)
+    assert help_center.max_active == 2  # 8 workers, mas no máximo 2 requisições ao mesmo host
+    assert set(help_center.hits.values()) == {1}
+    assert "/pt/node/999" not in help_center.hits  # link para outro domínio
+
+
+@pytest.mark.parametrize("help_center", [{"failures": {"/pt/node/103": [503, 503], "/pt/node/105": [500] * 10}}],
+                         indirect=True)
+def test_crawl_retries_transient_errors(help_center):
+    state = CrawlState()
+    pages = list(crawl(help_center.start_url, max_depth=1, use_selenium=False, state=state))
+    results = dict(zip(paths(pages, help_center), (result for _, _, result in pages)))
+    changes = state.finish()
+
+    assert help_center.hits["/pt/node/103"] == 3
+    assert "Precisa de ajuda" in results["/pt/node/103"]["content"]
+    assert help_center.hits["/pt/node/105"] == 4  # 1 + 3 retries, então desiste
+    assert results["/pt/node/105"] is None
+    assert changes["failed"] == [pages[5][0]]
+
+
+def test_interrupted_crawl_resumes_from_the_checkpoint(help_center, tmp_path, capsys):
+    state_path = str(tmp_path / "crawl_state.sqlite")
+    state = CrawlState(state_path)
+    interrupted = crawl(help_center.start_url, max_depth=2, workers=2, use_selenium=False, state=state)
+    done = paths(itertools.islice(interrupted, 4), help_center)
+    interrupted.close()
+    state.close()
+    help_center.hits.clear()
+
+    state = CrawlState(state_path)
+    pages = list(crawl(help_center.start_url, max_depth=2, workers=2, use_selenium=False, state=state))
+    changes = state.finish()
+    state.close()
+
+    assert "Retomando crawl interrompido" in capsys.readouterr().out
+    assert paths(pages, help_center) == EXPECTED
+    assert all(result and result["content"] for _, _, result in pages)
+    assert done == EXPECTED[:4]
+    assert not any(help_center.hits[path] for path in done)  # reproduzidas do checkpoint, sem rede
+    assert all(help_center.hits[path] == 1 for path in EXPECTED[4:])
+    assert len(changes["added"]) == len(EXPECTED)
+
+
+def test_failed_fetch_keeps_the_stored_article(help_center):
+    state = CrawlState()
+    first = list(crawl(help_center.start_url, max_depth=2, use_selenium=False, state=state))
+    state.finish()
+
+    help_center.failures["/pt/node/104"] = [500] * 10
+    pages = list(crawl(help_center.start_url, max_depth=2, use_selenium=False, state=state))
+    changes = state.finish()
+
+    assert help_center.hits["/pt/node/104"] == 1 + 4
+    assert pages == first  # o artigo que falhou sai com o resultado da execução anterior
+    url = first[4][0]
+    assert changes["failed"] == [url] and changes["removed"] == []
+    assert state.pages([url])[url]["result"] == first[4][2]
+
+
+def test_main_writes_matching_text_and_jsonl_corpora(help_center, tmp_path):
+    output, jsonl_output = str(tmp_path / "faq.txt"), str(tmp_path / "faq.jsonl")
+    web_scraping.main(help_center.start_url, max_depth=1, use_selenium=False, output=output,
+                      urls_output=str(tmp_path / "urls.txt"), state_path=None,
+                      changes_output=str(tmp_path / "changes.json"), jsonl_output=jsonl_output)
+
+    text_articles = list(iter_articles(output))
+    jsonl_articles = list(iter_articles(jsonl_output))
+    assert len(jsonl_articles) == len(EXPECTED) - 2  # sem os artigos do nível 2
+    assert [(a["url"], a["content"], a["content_hash"]) for a in jsonl_articles] == \
+        [(a["url"], a["content"], a["content_hash"]) for a in text_articles]
+    assert {a["depth"] for a in jsonl_articles} == {0, 1}
+
+
+# --- Extração ---
+
+def test_nested_blocks_keep_only_their_own_text():
+    parser = BlockExtractor("https://help.netflix.com/pt/node/1")
+    parser.feed("""
+        <ul class="nav"><li><a href="/pt/node/9">Menu</a></li></ul>
+        <ul>
+          <li>Item de fora com texto próprio
+            <ul><li>Item de dentro com <a href="/pt/node/2">link interno</a></li></ul>
+            e o fim do item de fora</li>
+          <li><p>Parágrafo dentro de um item</p></li>
+          <li>Item sem fechamento <script>var ignorado = 1;</script>
+          <li>Outro item<br>em duas linhas
+        </ul>""")
+    parser.close()
+    assert parser.blocks == [
+        "[Menu](https://help.netflix.com/pt/node/9)",
+        "Item de fora com texto próprio e o fim do item de fora",
+        "Item de dentro com [link interno](https://help.netflix.com/pt/node/2)",
+        "",
+        "Parágrafo dentro de um item",
+        "Item sem fechamento",
+        "Outro item em duas linhas",
+    ]
+    assert parser.hrefs == ["/pt/node/9", "/pt/node/2"]
+
+
+# Itens de listas aninhadas nas páginas salvas
+NESTED_ITEMS = {
+    "Títulos baixados para assistir offline são removidos automaticamente.",
+    "Se não aparecer essa opção, a cobrança é feita por um parceiro, como uma operadora de celular ou TV.",
+    "Para usar um cartão novo, selecione Adicionar forma de pagamento.",
+    "Nem todos os títulos estão disponíveis para download por questões de licenciamento.",
+    "É preciso estar conectado à internet para renovar.",
+}
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(HELP_PAGES, "*.html"))), ids=os.path.basename)
+def test_saved_help_pages_extract_each_block_once(path):
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    url = "https://help.netflix.com/pt/node/" + path.rsplit("_", 1)[-1][:-len(".html")]
+    page = extract_page(html, url, "help.netflix.com")
+    lines = page["content"].split("\n")
+
+    assert page["title"].startswith("Como ")
+    assert len(lines) == len(set(lines))
+    assert not any(marker in page["content"] for marker in ("window.netflix", "querySelectorAll", "schema.org", "{"))
+    assert all(link.startswith("https://help.netflix.com/pt/node/") and "#" not in link for link in page["node_links"])
+    # Itens aninhados: o texto da lista de dentro vira linhas próprias e não se repete no item de fora
+    nested = [line for line in lines if line in NESTED_ITEMS]
+    assert nested and all(not any(item in line for item in NESTED_ITEMS) for line in lines if line not in nested)
+
+    selenium_page = extract_page(html, url, "help.netflix.com", SELENIUM_BLOCK_TAGS, SKIP_PARENT_CLASSES)
+    assert selenium_page["content"].split("\n")[0] == page["title"]
+    assert "Dúvidas? Ligue" not in selenium_page["content"]  # rodapé
+    assert "(https://help.netflix.com/pt/login)" not in selenium_page["content"]  # menu
+
+
+
+def legacy_clean_text(text):
+    """aggressive_clean_text original, com uma regex por passo (referência para a tabela do translate)"""
+    if not text:
+        return ""
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    text = text.lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'[^\w\s\.\,]', '', text)
+    text = re.sub(r'\s+([\.])', r'\1', text)
+    text = re.sub(r'[áàâãä]', 'a', text)
+    text = re.sub(r'[éèêë]', 'e', text)
+    text = re.sub(r'[íìîï]', 'i', text)
+    text = re.sub(r'[óòôõö]', 'o', text)
+    text = re.sub(r'[úùûü]', 'u', text)
+    text = re.sub(r'[ç]', 'c', text)
+    return text.strip()
+
+
+def test_clean_text_matches_the_legacy_regexes():
+    lines = [
+        "Plano Padrão - R$ 39,90/mês (com anúncios) .",
+        "Sem​espaço, com\xa0nbsp e\ttab ½ ² İstanbul _sublinhado_ 🎬 “aspas” — travessão…",
+        "  [Central de Ajuda](https://help.netflix.com/pt) : ÁÉÍÓÚ ÇÃÕ !?",
+        "", "- . , -",
+    ]
+    for path in glob.glob(os.path.join(HELP_PAGES, "*.html")) + glob.glob(os.path.join(FIXTURES, "*.html")):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        for block_tags in (web_scraping.BLOCK_TAGS, SELENIUM_BLOCK_TAGS):
+            lines += extract_page(html, "https://help.netflix.com/pt", "help.netflix.com", block_tags)["content"].split("\n")
+        lines += html.split("\n")  # marcação e scripts crus: pontuação de sobra
+
+    assert len(lines) > 200
+    assert [aggressive_clean_text(line) for line in lines] == [legacy_clean_text(line) for line in lines]